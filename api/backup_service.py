@@ -0,0 +1,130 @@
+"""
+Online backups of the SQLite database using the sqlite3 backup API
+"""
+import asyncio
+import gzip
+import logging
+import os
+import secrets
+import shutil
+import sqlite3
+import time
+from datetime import datetime
+from typing import List, Optional
+from database import DB_PATH, get_db_connection
+
+BACKUP_DIR = os.getenv("BACKUP_DIR", os.path.join(os.path.dirname(DB_PATH) or ".", "backups"))
+BACKUP_INTERVAL_HOURS = float(os.getenv("BACKUP_INTERVAL_HOURS", "24"))
+BACKUP_RETENTION = int(os.getenv("BACKUP_RETENTION", "7"))
+# Copy this many pages per step and pause between steps so request traffic
+# keeps the disk and the database locks most of the time
+BACKUP_PAGES_PER_STEP = int(os.getenv("BACKUP_PAGES_PER_STEP", "256"))
+BACKUP_STEP_SLEEP_MS = float(os.getenv("BACKUP_STEP_SLEEP_MS", "20"))
+# Every write from another connection restarts an in-progress backup; after
+# this many restarts stop pausing so the copy can finish
+BACKUP_MAX_RESTARTS = int(os.getenv("BACKUP_MAX_RESTARTS", "3"))
+
+class BackupService:
+    """Writes compressed, timestamped database snapshots and prunes old ones"""
+    
+    def __init__(self, backup_dir: str = BACKUP_DIR, retention: int = BACKUP_RETENTION):
+        self.backup_dir = backup_dir
+        self.retention = retention
+        self.last_backup_path: Optional[str] = None
+        self.last_backup_at: Optional[datetime] = None
+        self.last_duration_seconds: Optional[float] = None
+        self.last_restarts = 0
+        self._lock = asyncio.Lock()
+    
+    async def run_backup(self) -> str:
+        """Take one snapshot on a worker thread and return its path"""
+        async with self._lock:
+            path = await asyncio.to_thread(self._backup)
+            self.last_backup_path = path
+            self.last_backup_at = datetime.now()
+            return path
+    
+    def _backup(self) -> str:
+        os.makedirs(self.backup_dir, exist_ok=True)
+        now = datetime.now()
+        # Milliseconds and a random suffix keep snapshots taken in the same second apart
+        timestamp = f"{now:%Y%m%d-%H%M%S}-{now.microsecond // 1000:03d}-{secrets.token_hex(3)}"
+        name = os.path.splitext(os.path.basename(DB_PATH))[0]
+        raw_path = os.path.join(self.backup_dir, f".{name}-{timestamp}.db.tmp")
+        final_path = os.path.join(self.backup_dir, f"{name}-{timestamp}.db.gz")
+        
+        started = time.perf_counter()
+        restarts = 0
+        last_remaining = None
+        
+        def progress(status, remaining, total):
+            nonlocal restarts, last_remaining
+            if last_remaining is not None and remaining > last_remaining:
+                restarts += 1
+            last_remaining = remaining
+            if remaining and restarts < BACKUP_MAX_RESTARTS:
+                time.sleep(BACKUP_STEP_SLEEP_MS / 1000)
+        
+        try:
+            source = get_db_connection()
+            try:
+                target = sqlite3.connect(raw_path)
+                try:
+                    source.backup(target, pages=BACKUP_PAGES_PER_STEP, progress=progress)
+                finally:
+                    target.close()
+            finally:
+                source.close()
+            
+            with open(raw_path, "rb") as raw, gzip.open(final_path, "wb", compresslevel=6) as compressed:
+                shutil.copyfileobj(raw, compressed, 1024 * 1024)
+        except BaseException:
+            # Never leave a partial snapshot that looks restorable
+            self._remove(final_path)
+            raise
+        finally:
+            self._remove(raw_path)
+        
+        self.last_duration_seconds = time.perf_counter() - started
+        self.last_restarts = restarts
+        self._prune()
+        logging.info(f"Database backup written to {final_path} in {self.last_duration_seconds:.2f}s")
+        return final_path
+    
+    def _prune(self):
+        """Keep only the newest `retention` snapshots"""
+        for path in self.list_backups()[self.retention:]:
+            self._remove(path)
+    
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logging.warning(f"Could not remove backup file {path}: {e}")
+    
+    def list_backups(self) -> List[str]:
+        """Snapshot paths, newest first"""
+        if not os.path.isdir(self.backup_dir):
+            return []
+        name = os.path.splitext(os.path.basename(DB_PATH))[0]
+        backups = [
+            os.path.join(self.backup_dir, entry)
+            for entry in os.listdir(self.backup_dir)
+            if entry.startswith(f"{name}-") and entry.endswith(".db.gz")
+        ]
+        return sorted(backups, reverse=True)
+    
+    def get_stats(self) -> dict:
+        """Last backup details and the retained snapshots"""
+        return {
+            "backup_dir": self.backup_dir,
+            "retention": self.retention,
+            "last_backup_path": self.last_backup_path,
+            "last_backup_at": self.last_backup_at.isoformat() if self.last_backup_at else None,
+            "last_duration_seconds": round(self.last_duration_seconds, 3) if self.last_duration_seconds is not None else None,
+            "last_restarts": self.last_restarts,
+            "backups": [os.path.basename(path) for path in self.list_backups()],
+        }
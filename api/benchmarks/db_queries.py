@@ -0,0 +1,101 @@
+"""
+Microbenchmark the hot user and saved-job queries, in queries per second.
+
+    cd api && python benchmarks/db_queries.py --seconds 2 --saved 50
+
+Runs each query single-threaded twice: once on a fresh default sqlite3
+connection opened and closed per query (how the services worked before
+the connection pool), and once on a pooled, tuned connection borrowed
+from db_connection(). Uses a throwaway SQLite database.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="db-bench-"), "bench.db")
+
+from benchmarks.samples import sample_internships
+from database import DB_PATH, db_connection, init_database
+from models import SavedJob, User
+from repositories import SavedJobsRepository, UserRepository
+
+@contextmanager
+def fresh_connection():
+    """A new connection per query with SQLite's defaults, committed and closed afterwards"""
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+    try:
+        yield conn
+        conn.commit()
+    finally:
+        conn.close()
+
+@contextmanager
+def pooled_connection():
+    with db_connection() as conn:
+        yield conn
+        conn.commit()
+
+def seed(saved: int):
+    internships = sample_internships(saved + 1)
+    with pooled_connection() as conn:
+        user_id = UserRepository._insert(conn, User(
+            id="bench-user", username="bench_user", password_hash="x", created_at=datetime.now()
+        ))
+        for internship in internships[:saved]:
+            SavedJobsRepository._insert(
+                conn, SavedJob(id="", user_id=user_id, internship_id=internship.id, saved_at=datetime.now()), internship, None
+            )
+    return user_id, internships[0].id, internships[saved]
+
+def queries(user_id: int, saved_id: str, spare):
+    spare_job = SavedJob(id="", user_id=user_id, internship_id=spare.id, saved_at=datetime.now())
+
+    def save_unsave(conn):
+        SavedJobsRepository._insert(conn, spare_job, spare, None)
+        conn.commit()
+        SavedJobsRepository._delete(conn, user_id, spare.id, 0)
+
+    return {
+        "get_user_by_id": lambda conn: UserRepository._get_by_id(conn, user_id),
+        "is_job_saved": lambda conn: SavedJobsRepository._exists(conn, user_id, saved_id),
+        "get_saved_job_ids": lambda conn: SavedJobsRepository._list_internship_ids(conn, user_id),
+        "save+unsave pair": save_unsave,
+    }
+
+def queries_per_second(connection, query, seconds: float) -> float:
+    count = 0
+    started = time.perf_counter()
+    deadline = started + seconds
+    while time.perf_counter() < deadline:
+        with connection() as conn:
+            query(conn)
+        count += 1
+    return count / (time.perf_counter() - started)
+
+def main(args):
+    init_database()
+    user_id, saved_id, spare = seed(args.saved)
+    results = {}
+    for name, query in queries(user_id, saved_id, spare).items():
+        fresh = queries_per_second(fresh_connection, query, args.seconds)
+        pooled = queries_per_second(pooled_connection, query, args.seconds)
+        results[name] = {
+            "fresh_connection_qps": round(fresh),
+            "pooled_qps": round(pooled),
+            "speedup": round(pooled / fresh, 1),
+        }
+    print(json.dumps({"saved_rows": args.saved, "seconds_per_run": args.seconds, "queries": results}, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, default=2.0, help="duration of each measurement")
+    parser.add_argument("--saved", type=int, default=50, help="saved jobs for the benchmark user")
+    main(parser.parse_args())
@@ -0,0 +1,307 @@
+"""
+Local fake SMTP and Twilio servers for notification benchmarks
+"""
+import asyncio
+import datetime
+import json
+import os
+import ssl
+import tempfile
+import time
+import uuid
+from collections import Counter
+from typing import Optional, Tuple
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+def self_signed_context() -> ssl.SSLContext:
+    """Server TLS context with a throwaway certificate for 127.0.0.1"""
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        cert_path = os.path.join(tmp, "cert.pem")
+        key_path = os.path.join(tmp, "key.pem")
+        with open(cert_path, "wb") as f:
+            f.write(cert.public_bytes(serialization.Encoding.PEM))
+        with open(key_path, "wb") as f:
+            f.write(key.private_bytes(
+                serialization.Encoding.PEM,
+                serialization.PrivateFormat.PKCS8,
+                serialization.NoEncryption()
+            ))
+        context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        context.load_cert_chain(cert_path, key_path)
+    return context
+
+def unverified_context() -> ssl.SSLContext:
+    """Client TLS context that accepts the fake servers' self-signed certificate"""
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+class _DelayedWriter:
+    """Delivers each write `latency` seconds after it is made, in order.
+
+    Models one-way network delay: a reply costs one round trip however many
+    replies are pipelined together.
+    """
+
+    def __init__(self, writer: asyncio.StreamWriter, latency: float):
+        self.writer = writer
+        self.latency = latency
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    def write(self, data: bytes):
+        self._queue.put_nowait((time.monotonic() + self.latency, data))
+
+    async def _run(self):
+        while True:
+            due, data = await self._queue.get()
+            delay = due - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.writer.write(data)
+            self._queue.task_done()
+
+    async def drain(self):
+        await self._queue.join()
+        await self.writer.drain()
+
+    def close(self):
+        self._task.cancel()
+
+class FakeSMTPServer:
+    """ESMTP sink with STARTTLS, AUTH, PIPELINING and a simulated round-trip delay.
+
+    Recipients whose domain is `reject_domain` get a 550 at RCPT and senders
+    whose domain is `reject_sender` a 550 at MAIL, so failure handling can be
+    exercised. With `drop_after` set, a connection that has accepted that
+    many messages is closed without a reply at its next MAIL; with
+    `starttls` off, STARTTLS is never offered.
+    """
+
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        reject_domain: str = "bounce.example.org",
+        pipelining: bool = True,
+        reject_sender: str = "",
+        drop_after: int = 0,
+        starttls: bool = True
+    ):
+        self.latency = latency_ms / 2000  # one-way
+        self.reject_domain = reject_domain
+        self.pipelining = pipelining
+        self.reject_sender = reject_sender
+        self.drop_after = drop_after
+        self.starttls = starttls
+        self.tls_context = self_signed_context()
+        self.port = 0
+        self.connections = 0
+        self.messages = 0
+        self.rejected = 0
+        self.dropped = 0
+        # verb -> times received, across all connections
+        self.commands = Counter()
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._handlers = set()
+
+    async def start(self) -> int:
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def stop(self):
+        self._server.close()
+        # Let open connections finish their last replies
+        if self._handlers:
+            _, pending = await asyncio.wait(self._handlers, timeout=1)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        task = asyncio.current_task()
+        self._handlers.add(task)
+        task.add_done_callback(self._handlers.discard)
+        out = _DelayedWriter(writer, self.latency)
+        tls = False
+        sender = False
+        recipients = 0
+        accepted = 0
+        try:
+            out.write(b"220 fake-smtp ESMTP ready\r\n")
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode("ascii", "replace").strip()
+                verb = command.split(" ", 1)[0].upper()
+                self.commands[verb] += 1
+                if verb in ("EHLO", "HELO"):
+                    extensions = ["8BITMIME", "SIZE 10485760"] + (["PIPELINING"] if self.pipelining else [])
+                    if tls:
+                        extensions.append("AUTH PLAIN LOGIN")
+                    elif self.starttls:
+                        extensions.append("STARTTLS")
+                    lines = ["fake-smtp"] + extensions
+                    out.write("".join(
+                        f"250{'-' if i < len(lines) - 1 else ' '}{text}\r\n" for i, text in enumerate(lines)
+                    ).encode())
+                elif verb == "STARTTLS":
+                    out.write(b"220 ready to start TLS\r\n")
+                    await out.drain()
+                    await writer.start_tls(self.tls_context)
+                    tls = True
+                elif verb == "AUTH":
+                    if command.upper().startswith("AUTH LOGIN"):
+                        out.write(b"334 VXNlcm5hbWU6\r\n")
+                        await reader.readline()
+                        out.write(b"334 UGFzc3dvcmQ6\r\n")
+                        await reader.readline()
+                    out.write(b"235 authenticated\r\n")
+                elif verb == "MAIL":
+                    if self.drop_after and accepted >= self.drop_after:
+                        self.dropped += 1
+                        break
+                    recipients = 0
+                    sender = not (self.reject_sender and self.reject_sender in command)
+                    out.write(b"250 sender ok\r\n" if sender else b"550 sender rejected\r\n")
+                elif verb == "RCPT":
+                    if not sender:
+                        out.write(b"503 need MAIL first\r\n")
+                    elif self.reject_domain and self.reject_domain in command:
+                        self.rejected += 1
+                        out.write(b"550 mailbox unavailable\r\n")
+                    else:
+                        recipients += 1
+                        out.write(b"250 recipient ok\r\n")
+                elif verb == "DATA":
+                    if not recipients:
+                        out.write(b"554 no valid recipients\r\n")
+                        continue
+                    out.write(b"354 end data with <CR><LF>.<CR><LF>\r\n")
+                    while (await reader.readline()) not in (b".\r\n", b""):
+                        pass
+                    self.messages += 1
+                    accepted += 1
+                    sender = False
+                    recipients = 0
+                    out.write(b"250 queued\r\n")
+                elif verb in ("RSET", "NOOP"):
+                    sender = False
+                    recipients = 0
+                    out.write(b"250 ok\r\n")
+                elif verb == "QUIT":
+                    out.write(b"221 bye\r\n")
+                    break
+                else:
+                    out.write(b"502 command not implemented\r\n")
+            await out.drain()
+        except (ConnectionError, ssl.SSLError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            out.close()
+            writer.close()
+
+class FakeTwilioServer:
+    """HTTP/1.1 keep-alive server answering Twilio's Messages.create with a simulated delay"""
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency = latency_ms / 1000
+        self.port = 0
+        self.connections = 0
+        self.messages = 0
+        # account SID -> messages accepted
+        self.by_account = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._handlers = set()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    async def start(self) -> int:
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def stop(self):
+        self._server.close()
+        # Let open connections finish their last replies
+        if self._handlers:
+            _, pending = await asyncio.wait(self._handlers, timeout=1)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        await self._server.wait_closed()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, dict]]:
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", "0"))
+        if length:
+            await reader.readexactly(length)
+        return request_line.decode("latin-1").split(" ")[1], headers
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        task = asyncio.current_task()
+        self._handlers.add(task)
+        task.add_done_callback(self._handlers.discard)
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                path, headers = request
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                # /2010-04-01/Accounts/{sid}/Messages.json
+                parts = path.split("/")
+                account_sid = parts[3] if len(parts) > 3 else ""
+                self.messages += 1
+                self.by_account[account_sid] = self.by_account.get(account_sid, 0) + 1
+                body = json.dumps({
+                    "sid": "SM" + uuid.uuid4().hex,
+                    "account_sid": account_sid,
+                    "status": "queued",
+                }).encode()
+                writer.write(
+                    b"HTTP/1.1 201 Created\r\nContent-Type: application/json\r\n"
+                    + f"Content-Length: {len(body)}\r\n\r\n".encode()
+                    + body
+                )
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
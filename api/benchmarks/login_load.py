@@ -0,0 +1,96 @@
+"""
+Benchmark listing latency while logins keep the password hasher busy.
+
+    cd api && python benchmarks/login_load.py --logins 16 --seconds 5
+
+Drives the FastAPI app in-process: `--logins` clients log in back-to-back
+while one client polls /internships?fields=summary&limit=20, and the
+polling latencies are reported. The run is repeated with bcrypt called
+directly on the event loop (the behaviour before PasswordHashPool) for
+comparison. Uses a throwaway SQLite database; nothing real is contacted.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="login-bench-"), "bench.db")
+# The load is many logins from one client; keep the throttle out of the way
+os.environ.setdefault("LOGIN_MAX_ATTEMPTS_PER_USERNAME", "1000000")
+os.environ.setdefault("LOGIN_MAX_ATTEMPTS_PER_IP", "1000000")
+
+import httpx
+
+import main
+from benchmarks.samples import percentile, sample_internships
+
+async def poll_listings(client: httpx.AsyncClient, deadline: float) -> list:
+    latencies = []
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        response = await client.get("/internships", params={"fields": "summary", "limit": 20})
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(0.01)
+    return latencies
+
+async def login_loop(client: httpx.AsyncClient, username: str, password: str, deadline: float) -> int:
+    logins = 0
+    while time.perf_counter() < deadline:
+        response = await client.post("/auth/login", json={"username": username, "password": password})
+        response.raise_for_status()
+        logins += 1
+    return logins
+
+async def measure(client: httpx.AsyncClient, logins: int, seconds: float, password: str) -> dict:
+    deadline = time.perf_counter() + seconds
+    poller = asyncio.create_task(poll_listings(client, deadline))
+    counts = await asyncio.gather(*(login_loop(client, "bench_user", password, deadline) for _ in range(logins)))
+    latencies = await poller
+    return {
+        "logins": sum(counts),
+        "listing_requests": len(latencies),
+        "listing_ms": {"p50": percentile(latencies, 0.5), "p99": percentile(latencies, 0.99), "max": percentile(latencies, 1.0)},
+    }
+
+def run_bcrypt_inline():
+    """Restore the old behaviour: hash and verify on the event loop thread"""
+    async def run(func, *args):
+        return func(*args)
+    main.user_service.hash_pool.run = run
+
+async def run(args):
+    logging.basicConfig(level=logging.CRITICAL)
+    main.internship_service._set_cache(sample_internships(args.internships))
+    main.internship_service.last_fetch = datetime.now()
+    password = "bench-password"
+    await main.user_service.create_user("bench_user", password)
+
+    transport = httpx.ASGITransport(app=main.app)
+    results = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        results["idle"] = await measure(client, 0, min(args.seconds, 2), password)
+        results["worker_pool"] = await measure(client, args.logins, args.seconds, password)
+        results["worker_pool"]["hash_pool"] = main.user_service.hash_pool.get_stats()
+        run_bcrypt_inline()
+        results["event_loop"] = await measure(client, args.logins, args.seconds, password)
+
+    print(json.dumps({
+        "logins_in_flight": args.logins,
+        "seconds": args.seconds,
+        "bcrypt_rounds": main.user_service.bcrypt_rounds,
+        **results,
+    }, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--logins", type=int, default=16, help="concurrent login loops")
+    parser.add_argument("--seconds", type=float, default=5.0, help="duration of each run")
+    parser.add_argument("--internships", type=int, default=200, help="postings in the listing snapshot")
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,112 @@
+"""
+Benchmark digest fan-out against local fake SMTP and Twilio servers.
+
+    cd api && python benchmarks/notification_fanout.py --subscribers 1000 --latency-ms 20
+
+Runs the same digest once with every channel limited to one send at a time
+(the old one-subscriber-after-another behaviour) and once with the
+configured per-channel concurrency, and prints both throughput reports.
+Uses a throwaway SQLite database; nothing real is contacted.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="fanout-bench-"), "bench.db")
+# Some subscribers bring their own Twilio credentials, which need a key to be stored
+os.environ.setdefault("SUBSCRIBER_SECRETS_KEY", "benchmark")
+
+from twilio.http.async_http_client import AsyncTwilioHttpClient
+
+from benchmarks.fake_servers import FakeSMTPServer, FakeTwilioServer, unverified_context
+from benchmarks.samples import sample_internships
+from database import init_database
+from email_transport import SMTPTransport
+from models import NotificationPreferences
+from notification_fanout import FanOutEngine
+from notification_service import NotificationService
+from sms_transport import TwilioSMSTransport
+
+class LocalTwilioHttpClient(AsyncTwilioHttpClient):
+    """Sends Twilio API requests to the fake server instead of api.twilio.com"""
+
+    def __init__(self, base_url: str):
+        super().__init__()
+        self.base_url = base_url
+
+    async def request(self, method, url, *args, **kwargs):
+        return await super().request(method, url.replace("https://api.twilio.com", self.base_url), *args, **kwargs)
+
+async def seed_subscribers(service: NotificationService, count: int, sms_every: int, reject_every: int, accounts: int):
+    for i in range(count):
+        domain = "bounce.example.org" if reject_every and i % reject_every == 0 else "example.com"
+        # SMS subscribers rotate between the system account and `accounts` of their own
+        account = (i // sms_every) % (accounts + 1) if sms_every else 0
+        await service.subscribers.upsert(NotificationPreferences(
+            email=f"user{i}@{domain}",
+            phone=f"555{i:07d}",
+            sms_enabled=bool(sms_every) and i % sms_every == 0,
+            daily_digest=True,
+            instant_alerts=False,
+            twilio_account_sid=f"ACsubscriber{account:04d}" if account else None,
+            twilio_auth_token="token" if account else None
+        ))
+
+async def main(args):
+    logging.basicConfig(level=logging.CRITICAL)
+    init_database()
+
+    smtp = FakeSMTPServer(latency_ms=args.latency_ms)
+    twilio = FakeTwilioServer(latency_ms=args.latency_ms)
+    await smtp.start()
+    await twilio.start()
+
+    service = NotificationService(
+        email_transport=SMTPTransport("127.0.0.1", smtp.port, "bench", "bench", tls_context=unverified_context()),
+        sms_transport=TwilioSMSTransport(http_client=LocalTwilioHttpClient(twilio.base_url))
+    )
+    service.twilio_account_sid, service.twilio_auth_token = "ACsystem00000", "token"
+    service.twilio_phone_number = "+15550000000"
+    service.use_twilio = True
+
+    await seed_subscribers(service, args.subscribers, args.sms_every, args.reject_every, args.accounts)
+    internships = sample_internships()
+
+    results = {}
+    modes = [("sequential", FanOutEngine({channel: 1 for channel in service.fanout.limits}, max_in_flight=1))]
+    modes.append(("concurrent", service.fanout))
+    for mode, engine in modes:
+        service.fanout = engine
+        notified = await service.send_daily_digest(internships)
+        results[mode] = service.last_fanout["daily_digest"]
+        print(f"{mode}: notified {notified} in {results[mode]['duration_seconds']}s")
+
+    sms_stats = service.sms.get_stats()
+    await service.close()
+    await smtp.stop()
+    await twilio.stop()
+
+    speedup = results["sequential"]["duration_seconds"] / max(results["concurrent"]["duration_seconds"], 1e-9)
+    print(json.dumps({
+        "subscribers": args.subscribers,
+        "latency_ms": args.latency_ms,
+        "speedup": round(speedup, 1),
+        "smtp_server": {"connections": smtp.connections, "messages": smtp.messages, "rejected": smtp.rejected},
+        "twilio_server": {"connections": twilio.connections, "messages": twilio.messages},
+        "sms_transport": sms_stats,
+        "reports": results,
+    }, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--subscribers", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="simulated round trip per server reply")
+    parser.add_argument("--sms-every", type=int, default=2, help="every Nth subscriber has SMS enabled (0 = none)")
+    parser.add_argument("--accounts", type=int, default=4, help="subscriber-owned Twilio accounts besides the system one")
+    parser.add_argument("--reject-every", type=int, default=50, help="every Nth address is rejected by the SMTP server (0 = none)")
+    asyncio.run(main(parser.parse_args()))
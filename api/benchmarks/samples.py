@@ -0,0 +1,27 @@
+"""
+Sample data and helpers shared by the benchmarks
+"""
+from models import Internship
+
+def sample_internships(count: int = 5):
+    return [
+        Internship(
+            id=f"bench_{i}",
+            title=f"Software Engineering Intern {i}",
+            company="Bench Co",
+            location="Remote",
+            description="Benchmark posting " * 10,
+            salary="$30/hour",
+            posted_date="2025-01-01T00:00:00",
+            source_url="https://example.com",
+            source="bench"
+        )
+        for i in range(count)
+    ]
+
+def percentile(latencies, p: float) -> float:
+    """The `p` quantile (0-1) of latencies in seconds, in milliseconds"""
+    if not latencies:
+        return 0.0
+    ordered = sorted(latencies)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000, 2)
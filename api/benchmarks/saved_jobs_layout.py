@@ -0,0 +1,169 @@
+"""
+Measure saved_jobs size and lookup latency for each table layout.
+
+    cd api && python benchmarks/saved_jobs_layout.py --users 10000 --per-user 100
+
+Generates the same saved jobs (1M rows by default) into one database per
+layout and reports the file size, the pages used by saved_jobs and its
+indexes (from dbstat), and the average latency of an exists check and of
+listing a user's saved IDs newest first:
+
+    legacy     TEXT keys and ISO timestamps (migration 1)
+    rowid      integer keys in a rowid table with a UNIQUE index
+    clustered  WITHOUT ROWID on (user_id, internship_id) (migration 2)
+    current    clustered plus idx_saved_jobs_user_saved_at (migration 5)
+
+Databases are written to a temporary directory and removed afterwards.
+"""
+import argparse
+import json
+import os
+import random
+import secrets
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+LAYOUTS = {
+    "legacy": [
+        """
+        CREATE TABLE saved_jobs (
+            id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            internship_id TEXT NOT NULL,
+            saved_at TEXT NOT NULL,
+            UNIQUE(user_id, internship_id)
+        )
+        """,
+        "CREATE INDEX idx_saved_jobs_user_id ON saved_jobs(user_id)",
+        "CREATE INDEX idx_saved_jobs_internship_id ON saved_jobs(internship_id)",
+    ],
+    "rowid": [
+        """
+        CREATE TABLE saved_jobs (
+            user_id INTEGER NOT NULL,
+            internship_id TEXT NOT NULL,
+            saved_at INTEGER NOT NULL,
+            UNIQUE(user_id, internship_id)
+        )
+        """,
+        "CREATE INDEX idx_saved_jobs_internship_id ON saved_jobs(internship_id)",
+    ],
+    "clustered": [
+        """
+        CREATE TABLE saved_jobs (
+            user_id INTEGER NOT NULL,
+            internship_id TEXT NOT NULL,
+            saved_at INTEGER NOT NULL,
+            PRIMARY KEY (user_id, internship_id)
+        ) WITHOUT ROWID
+        """,
+        "CREATE INDEX idx_saved_jobs_internship_id ON saved_jobs(internship_id)",
+    ],
+}
+LAYOUTS["current"] = LAYOUTS["clustered"] + [
+    "CREATE INDEX idx_saved_jobs_user_saved_at ON saved_jobs(user_id, saved_at DESC, internship_id)",
+]
+
+EXISTS_SQL = "SELECT 1 FROM saved_jobs WHERE user_id = ? AND internship_id = ?"
+LIST_SQL = "SELECT internship_id FROM saved_jobs WHERE user_id = ? ORDER BY saved_at DESC, internship_id"
+
+def generate(users: int, per_user: int, postings: int, seed: int):
+    """(user number, internship ID, saved_at epoch ms) rows, saved in time order as in production"""
+    rng = random.Random(seed)
+    internship_ids = [f"fj_{rng.getrandbits(64):016x}" for _ in range(postings)]
+    start = datetime(2025, 1, 1)
+    rows = [
+        (user, internship_id, 0)
+        for user in range(users)
+        for internship_id in rng.sample(internship_ids, per_user)
+    ]
+    rng.shuffle(rows)
+    step_ms = int(timedelta(days=180).total_seconds() * 1000) // len(rows)
+    base_ms = int(start.timestamp() * 1000)
+    return [(user, internship_id, base_ms + i * step_ms) for i, (user, internship_id, _) in enumerate(rows)]
+
+def build(path: str, layout: str, rows, public_ids):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    for statement in LAYOUTS[layout]:
+        conn.execute(statement)
+    if layout == "legacy":
+        conn.executemany(
+            "INSERT INTO saved_jobs (id, user_id, internship_id, saved_at) VALUES (?, ?, ?, ?)",
+            (
+                (secrets.token_urlsafe(16), public_ids[user], internship_id,
+                 datetime.fromtimestamp(saved_at / 1000).isoformat())
+                for user, internship_id, saved_at in rows
+            )
+        )
+    else:
+        conn.executemany(
+            "INSERT INTO saved_jobs (user_id, internship_id, saved_at) VALUES (?, ?, ?)",
+            ((user + 1, internship_id, saved_at) for user, internship_id, saved_at in rows)
+        )
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.execute("ANALYZE")
+    conn.close()
+
+def table_bytes(conn: sqlite3.Connection) -> int:
+    """Bytes in saved_jobs and its indexes"""
+    return conn.execute("""
+        SELECT COALESCE(SUM(pgsize), 0) FROM dbstat
+        WHERE name = 'saved_jobs' OR name IN (SELECT name FROM sqlite_master WHERE tbl_name = 'saved_jobs')
+    """).fetchone()[0]
+
+def average_us(conn: sqlite3.Connection, sql: str, params) -> float:
+    started = time.perf_counter()
+    for args in params:
+        conn.execute(sql, args).fetchall()
+    return round((time.perf_counter() - started) / len(params) * 1_000_000, 1)
+
+def measure(path: str, layout: str, rows, public_ids, lookups: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    sample = [rows[rng.randrange(len(rows))] for _ in range(lookups)]
+    user_key = (lambda user: public_ids[user]) if layout == "legacy" else (lambda user: user + 1)
+
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA cache_size = -16384")  # the pool's ~16 MiB page cache
+    # Warm the cache the way a running server would be
+    average_us(conn, EXISTS_SQL, [(user_key(user), internship_id) for user, internship_id, _ in sample])
+    result = {
+        "file_mb": round(os.path.getsize(path) / 1e6, 1),
+        "saved_jobs_and_indexes_mb": round(table_bytes(conn) / 1e6, 1),
+        "exists_us": average_us(conn, EXISTS_SQL, [(user_key(user), internship_id) for user, internship_id, _ in sample]),
+        "list_user_ids_us": average_us(conn, LIST_SQL, [(user_key(user),) for user, _, _ in sample]),
+    }
+    conn.close()
+    return result
+
+def main(args):
+    rows = generate(args.users, args.per_user, args.postings, args.seed)
+    public_ids = [secrets.token_urlsafe(16) for _ in range(args.users)]
+    tmp = tempfile.mkdtemp(prefix="saved-jobs-layout-")
+    results = {}
+    try:
+        for layout in args.layouts:
+            path = os.path.join(tmp, f"{layout}.db")
+            started = time.perf_counter()
+            build(path, layout, rows, public_ids)
+            results[layout] = measure(path, layout, rows, public_ids, args.lookups, args.seed)
+            results[layout]["build_seconds"] = round(time.perf_counter() - started, 1)
+            os.remove(path)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    print(json.dumps({"rows": len(rows), "users": args.users, "postings": args.postings, "layouts": results}, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--per-user", type=int, default=100, help="saved jobs per user")
+    parser.add_argument("--postings", type=int, default=50000, help="distinct internship IDs")
+    parser.add_argument("--lookups", type=int, default=20000, help="timed queries per measurement")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--layouts", nargs="+", choices=list(LAYOUTS), default=list(LAYOUTS))
+    main(parser.parse_args())
@@ -0,0 +1,106 @@
+"""
+Benchmark email throughput against a local SMTP sink.
+
+    cd api && python benchmarks/smtp_transport.py --messages 2000 --latency-ms 20
+
+Compares the previous approach (a new smtplib connection with STARTTLS and
+login for every message, `--concurrency` at a time on threads) with
+SMTPTransport's pooled, pipelined sessions. Nothing real is contacted.
+"""
+import argparse
+import asyncio
+import json
+import os
+import smtplib
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_servers import FakeSMTPServer, unverified_context
+from email_transport import SMTPTransport
+
+def build_message(index: int) -> MIMEMultipart:
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = "Daily CS Internship Digest"
+    msg['From'] = "bench@example.com"
+    msg['To'] = f"user{index}@example.com"
+    msg.attach(MIMEText("<html><body>" + "<p>Benchmark internship</p>" * 50 + "</body></html>", 'html'))
+    return msg
+
+def smtplib_send(port: int, msg: MIMEMultipart):
+    with smtplib.SMTP("127.0.0.1", port) as server:
+        server.starttls(context=unverified_context())
+        server.login("bench", "bench")
+        server.send_message(msg)
+
+async def run_smtplib(port: int, count: int, concurrency: int) -> float:
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        await asyncio.gather(*(
+            loop.run_in_executor(executor, smtplib_send, port, build_message(i)) for i in range(count)
+        ))
+    return time.perf_counter() - started
+
+async def run_transport(transport: SMTPTransport, count: int, concurrency: int) -> float:
+    limit = asyncio.Semaphore(concurrency)
+
+    async def send(index: int):
+        async with limit:
+            await transport.send(build_message(index))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(send(i) for i in range(count)))
+    return time.perf_counter() - started
+
+async def main(args):
+    smtp = FakeSMTPServer(latency_ms=args.latency_ms)
+    await smtp.start()
+    results = {}
+
+    elapsed = await run_smtplib(smtp.port, args.baseline_messages, args.baseline_concurrency)
+    results["smtplib_per_message"] = {
+        "messages": args.baseline_messages,
+        "concurrency": args.baseline_concurrency,
+        "seconds": round(elapsed, 3),
+        "messages_per_second": round(args.baseline_messages / elapsed, 1),
+    }
+
+    connections_before = smtp.connections
+    transport = SMTPTransport(
+        "127.0.0.1", smtp.port, "bench", "bench",
+        tls_context=unverified_context(),
+        pool_size=args.pool_size,
+        pipeline_depth=args.pipeline_depth
+    )
+    elapsed = await run_transport(transport, args.messages, args.concurrency)
+    results["smtp_transport"] = {
+        "messages": args.messages,
+        "concurrency": args.concurrency,
+        "seconds": round(elapsed, 3),
+        "messages_per_second": round(args.messages / elapsed, 1),
+        "server_connections": smtp.connections - connections_before,
+        "stats": transport.get_stats(),
+    }
+    await transport.close()
+    await smtp.stop()
+
+    results["speedup"] = round(
+        results["smtp_transport"]["messages_per_second"] / results["smtplib_per_message"]["messages_per_second"], 1
+    )
+    print(json.dumps({"latency_ms": args.latency_ms, **results}, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64, help="send() calls in flight")
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--pipeline-depth", type=int, default=16)
+    parser.add_argument("--baseline-messages", type=int, default=200)
+    parser.add_argument("--baseline-concurrency", type=int, default=10, help="smtplib threads")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="simulated round trip per server reply")
+    asyncio.run(main(parser.parse_args()))
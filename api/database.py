@@ -4,18 +4,60 @@ Pure Python - no external dependencies required
 """
 import sqlite3
 import os
-from typing import Optional, List
+import asyncio
+import base64
+import hashlib
+import logging
+import queue
+import threading
+import time
+import zlib
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, List, Callable, Any
 from datetime import datetime
 from contextlib import contextmanager
-from models import User
+from cryptography.fernet import Fernet, InvalidToken
+from models import User, Internship
 
 # Database file path (configurable via environment for Docker)
 # Default: a file next to this module for local dev, but containers should
 # set `DB_PATH=/data/internship_app.db` to allow mounting a volume at /data.
 DB_PATH = os.getenv("DB_PATH", os.path.join(os.path.dirname(__file__), "internship_app.db"))
 
-def get_db_connection():
-    """Get a database connection. Ensure the parent directory exists."""
+# Connection pool and per-connection tuning
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "10"))
+DB_STATEMENT_CACHE_SIZE = 256
+# SQLite allows many concurrent readers but only one writer, so async access
+# uses N reader threads and a single writer thread
+DB_READER_THREADS = int(os.getenv("DB_READER_THREADS", "4"))
+# Group commit: writes arriving within the window share one transaction
+DB_WRITE_BATCH_WINDOW_MS = float(os.getenv("DB_WRITE_BATCH_WINDOW_MS", "2"))
+DB_WRITE_BATCH_MAX = int(os.getenv("DB_WRITE_BATCH_MAX", "128"))
+DB_PRAGMAS = (
+    # Takes effect only on a new, empty file, and must precede the WAL switch,
+    # which writes the header; existing files are converted by db_maintenance.py
+    "PRAGMA auto_vacuum = INCREMENTAL",
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA mmap_size = 268435456",  # 256 MiB
+    "PRAGMA cache_size = -16000",  # ~16 MiB
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA journal_size_limit = 67108864",  # truncate the WAL back to 64 MiB after checkpoints
+)
+
+# Remind this many days before a saved posting's application deadline
+REMINDER_DAYS_BEFORE = float(os.getenv("REMINDER_DAYS_BEFORE", "3"))
+
+# Key for credentials subscribers store with us (their Twilio auth tokens).
+# Without it those credentials are not persisted at all.
+SUBSCRIBER_SECRETS_KEY = os.getenv("SUBSCRIBER_SECRETS_KEY")
+_SECRET_PREFIX = "fernet:"
+
+def _ensure_db_dir():
+    """Ensure the parent directory of the database file exists"""
     dirpath = os.path.dirname(DB_PATH)
     if dirpath:
         try:
@@ -23,17 +65,241 @@ def get_db_connection():
         except Exception:
             # If directory creation fails, continue and let sqlite raise a helpful error
             pass
-    conn = sqlite3.connect(DB_PATH)
+
+def get_db_connection():
+    """Open a new, tuned database connection. Ensure the parent directory exists.
+    
+    Request paths should use `db_connection()` instead, which reuses pooled
+    connections.
+    """
+    _ensure_db_dir()
+    conn = sqlite3.connect(
+        DB_PATH,
+        check_same_thread=False,
+        cached_statements=DB_STATEMENT_CACHE_SIZE
+    )
     conn.row_factory = sqlite3.Row  # Enable column access by name
+    for pragma in DB_PRAGMAS:
+        conn.execute(pragma)
     return conn
 
-def init_database():
-    """Initialize the database with required tables"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+class ConnectionPool:
+    """Bounded pool of long-lived SQLite connections.
+    
+    Connections are opened lazily up to `size`; callers block (up to `timeout`)
+    when all of them are checked out. A pooled connection can be used from any
+    thread, but only by one caller at a time.
+    """
+    
+    def __init__(self, size: int = DB_POOL_SIZE, timeout: float = DB_POOL_TIMEOUT_SECONDS):
+        self.size = size
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
     
-    # Create users table
-    cursor.execute("""
+    def acquire(self) -> sqlite3.Connection:
+        """Check out a connection, opening a new one if the pool is not full"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+        if create:
+            try:
+                return get_db_connection()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError("Timed out waiting for a database connection")
+    
+    def release(self, conn: sqlite3.Connection):
+        """Return a connection to the pool, rolling back any open transaction"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self.discard(conn)
+            return
+        self._idle.put(conn)
+    
+    def discard(self, conn: sqlite3.Connection):
+        """Close a connection that should not be reused"""
+        try:
+            conn.close()
+        finally:
+            with self._lock:
+                self._created -= 1
+    
+    def close_all(self):
+        """Close every idle connection"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self.discard(conn)
+
+_pool = ConnectionPool()
+
+@contextmanager
+def db_connection():
+    """Borrow a pooled connection for the duration of a `with` block"""
+    conn = _pool.acquire()
+    try:
+        yield conn
+    finally:
+        _pool.release(conn)
+
+def _run_read(func: Callable[..., Any], args: tuple) -> Any:
+    with db_connection() as conn:
+        return func(conn, *args)
+
+class GroupCommitWriter:
+    """Single writer thread that coalesces queued writes into one transaction.
+    
+    Each write runs inside its own SAVEPOINT, so a failing write (e.g. an
+    IntegrityError on a duplicate) is rolled back and reported to its caller
+    alone while the rest of the batch commits together.
+    """
+    
+    def __init__(self, window_ms: float = DB_WRITE_BATCH_WINDOW_MS, max_batch: int = DB_WRITE_BATCH_MAX):
+        self.window_seconds = window_ms / 1000
+        self.max_batch = max_batch
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        # Recent history for the stats endpoint
+        self.batches = 0
+        self.writes = 0
+        self.batch_sizes: Counter = Counter()
+        self._commit_ms: deque = deque(maxlen=1000)
+    
+    def submit(self, func: Callable[..., Any], args: tuple) -> Future:
+        """Queue a write; the returned future resolves once its batch commits"""
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((func, args, future))
+        return future
+    
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                    self._thread.start()
+    
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window_seconds
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            # Callers that were cancelled while queued are skipped, not run
+            batch = [job for job in batch if job[2].set_running_or_notify_cancel()]
+            if batch:
+                try:
+                    self._commit_batch(batch)
+                except Exception as e:
+                    logging.error(f"Database writer failed to commit a batch: {e}")
+                    for _, _, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+    
+    def _commit_batch(self, batch: List[tuple]):
+        results = []
+        started = time.perf_counter()
+        try:
+            with db_connection() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                for func, args, _ in batch:
+                    conn.execute("SAVEPOINT batch_write")
+                    try:
+                        results.append((True, func(conn, *args)))
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO batch_write")
+                        results.append((False, e))
+                    conn.execute("RELEASE batch_write")
+                conn.commit()
+        except Exception as e:
+            # The transaction itself failed; every write in it is lost
+            results = [(False, e)] * len(batch)
+        
+        self._commit_ms.append((time.perf_counter() - started) * 1000)
+        self.batches += 1
+        self.writes += len(batch)
+        self.batch_sizes[len(batch)] += 1
+        for (_, _, future), (ok, value) in zip(batch, results):
+            # One bad future must not take down the writer thread
+            try:
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+            except Exception as e:
+                logging.error(f"Could not resolve a database write: {e}")
+    
+    def get_stats(self) -> dict:
+        """Batch size histogram and commit latency percentiles over recent batches"""
+        latencies = sorted(self._commit_ms)
+        
+        def percentile(p: float) -> float:
+            if not latencies:
+                return 0.0
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))], 3)
+        
+        return {
+            "batches": self.batches,
+            "writes": self.writes,
+            "avg_batch_size": round(self.writes / self.batches, 2) if self.batches else 0.0,
+            "batch_size_histogram": dict(sorted(self.batch_sizes.items())),
+            "commit_ms": {"p50": percentile(0.5), "p95": percentile(0.95), "p99": percentile(0.99), "max": percentile(1.0)},
+            "queued": self._queue.qsize(),
+        }
+
+class AsyncDatabase:
+    """Runs SQLite work off the event loop on dedicated threads.
+    
+    `read` and `write` take a function called as `func(conn, *args)` with a
+    pooled connection. Writes are group-committed on a single writer thread;
+    if a write function raises, only its own changes are rolled back and the
+    exception is re-raised to its caller.
+    """
+    
+    def __init__(self, reader_threads: int = DB_READER_THREADS):
+        self._readers = ThreadPoolExecutor(max_workers=reader_threads, thread_name_prefix="db-reader")
+        self.writer = GroupCommitWriter()
+    
+    async def read(self, func: Callable[..., Any], *args) -> Any:
+        """Run a read-only query function on a reader thread"""
+        return await asyncio.get_running_loop().run_in_executor(self._readers, _run_read, func, args)
+    
+    async def write(self, func: Callable[..., Any], *args) -> Any:
+        """Run a write function on the writer thread as part of the next group commit"""
+        return await asyncio.wrap_future(self.writer.submit(func, args))
+
+async_db = AsyncDatabase()
+
+# Schema migrations, applied in order. PRAGMA user_version records how many
+# have run, so each one executes exactly once per database file.
+def _migration_1_initial_schema(conn: sqlite3.Connection):
+    """Original schema with TEXT keys and ISO timestamps"""
+    conn.execute("""
         CREATE TABLE IF NOT EXISTS users (
             id TEXT PRIMARY KEY,
             username TEXT UNIQUE NOT NULL,
@@ -41,14 +307,8 @@ def init_database():
             created_at TEXT NOT NULL
         )
     """)
-    
-    # Create index on username for faster lookups
-    cursor.execute("""
-        CREATE INDEX IF NOT EXISTS idx_username ON users(username)
-    """)
-    
-    # Create saved_jobs table
-    cursor.execute("""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_username ON users(username)")
+    conn.execute("""
         CREATE TABLE IF NOT EXISTS saved_jobs (
             id TEXT PRIMARY KEY,
             user_id TEXT NOT NULL,
@@ -58,26 +318,328 @@ def init_database():
             UNIQUE(user_id, internship_id)
         )
     """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_saved_jobs_user_id ON saved_jobs(user_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_saved_jobs_internship_id ON saved_jobs(internship_id)")
+
+def _migration_2_compact_keys(conn: sqlite3.Connection):
+    """Integer keys and epoch-millisecond timestamps.
     
-    # Create indexes for faster lookups
-    cursor.execute("""
-        CREATE INDEX IF NOT EXISTS idx_saved_jobs_user_id ON saved_jobs(user_id)
+    users gets an INTEGER rowid key; the old token IDs become `public_id`, so
+    existing JWTs stay valid. saved_jobs becomes a WITHOUT ROWID table
+    clustered on (user_id, internship_id): the primary key is the only unique
+    index, and a user's saved rows sit together on disk. The redundant
+    idx_username and idx_saved_jobs_user_id indexes are dropped.
+    """
+    conn.create_function("iso_to_epoch_ms", 1, lambda value: to_epoch_ms(datetime.fromisoformat(value)))
+    conn.execute("""
+        CREATE TABLE users_v2 (
+            id INTEGER PRIMARY KEY,
+            public_id TEXT NOT NULL UNIQUE,
+            username TEXT NOT NULL UNIQUE,
+            password_hash TEXT NOT NULL,
+            created_at INTEGER NOT NULL
+        )
     """)
+    conn.execute("""
+        INSERT INTO users_v2 (public_id, username, password_hash, created_at)
+        SELECT id, username, password_hash, iso_to_epoch_ms(created_at)
+        FROM users
+        ORDER BY created_at
+    """)
+    conn.execute("""
+        CREATE TABLE saved_jobs_v2 (
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            internship_id TEXT NOT NULL,
+            saved_at INTEGER NOT NULL,
+            PRIMARY KEY (user_id, internship_id)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        INSERT INTO saved_jobs_v2 (user_id, internship_id, saved_at)
+        SELECT u.id, s.internship_id, iso_to_epoch_ms(s.saved_at)
+        FROM saved_jobs s
+        JOIN users_v2 u ON u.public_id = s.user_id
+    """)
+    conn.execute("DROP TABLE saved_jobs")
+    conn.execute("DROP TABLE users")
+    conn.execute("ALTER TABLE users_v2 RENAME TO users")
+    conn.execute("ALTER TABLE saved_jobs_v2 RENAME TO saved_jobs")
+    conn.execute("CREATE INDEX idx_saved_jobs_internship_id ON saved_jobs(internship_id)")
+
+def _migration_3_postings(conn: sqlite3.Connection):
+    """Persisted payloads for saved postings.
+    
+    A regular rowid table keeps the (1-3 KB) payloads out of the clustered
+    saved_jobs b-tree; the UNIQUE index on internship_id serves the join.
+    Rows exist only for postings someone has saved and outlive the feed.
+    
+    The feed is not loaded yet when migrations run, so existing saves get an
+    "unavailable" placeholder; the first refresh replaces the placeholders of
+    postings still in the feed, and the rest stay listed as unavailable.
+    """
+    conn.execute("""
+        CREATE TABLE postings (
+            id INTEGER PRIMARY KEY,
+            internship_id TEXT NOT NULL UNIQUE,
+            payload BLOB NOT NULL,
+            updated_at INTEGER NOT NULL
+        )
+    """)
+    rows = conn.execute("""
+        SELECT internship_id, MIN(saved_at) AS saved_at
+        FROM saved_jobs
+        GROUP BY internship_id
+    """).fetchall()
+    now = now_ms()
+    conn.executemany("""
+        INSERT INTO postings (internship_id, payload, updated_at)
+        VALUES (?, ?, ?)
+    """, [
+        (row['internship_id'], encode_posting(unavailable_posting(row['internship_id'], from_epoch_ms(row['saved_at']))), now)
+        for row in rows
+    ])
+
+def _migration_4_save_counts(conn: sqlite3.Connection):
+    """Materialized save counts and trend scores per posting.
+    
+    Kept current by the save/unsave writes themselves. Existing saves are
+    counted here; their trend scores start at zero.
+    """
+    conn.execute("""
+        CREATE TABLE save_counts (
+            internship_id TEXT PRIMARY KEY,
+            save_count INTEGER NOT NULL,
+            trend_score REAL NOT NULL,
+            trend_updated_at INTEGER NOT NULL
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        INSERT INTO save_counts (internship_id, save_count, trend_score, trend_updated_at)
+        SELECT internship_id, COUNT(*), 0.0, 0
+        FROM saved_jobs
+        GROUP BY internship_id
+    """)
+
+def _migration_5_saved_at_index(conn: sqlite3.Connection):
+    """Index for keyset pagination of a user's saved jobs, newest first.
     
-    cursor.execute("""
-        CREATE INDEX IF NOT EXISTS idx_saved_jobs_internship_id ON saved_jobs(internship_id)
+    In a WITHOUT ROWID table the index also carries the primary key, so it
+    covers (user_id, saved_at, internship_id) and pages need no table lookups.
+    """
+    conn.execute("""
+        CREATE INDEX idx_saved_jobs_user_saved_at
+        ON saved_jobs(user_id, saved_at DESC, internship_id)
+    """)
+
+def _migration_6_deadline_reminders(conn: sqlite3.Connection):
+    """Deadline reminders for saved postings.
+    
+    One row per saved job with a deadline, removed with the saved job. The
+    partial index holds only undelivered reminders, so the scheduler reads
+    the next window of due reminders as an index range. Existing saves whose
+    stored posting has an upcoming deadline get their reminder here.
+    """
+    conn.execute("""
+        CREATE TABLE deadline_reminders (
+            user_id INTEGER NOT NULL,
+            internship_id TEXT NOT NULL,
+            remind_at INTEGER NOT NULL,
+            deadline INTEGER NOT NULL,
+            delivered_at INTEGER,
+            PRIMARY KEY (user_id, internship_id)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE INDEX idx_deadline_reminders_pending
+        ON deadline_reminders(remind_at)
+        WHERE delivered_at IS NULL
+    """)
+    conn.create_function("posting_deadline", 1, _posting_deadline)
+    conn.create_function("reminder_time", 2, reminder_time)
+    conn.execute("""
+        INSERT INTO deadline_reminders (user_id, internship_id, remind_at, deadline)
+        SELECT user_id, internship_id, reminder_time(deadline, :now), deadline
+        FROM (
+            SELECT s.user_id, s.internship_id, posting_deadline(p.payload) AS deadline
+            FROM saved_jobs s
+            JOIN postings p ON p.internship_id = s.internship_id
+        )
+        WHERE reminder_time(deadline, :now) IS NOT NULL
+    """, {"now": now_ms()})
+
+def _migration_7_saved_jobs_archive(conn: sqlite3.Connection):
+    """Archive for old saved jobs and a deadline column on postings.
+    
+    Archived rows keep their compressed posting payload, so the archive stays
+    readable after the posting is dropped from the postings table.
+    """
+    conn.create_function("posting_deadline", 1, _posting_deadline)
+    conn.execute("ALTER TABLE postings ADD COLUMN deadline INTEGER")
+    conn.execute("UPDATE postings SET deadline = posting_deadline(payload)")
+    conn.execute("""
+        CREATE TABLE saved_jobs_archive (
+            user_id INTEGER NOT NULL,
+            internship_id TEXT NOT NULL,
+            saved_at INTEGER NOT NULL,
+            archived_at INTEGER NOT NULL,
+            payload BLOB,
+            PRIMARY KEY (user_id, internship_id)
+        )
     """)
+
+def _migration_8_subscribers(conn: sqlite3.Connection):
+    """Notification subscribers, previously held only in memory.
     
-    conn.commit()
-    conn.close()
+    The partial indexes contain just the subscribers who opted in to each
+    notification type, in id order, so a fan-out walks only its recipients.
+    twilio_auth_token only ever holds encrypt_secret() ciphertext.
+    """
+    conn.execute("""
+        CREATE TABLE subscribers (
+            id INTEGER PRIMARY KEY,
+            email TEXT NOT NULL UNIQUE,
+            phone TEXT NOT NULL,
+            sms_enabled INTEGER NOT NULL,
+            daily_digest INTEGER NOT NULL,
+            instant_alerts INTEGER NOT NULL,
+            twilio_account_sid TEXT,
+            twilio_auth_token TEXT,
+            twilio_phone_number TEXT,
+            updated_at INTEGER NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX idx_subscribers_daily_digest ON subscribers(id) WHERE daily_digest = 1")
+    conn.execute("CREATE INDEX idx_subscribers_instant_alerts ON subscribers(id) WHERE instant_alerts = 1")
+
+MIGRATIONS = [
+    _migration_1_initial_schema,
+    _migration_2_compact_keys,
+    _migration_3_postings,
+    _migration_4_save_counts,
+    _migration_5_saved_at_index,
+    _migration_6_deadline_reminders,
+    _migration_7_saved_jobs_archive,
+    _migration_8_subscribers,
+]
+
+def init_database():
+    """Initialize the database, applying any pending schema migrations"""
+    conn = get_db_connection()
+    try:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                migration(conn)
+                conn.execute(f"PRAGMA user_version = {number}")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            print(f"Applied database migration {number}: {migration.__name__}")
+        
+        # Incremental auto-vacuum lets the maintenance task return free pages
+        # in small steps. Converting an existing file needs a full VACUUM,
+        # which rewrites it under an exclusive lock, so that is left to an
+        # explicit maintenance step.
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            logging.warning(
+                "Incremental auto-vacuum is off for this database, so maintenance cannot return free pages. "
+                "Enable it during a maintenance window with `python db_maintenance.py --enable-incremental-vacuum` "
+                "(a one-time VACUUM that rewrites the whole file and blocks all access while it runs)."
+            )
+    finally:
+        conn.close()
     print(f"Database initialized at: {DB_PATH}")
 
+def now_ms() -> int:
+    """The current time in integer epoch milliseconds"""
+    return int(time.time() * 1000)
+
+def to_epoch_ms(value: datetime) -> int:
+    """Convert a (naive, local) datetime to integer epoch milliseconds"""
+    return int(value.timestamp() * 1000)
+
+def from_epoch_ms(value: int) -> datetime:
+    """Convert integer epoch milliseconds to a naive local datetime"""
+    return datetime.fromtimestamp(value / 1000)
+
+def saved_job_public_id(user_id: int, internship_id: str) -> str:
+    """Opaque, stable public ID for a saved job (its key is (user_id, internship_id))"""
+    digest = hashlib.blake2b(f"{user_id}:{internship_id}".encode("utf-8"), digest_size=12).digest()
+    return base64.urlsafe_b64encode(digest).decode("ascii")
+
+def encode_posting(internship: Internship) -> bytes:
+    """Compress a posting's JSON for the postings table"""
+    return zlib.compress(internship.model_dump_json().encode("utf-8"))
+
+def decode_posting(payload: bytes) -> bytes:
+    """JSON bytes of a stored posting"""
+    return zlib.decompress(payload)
+
+def unavailable_posting(internship_id: str, posted_date: datetime) -> Internship:
+    """Placeholder for a saved posting whose details were never stored"""
+    return Internship(
+        id=internship_id,
+        title="No longer available",
+        company="",
+        location="",
+        description="This posting is no longer available.",
+        posted_date=posted_date,
+        source_url="",
+        source=""
+    )
+
+def _secrets_cipher() -> Optional[Fernet]:
+    if not SUBSCRIBER_SECRETS_KEY:
+        return None
+    # Any passphrase works; Fernet needs exactly 32 url-safe base64 bytes
+    key = hashlib.sha256(SUBSCRIBER_SECRETS_KEY.encode("utf-8")).digest()
+    return Fernet(base64.urlsafe_b64encode(key))
+
+def can_store_secrets() -> bool:
+    """Whether a key is configured for storing subscriber credentials"""
+    return bool(SUBSCRIBER_SECRETS_KEY)
+
+def encrypt_secret(value: Optional[str]) -> Optional[str]:
+    """Encrypt a credential for storage; raises ValueError when no key is configured"""
+    if value is None:
+        return None
+    cipher = _secrets_cipher()
+    if cipher is None:
+        raise ValueError("SUBSCRIBER_SECRETS_KEY is not set; subscriber credentials cannot be stored")
+    return _SECRET_PREFIX + cipher.encrypt(value.encode("utf-8")).decode("ascii")
+
+def decrypt_secret(value: Optional[str]) -> Optional[str]:
+    """Decrypt a stored credential; None if it is missing or the key cannot open it"""
+    cipher = _secrets_cipher()
+    if value is None or cipher is None or not value.startswith(_SECRET_PREFIX):
+        return None
+    try:
+        return cipher.decrypt(value[len(_SECRET_PREFIX):].encode("ascii")).decode("utf-8")
+    except InvalidToken:
+        logging.warning("Could not decrypt a stored subscriber credential (was SUBSCRIBER_SECRETS_KEY changed?)")
+        return None
+
+def posting_deadline_ms(internship: Internship) -> Optional[int]:
+    """A posting's application deadline in epoch ms, if it has one"""
+    return to_epoch_ms(internship.application_deadline) if internship.application_deadline else None
+
+def reminder_time(deadline: Optional[int], now: int) -> Optional[int]:
+    """When to remind about a deadline (epoch ms) as of `now`, or None if it is unknown or past"""
+    if deadline is None or deadline <= now:
+        return None
+    return max(now, deadline - int(REMINDER_DAYS_BEFORE * 24 * 60 * 60 * 1000))
+
+def _posting_deadline(payload: bytes) -> Optional[int]:
+    return posting_deadline_ms(Internship.model_validate_json(decode_posting(payload)))
+
 def user_from_row(row: sqlite3.Row) -> User:
     """Convert a database row to a User model"""
     return User(
-        id=row['id'],
+        id=row['public_id'],
+        internal_id=row['id'],
         username=row['username'],
         password_hash=row['password_hash'],
-        created_at=datetime.fromisoformat(row['created_at'])
+        created_at=from_epoch_ms(row['created_at'])
     )
-
@@ -0,0 +1,186 @@
+"""
+Periodic SQLite maintenance: query planner statistics, incremental vacuum
+and WAL checkpoints, done in small steps alongside request traffic
+
+Run as a script to switch an existing database to incremental auto-vacuum
+(a one-time full VACUUM; stop the API or run it in a maintenance window).
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from collections import deque
+from datetime import datetime
+from typing import Optional
+from database import DB_PATH, async_db, get_db_connection
+
+DB_MAINTENANCE_INTERVAL_MINUTES = float(os.getenv("DB_MAINTENANCE_INTERVAL_MINUTES", "60"))
+# Each vacuum step should hold the write lock for at most this long; the page
+# count per step adapts to stay inside it
+DB_MAINTENANCE_STEP_BUDGET_MS = float(os.getenv("DB_MAINTENANCE_STEP_BUDGET_MS", "20"))
+# Vacuuming stops for this run once it has used this much time in total
+DB_MAINTENANCE_RUN_BUDGET_MS = float(os.getenv("DB_MAINTENANCE_RUN_BUDGET_MS", "1000"))
+DB_VACUUM_INITIAL_PAGES = 64
+DB_VACUUM_MAX_PAGES = 4096
+# Rows ANALYZE samples per index, keeping PRAGMA optimize cheap on big tables
+DB_ANALYSIS_LIMIT = int(os.getenv("DB_ANALYSIS_LIMIT", "1000"))
+
+def _optimize(conn: sqlite3.Connection):
+    conn.execute(f"PRAGMA analysis_limit = {DB_ANALYSIS_LIMIT}")
+    # 0x10002: also analyze tables that have never been analyzed
+    conn.execute("PRAGMA optimize = 0x10002").fetchall()
+
+def _incremental_vacuum(conn: sqlite3.Connection, pages: int) -> int:
+    before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    # The pragma frees one page per sqlite3_step, but the sqlite3 module steps
+    # statements without result columns only once, so step it per page
+    for _ in range(min(pages, before)):
+        conn.execute("PRAGMA incremental_vacuum(1)")
+    return before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+def _file_stats(conn: sqlite3.Connection) -> dict:
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    wal_path = f"{DB_PATH}-wal"
+    return {
+        "db_size_bytes": page_size * page_count,
+        "wal_size_bytes": os.path.getsize(wal_path) if os.path.exists(wal_path) else 0,
+        "page_count": page_count,
+        "freelist_pages": freelist,
+        "incremental_vacuum": conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2,
+    }
+
+def enable_incremental_vacuum() -> bool:
+    """Switch the database to incremental auto-vacuum; returns False if it already was.
+    
+    Runs a full VACUUM, which rewrites the file and holds an exclusive lock
+    throughout, so it is not done by the running API.
+    """
+    conn = get_db_connection()
+    try:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            return False
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        return True
+    finally:
+        conn.close()
+
+class DatabaseMaintenance:
+    """Runs PRAGMA optimize, incremental vacuum and a WAL checkpoint per pass.
+    
+    Optimize and vacuum steps go through the group-commit writer, so they
+    queue behind (and between) user writes instead of competing for the lock.
+    The checkpoint runs on its own connection in PASSIVE mode and never waits
+    on readers or writers.
+    """
+    
+    def __init__(self):
+        self.runs = 0
+        self.last_run_at: Optional[datetime] = None
+        self.last_run: dict = {}
+        self.vacuum_pages = DB_VACUUM_INITIAL_PAGES
+        self._checkpoint_ms: deque = deque(maxlen=100)
+        self._lock = asyncio.Lock()
+    
+    async def run(self) -> dict:
+        """One maintenance pass; returns what it did"""
+        async with self._lock:
+            started = time.perf_counter()
+            report = {}
+            
+            step_started = time.perf_counter()
+            await async_db.write(_optimize)
+            report["optimize_ms"] = round((time.perf_counter() - step_started) * 1000, 3)
+            
+            report.update(await self._vacuum())
+            report.update(await asyncio.to_thread(self._checkpoint))
+            
+            report["duration_ms"] = round((time.perf_counter() - started) * 1000, 3)
+            self.runs += 1
+            self.last_run_at = datetime.now()
+            self.last_run = report
+            return report
+    
+    async def _vacuum(self) -> dict:
+        """Free pages in steps sized to the per-step latency budget"""
+        freed = 0
+        steps = 0
+        spent_ms = 0.0
+        while spent_ms < DB_MAINTENANCE_RUN_BUDGET_MS:
+            step_started = time.perf_counter()
+            step_freed = await async_db.write(_incremental_vacuum, self.vacuum_pages)
+            step_ms = (time.perf_counter() - step_started) * 1000
+            spent_ms += step_ms
+            freed += step_freed
+            steps += 1
+            if step_freed < self.vacuum_pages:
+                break
+            
+            if step_ms > DB_MAINTENANCE_STEP_BUDGET_MS:
+                self.vacuum_pages = max(1, self.vacuum_pages // 2)
+            elif step_ms < DB_MAINTENANCE_STEP_BUDGET_MS / 2:
+                self.vacuum_pages = min(DB_VACUUM_MAX_PAGES, self.vacuum_pages * 2)
+            # Let queued requests run between steps
+            await asyncio.sleep(0)
+        else:
+            logging.info(f"Incremental vacuum stopped at the run budget after freeing {freed} pages; resuming next pass")
+        return {"vacuum_pages_freed": freed, "vacuum_steps": steps, "vacuum_ms": round(spent_ms, 3)}
+    
+    def _checkpoint(self) -> dict:
+        conn = get_db_connection()
+        try:
+            started = time.perf_counter()
+            busy, wal_frames, checkpointed = conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+            elapsed_ms = (time.perf_counter() - started) * 1000
+        finally:
+            conn.close()
+        self._checkpoint_ms.append(elapsed_ms)
+        if busy or checkpointed < wal_frames:
+            # Long-lived readers keep the WAL from being reset; it grows until they finish
+            logging.warning(
+                f"WAL checkpoint incomplete: {checkpointed}/{wal_frames} frames copied"
+                f"{' (database busy)' if busy else ''}"
+            )
+        return {
+            "checkpoint_ms": round(elapsed_ms, 3),
+            "checkpoint_busy": bool(busy),
+            "wal_frames": wal_frames,
+            "checkpointed_frames": checkpointed,
+        }
+    
+    async def get_stats(self) -> dict:
+        """Current file sizes plus results of recent passes"""
+        files = await async_db.read(_file_stats)
+        durations = sorted(self._checkpoint_ms)
+        return {
+            **files,
+            "runs": self.runs,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+            "last_run": self.last_run,
+            "vacuum_pages_per_step": self.vacuum_pages,
+            "checkpoint_ms": {
+                "p50": round(durations[len(durations) // 2], 3) if durations else 0.0,
+                "max": round(durations[-1], 3) if durations else 0.0,
+            },
+        }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--enable-incremental-vacuum",
+        action="store_true",
+        help="switch the database at DB_PATH to incremental auto-vacuum with a one-time full VACUUM"
+    )
+    args = parser.parse_args()
+    if not args.enable_incremental_vacuum:
+        parser.print_help()
+    else:
+        started = time.perf_counter()
+        if enable_incremental_vacuum():
+            print(f"Enabled incremental auto-vacuum on {DB_PATH} in {time.perf_counter() - started:.1f}s")
+        else:
+            print(f"Incremental auto-vacuum is already enabled on {DB_PATH}")
@@ -0,0 +1,391 @@
+"""
+Email transports for notifications
+"""
+import asyncio
+import base64
+import logging
+import os
+import re
+import ssl
+from email import policy
+from email.message import Message
+from email.utils import getaddresses, parseaddr
+from typing import List, Optional, Tuple
+
+# SMTP relay settings
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_TIMEOUT_SECONDS = float(os.getenv("SMTP_TIMEOUT_SECONDS", "30"))
+# Authenticated sessions kept open to the relay
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "4"))
+# Messages written back-to-back on one session before reading their replies
+SMTP_PIPELINE_DEPTH = int(os.getenv("SMTP_PIPELINE_DEPTH", "16"))
+# Sessions are closed and reopened after this many messages, or when idle this long
+SMTP_MESSAGES_PER_SESSION = int(os.getenv("SMTP_MESSAGES_PER_SESSION", "100"))
+SMTP_IDLE_TIMEOUT_SECONDS = float(os.getenv("SMTP_IDLE_TIMEOUT_SECONDS", "30"))
+# Tries per message across reconnects
+SMTP_MAX_ATTEMPTS = 3
+
+_LEADING_DOT = re.compile(rb"^\.", re.MULTILINE)
+
+class EmailDeliveryError(Exception):
+    """A message could not be handed to the mail server"""
+
+class EmailTransport:
+    """Interface for sending a fully built email message"""
+
+    async def send(self, message: Message):
+        """Deliver `message` to its To/Cc/Bcc recipients; raises EmailDeliveryError on failure"""
+        raise NotImplementedError
+
+    async def close(self):
+        """Release connections; the transport may not be used afterwards"""
+
+    def get_stats(self) -> dict:
+        return {}
+
+class LoggingTransport(EmailTransport):
+    """Logs messages instead of sending them (local development)"""
+
+    def __init__(self):
+        self.sent = 0
+
+    async def send(self, message: Message):
+        self.sent += 1
+        logging.info(f"Email to {message['To']}: {message['Subject']}")
+
+    def get_stats(self) -> dict:
+        return {"transport": "log", "sent": self.sent}
+
+class SMTPReplyError(EmailDeliveryError):
+    def __init__(self, code: int, text: str):
+        super().__init__(f"{code} {text}")
+        self.code = code
+
+class _Job:
+    __slots__ = ("sender", "recipients", "data", "future", "attempts")
+
+    def __init__(self, sender: str, recipients: List[str], data: bytes, future: asyncio.Future):
+        self.sender = sender
+        self.recipients = recipients
+        self.data = data
+        self.future = future
+        self.attempts = 0
+
+class _SMTPSession:
+    """One authenticated connection to the relay"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, timeout: float):
+        self.reader = reader
+        self.writer = writer
+        self.timeout = timeout
+        self.extensions = set()
+        self.auth_methods = set()
+        self.encrypted = False
+        self.messages = 0
+
+    async def reply(self) -> Tuple[int, str]:
+        lines = []
+        while True:
+            line = await asyncio.wait_for(self.reader.readline(), self.timeout)
+            if len(line) < 4 or not line[:3].isdigit():
+                raise ConnectionError(f"Malformed SMTP reply: {line!r}")
+            lines.append(line[4:].decode("utf-8", "replace").rstrip())
+            if line[3:4] != b"-":
+                return int(line[:3]), "\n".join(lines)
+
+    async def exchange(self, line: str) -> Tuple[int, str]:
+        self.writer.write(line.encode() + b"\r\n")
+        return await self.reply()
+
+    async def command(self, line: str, expect: Tuple[int, ...] = (250,)) -> Tuple[int, str]:
+        code, text = await self.exchange(line)
+        if code not in expect:
+            raise SMTPReplyError(code, text)
+        return code, text
+
+    async def ehlo(self, hostname: str):
+        _, text = await self.command(f"EHLO {hostname}")
+        self.extensions = set()
+        for line in text.splitlines()[1:]:
+            keyword, _, params = line.partition(" ")
+            self.extensions.add(keyword.upper())
+            if keyword.upper() == "AUTH":
+                self.auth_methods = set(params.upper().split())
+
+    async def quit(self):
+        try:
+            self.writer.write(b"QUIT\r\n")
+            await asyncio.wait_for(self.writer.drain(), 1)
+        except Exception:
+            pass
+        self.abort()
+
+    def abort(self):
+        self.writer.close()
+
+class SMTPTransport(EmailTransport):
+    """Async SMTP client with a pool of authenticated, pipelined sessions.
+
+    send() queues the message; up to `pool_size` workers each hold one
+    session (connect, STARTTLS and login happen once per session, not per
+    message) and drain the queue. Where the server supports PIPELINING a
+    worker writes a message's MAIL/RCPT/DATA together with the previous
+    message's body, so a message costs one round trip, where smtplib spent
+    four plus a connect, STARTTLS and login. A broken session is dropped and reopened, and the messages
+    whose outcome is unknown are retried on the new one; a rejected
+    recipient or message only fails that send() call.
+    """
+
+    def __init__(
+        self,
+        host: str = SMTP_HOST,
+        port: int = SMTP_PORT,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        starttls: bool = True,
+        tls_context: Optional[ssl.SSLContext] = None,
+        pool_size: int = SMTP_POOL_SIZE,
+        pipeline_depth: int = SMTP_PIPELINE_DEPTH,
+        messages_per_session: int = SMTP_MESSAGES_PER_SESSION,
+        idle_timeout: float = SMTP_IDLE_TIMEOUT_SECONDS,
+        timeout: float = SMTP_TIMEOUT_SECONDS
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.tls_context = tls_context or ssl.create_default_context()
+        self.pool_size = pool_size
+        self.pipeline_depth = pipeline_depth
+        self.messages_per_session = messages_per_session
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._sessions = set()
+        self.sessions_opened = 0
+        self.reconnects = 0
+        self.sent = 0
+        self.failed = 0
+        self.batches = 0
+
+    async def send(self, message: Message):
+        sender = parseaddr(message["From"] or "")[1]
+        recipients = [
+            address for _, address in getaddresses(message.get_all("To", []) + message.get_all("Cc", []) + message.get_all("Bcc", []))
+            if address
+        ]
+        if not sender or not recipients:
+            raise EmailDeliveryError("Message needs a From and at least one recipient")
+        del message["Bcc"]
+        data = _LEADING_DOT.sub(b"..", message.as_bytes(policy=policy.SMTP))
+        if not data.endswith(b"\r\n"):
+            data += b"\r\n"
+
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.pool_size)]
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(_Job(sender, recipients, data, future))
+        await future
+
+    async def close(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        # Fail whatever no worker picked up, so no send() waits forever
+        while self._queue is not None and not self._queue.empty():
+            job = self._queue.get_nowait()
+            if not job.future.done():
+                job.future.set_exception(EmailDeliveryError("Transport closed"))
+        self._queue = None
+        for session in list(self._sessions):
+            await session.quit()
+        self._sessions.clear()
+
+    async def _worker(self):
+        session: Optional[_SMTPSession] = None
+        batch: List[_Job] = []
+        failures = 0
+        while True:
+            try:
+                if not batch:
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), self.idle_timeout if session else None))
+                    except asyncio.TimeoutError:
+                        await self._close_session(session)
+                        session = None
+                        continue
+                while len(batch) < self.pipeline_depth and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+
+                if session is None:
+                    session = await self._open_session()
+                batch = await self._send_batch(session, batch)
+                failures = 0
+                if session.messages >= self.messages_per_session:
+                    await self._close_session(session)
+                    session = None
+            except asyncio.CancelledError:
+                for job in batch:
+                    if not job.future.done():
+                        job.future.set_exception(EmailDeliveryError("Transport closed"))
+                await self._close_session(session)
+                raise
+            except Exception as e:
+                # Session broken (or could not be opened); retry what is unresolved on a new one
+                logging.warning(f"SMTP session to {self.host}:{self.port} failed: {e}")
+                if session is not None:
+                    self.reconnects += 1
+                    self._sessions.discard(session)
+                    session.abort()
+                    session = None
+                failures += 1
+                retry = []
+                for job in batch:
+                    if job.future.done():
+                        continue
+                    job.attempts += 1
+                    if job.attempts >= SMTP_MAX_ATTEMPTS:
+                        self._fail(job, EmailDeliveryError(f"SMTP send failed after {job.attempts} attempts: {e}"))
+                    else:
+                        retry.append(job)
+                batch = retry
+                await asyncio.sleep(min(5.0, 0.1 * 2 ** (failures - 1)))
+
+    async def _open_session(self) -> _SMTPSession:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+        session = _SMTPSession(reader, writer, self.timeout)
+        self._sessions.add(session)
+        try:
+            code, text = await session.reply()
+            if code != 220:
+                raise SMTPReplyError(code, text)
+            await session.ehlo("localhost")
+            if self.starttls:
+                # A missing STARTTLS may be a downgrade attack; never continue in cleartext
+                if "STARTTLS" not in session.extensions:
+                    raise EmailDeliveryError(f"{self.host}:{self.port} does not offer STARTTLS")
+                await session.command("STARTTLS", expect=(220,))
+                await asyncio.wait_for(writer.start_tls(self.tls_context, server_hostname=self.host), self.timeout)
+                session.encrypted = True
+                await session.ehlo("localhost")
+            if self.username:
+                if not session.encrypted:
+                    raise EmailDeliveryError("Refusing to send SMTP credentials over an unencrypted connection")
+                await self._login(session)
+        except BaseException:
+            self._sessions.discard(session)
+            session.abort()
+            raise
+        self.sessions_opened += 1
+        return session
+
+    async def _login(self, session: _SMTPSession):
+        if "PLAIN" in session.auth_methods or not session.auth_methods:
+            token = base64.b64encode(f"\0{self.username}\0{self.password}".encode()).decode()
+            await session.command(f"AUTH PLAIN {token}", expect=(235,))
+        else:
+            await session.command("AUTH LOGIN", expect=(334,))
+            await session.command(base64.b64encode(self.username.encode()).decode(), expect=(334,))
+            await session.command(base64.b64encode(self.password.encode()).decode(), expect=(235,))
+
+    async def _close_session(self, session: Optional[_SMTPSession]):
+        if session is not None:
+            self._sessions.discard(session)
+            await session.quit()
+
+    async def _send_batch(self, session: _SMTPSession, batch: List[_Job]) -> List[_Job]:
+        """Send `batch` on `session`; returns [] once every job is resolved"""
+        self.batches += 1
+        pipelining = "PIPELINING" in session.extensions
+        writer = session.writer
+
+        def envelope(job: _Job) -> bytes:
+            lines = [f"MAIL FROM:<{job.sender}>"] + [f"RCPT TO:<{r}>" for r in job.recipients] + ["DATA"]
+            return "".join(line + "\r\n" for line in lines).encode()
+
+        if pipelining:
+            writer.write(envelope(batch[0]))
+        for index, job in enumerate(batch):
+            next_job = batch[index + 1] if index + 1 < len(batch) else None
+
+            if pipelining:
+                mail_code, mail_text = await session.reply()
+                rcpt_replies = [await session.reply() for _ in job.recipients]
+                data_code, data_text = await session.reply()
+            else:
+                mail_code, mail_text = await session.exchange(f"MAIL FROM:<{job.sender}>")
+                if mail_code != 250:
+                    # Sender refused; end the transaction before any RCPT or DATA
+                    await session.exchange("RSET")
+                    self._fail(job, SMTPReplyError(mail_code, mail_text))
+                    continue
+                rcpt_replies = [await session.exchange(f"RCPT TO:<{r}>") for r in job.recipients]
+                data_code, data_text = await session.exchange("DATA")
+            accepted = 0
+            rejection = None
+            for code, text in rcpt_replies:
+                if code in (250, 251):
+                    accepted += 1
+                else:
+                    rejection = rejection or SMTPReplyError(code, text)
+
+            if data_code == 354:
+                writer.write(job.data + b".\r\n")
+                if pipelining and next_job is not None:
+                    writer.write(envelope(next_job))
+                code, text = await session.reply()
+                session.messages += 1
+                if code == 250 and accepted:
+                    self.sent += 1
+                    if not job.future.done():
+                        job.future.set_result(None)
+                else:
+                    self._fail(job, rejection if code == 250 else SMTPReplyError(code, text))
+            else:
+                # Envelope refused; reset the transaction before the next one
+                writer.write(b"RSET\r\n")
+                if pipelining and next_job is not None:
+                    writer.write(envelope(next_job))
+                await session.reply()
+                if mail_code != 250:
+                    error = SMTPReplyError(mail_code, mail_text)
+                else:
+                    error = rejection or SMTPReplyError(data_code, data_text)
+                self._fail(job, error)
+        return []
+
+    def _fail(self, job: _Job, error: Exception):
+        self.failed += 1
+        if not job.future.done():
+            job.future.set_exception(error)
+
+    def get_stats(self) -> dict:
+        return {
+            "transport": "smtp",
+            "host": f"{self.host}:{self.port}",
+            "pool_size": self.pool_size,
+            "open_sessions": len(self._sessions),
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "sessions_opened": self.sessions_opened,
+            "reconnects": self.reconnects,
+            "sent": self.sent,
+            "failed": self.failed,
+            "avg_batch": round((self.sent + self.failed) / self.batches, 1) if self.batches else 0.0,
+        }
+
+def create_email_transport() -> EmailTransport:
+    """Transport selected by EMAIL_TRANSPORT: "smtp" (default) or "log" """
+    kind = os.getenv("EMAIL_TRANSPORT", "smtp").lower()
+    if kind == "log":
+        return LoggingTransport()
+    if kind != "smtp":
+        raise ValueError(f"Unknown EMAIL_TRANSPORT: {kind}")
+    return SMTPTransport(
+        username=os.getenv("NOTIFICATION_EMAIL", "your-app@gmail.com"),
+        password=os.getenv("NOTIFICATION_PASSWORD", "your-app-password")
+    )
@@ -0,0 +1,104 @@
+"""
+Login throttling to keep bcrypt verification from being used as a CPU sink
+"""
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+LOGIN_MAX_ATTEMPTS_PER_USERNAME = int(os.getenv("LOGIN_MAX_ATTEMPTS_PER_USERNAME", "10"))
+LOGIN_MAX_ATTEMPTS_PER_IP = int(os.getenv("LOGIN_MAX_ATTEMPTS_PER_IP", "30"))
+LOGIN_WINDOW_SECONDS = float(os.getenv("LOGIN_WINDOW_SECONDS", "60"))
+# Upper bound on tracked keys per limiter; least recently seen keys are dropped first
+LOGIN_THROTTLE_MAX_KEYS = int(os.getenv("LOGIN_THROTTLE_MAX_KEYS", "100000"))
+
+class SlidingWindowLimiter:
+    """Sliding-window rate limiter with constant state per key.
+    
+    Uses the two-bucket approximation: the previous window's count is weighted
+    by how much of it still overlaps the sliding window. Each key costs one
+    small tuple, and the key set is capped with LRU eviction.
+    """
+    
+    def __init__(self, limit: int, window_seconds: float, max_keys: int = LOGIN_THROTTLE_MAX_KEYS):
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self.max_keys = max_keys
+        # key -> (window index, previous window count, current window count)
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.allowed = 0
+        self.rejected = 0
+        self.evictions = 0
+    
+    def hit(self, key: Hashable, now: Optional[float] = None) -> float:
+        """Record an attempt. Returns 0 if allowed, else seconds until a retry may succeed."""
+        now = time.monotonic() if now is None else now
+        window = int(now // self.window_seconds)
+        previous, current = 0, 0
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry_window, entry_previous, entry_current = entry
+            if entry_window == window:
+                previous, current = entry_previous, entry_current
+            elif entry_window == window - 1:
+                previous = entry_current
+        
+        elapsed = now - window * self.window_seconds
+        estimated = previous * (1 - elapsed / self.window_seconds) + current
+        if estimated + 1 > self.limit:
+            self._store(key, (window, previous, current))
+            self.rejected += 1
+            if current >= self.limit or previous == 0:
+                return self.window_seconds - elapsed
+            # Time until enough of the previous window slides out to admit one more
+            needed = (estimated + 1 - self.limit) / previous * self.window_seconds
+            return min(needed, self.window_seconds - elapsed)
+        
+        self._store(key, (window, previous, current + 1))
+        self.allowed += 1
+        return 0.0
+    
+    def _store(self, key: Hashable, entry: tuple):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_keys:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+    
+    def get_stats(self) -> dict:
+        """Allow/reject counters and tracked key count"""
+        return {
+            "limit": self.limit,
+            "window_seconds": self.window_seconds,
+            "tracked_keys": len(self._entries),
+            "max_keys": self.max_keys,
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "evictions": self.evictions,
+        }
+
+class LoginThrottle:
+    """Per-client-IP and per-username limits on login attempts"""
+    
+    def __init__(self):
+        self.by_ip = SlidingWindowLimiter(LOGIN_MAX_ATTEMPTS_PER_IP, LOGIN_WINDOW_SECONDS)
+        self.by_username = SlidingWindowLimiter(LOGIN_MAX_ATTEMPTS_PER_USERNAME, LOGIN_WINDOW_SECONDS)
+    
+    def check(self, username: str, client_ip: Optional[str]) -> int:
+        """Record a login attempt. Returns 0 if allowed, else a Retry-After in whole seconds."""
+        if client_ip:
+            retry_after = self.by_ip.hit(client_ip)
+            if retry_after:
+                return max(1, math.ceil(retry_after))
+        retry_after = self.by_username.hit(username.lower())
+        if retry_after:
+            return max(1, math.ceil(retry_after))
+        return 0
+    
+    def get_stats(self) -> dict:
+        """Counters for both limiters"""
+        return {
+            "by_ip": self.by_ip.get_stats(),
+            "by_username": self.by_username.get_stats(),
+        }
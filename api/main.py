@@ -1,14 +1,19 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends, Header
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends, Header, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
 import uvicorn
 import asyncio
 import logging
-from models import Internship, NotificationPreferences, UserRegister, UserLogin, Token, UserResponse, SavedJobCreate, SavedJobResponse
+from models import Internship, InternshipListing, InternshipFilters, NotificationPreferences, UserRegister, UserLogin, Token, UserResponse, SavedJobCreate, SavedJobResponse, DeadlineReminder
 from services import InternshipService
 from notification_service import NotificationService
 from user_service import UserService
-from saved_jobs_service import SavedJobsService
+from saved_jobs_service import SavedJobsService, ARCHIVE_INTERVAL_HOURS
+from login_throttle import LoginThrottle
+from database import async_db
+from backup_service import BackupService, BACKUP_INTERVAL_HOURS
+from db_maintenance import DatabaseMaintenance, DB_MAINTENANCE_INTERVAL_MINUTES
 
 app = FastAPI(title="Internship Aggregator API", version="1.1.0")
 
@@ -19,6 +24,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count", "X-Next-Cursor", "ETag"],  # pagination and caching headers
 )
 
 # Initialize services
@@ -26,6 +32,9 @@ internship_service = InternshipService()
 notification_service = NotificationService()
 user_service = UserService()
 saved_jobs_service = SavedJobsService(internship_service)
+login_throttle = LoginThrottle()
+backup_service = BackupService()
+db_maintenance = DatabaseMaintenance()
 
 # Background task for periodic refresh and notifications
 async def periodic_refresh():
@@ -47,29 +56,101 @@ async def periodic_refresh():
             logging.error(f"Error in periodic refresh: {e}")
             await asyncio.sleep(60 * 60)  # Wait 1 hour before retrying
 
+# Background task for online database backups
+async def periodic_backup():
+    while True:
+        await asyncio.sleep(BACKUP_INTERVAL_HOURS * 60 * 60)
+        try:
+            path = await backup_service.run_backup()
+            logging.info(f"Scheduled database backup completed: {path}")
+        except Exception as e:
+            logging.error(f"Error in periodic backup: {e}")
+
+# Background task for SQLite statistics, vacuum and WAL checkpoints
+async def periodic_maintenance():
+    while True:
+        await asyncio.sleep(DB_MAINTENANCE_INTERVAL_MINUTES * 60)
+        try:
+            report = await db_maintenance.run()
+            logging.info(f"Database maintenance completed: {report}")
+        except Exception as e:
+            logging.error(f"Error in database maintenance: {e}")
+
+# Background task moving expired saved jobs to the archive
+async def periodic_archival():
+    while True:
+        await asyncio.sleep(ARCHIVE_INTERVAL_HOURS * 60 * 60)
+        try:
+            report = await saved_jobs_service.archive_saved_jobs()
+            logging.info(f"Saved jobs archival completed: {report}")
+        except Exception as e:
+            logging.error(f"Error in saved jobs archival: {e}")
+
 @app.on_event("startup")
 async def startup_event():
     logging.basicConfig(level=logging.INFO)
     logging.info("Application startup: Initializing services...")
     
     # Initial data load
+    await saved_jobs_service.load_save_counts()
     await internship_service.fetch_and_store_internships()
     logging.info("Initial internship data loaded.")
     
-    # Start background task
+    # Start background tasks
     asyncio.create_task(periodic_refresh())
+    asyncio.create_task(periodic_backup())
+    asyncio.create_task(periodic_maintenance())
+    asyncio.create_task(periodic_archival())
+    asyncio.create_task(saved_jobs_service.reminders.run())
     logging.info("Background tasks started.")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Close notification transport connections"""
+    await notification_service.close()
+
 @app.get("/")
 async def root():
     return {"message": "Internship Aggregator API"}
 
-@app.get("/internships", response_model=List[Internship])
-async def get_internships():
-    """Get all available internship postings"""
+def get_internship_filters(
+    search: Optional[str] = Query(None, description="Match on title, company, location or description"),
+    location: Optional[str] = Query(None, description="Exact location"),
+    company: Optional[str] = Query(None, description="Exact company name"),
+    remote_only: bool = Query(False, description="Only remote postings"),
+    salary_range: Optional[str] = Query(None, description="One of: paid, unpaid, competitive, hourly")
+) -> InternshipFilters:
+    """Shared query parameters for filtering internship listings"""
+    return InternshipFilters(
+        search=search,
+        location=location,
+        company=company,
+        remote_only=remote_only,
+        salary_range=salary_range
+    )
+
+@app.get("/internships", response_model=List[InternshipListing])
+async def get_internships(
+    fields: Optional[str] = Query(
+        None,
+        description="Projection: 'full', 'summary' (no description/requirements/duration) or a comma-separated field list"
+    ),
+    filters: InternshipFilters = Depends(get_internship_filters),
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=1000)
+):
+    """Get available internship postings, optionally filtered and paginated.
+    
+    The total number of matches is returned in the X-Total-Count header.
+    """
+    try:
+        projection = internship_service.resolve_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     try:
-        internships = await internship_service.get_internships()
-        return internships
+        body, total = await internship_service.get_internships_json(projection, filters, offset, limit)
+        return Response(content=body, media_type="application/json", headers={"X-Total-Count": str(total)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching internships: {str(e)}")
 
@@ -82,11 +163,120 @@ async def refresh_internships():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error refreshing internships: {str(e)}")
 
+@app.get("/internships/export")
+async def export_internships(
+    export_format: str = Query("ndjson", alias="format", description="Export format: ndjson or csv"),
+    fields: Optional[str] = Query(None, description="Same projections as GET /internships"),
+    filters: InternshipFilters = Depends(get_internship_filters)
+):
+    """Stream the current internship snapshot as NDJSON or CSV"""
+    try:
+        projection = internship_service.resolve_fields(fields)
+        chunks = await internship_service.export_internships(export_format, projection, filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    media_type = "application/x-ndjson" if export_format == "ndjson" else "text/csv"
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="internships.{export_format}"'}
+    )
+
+@app.get("/internships/suggest")
+async def suggest_internship_values(
+    field: str = Query(..., description="Field to complete: company or location"),
+    prefix: str = Query("", description="Case-insensitive prefix"),
+    limit: int = Query(10, ge=1, le=50)
+):
+    """Typeahead completions for the company and location filters, most frequent first"""
+    try:
+        completions = await internship_service.suggest(field, prefix, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {
+        "field": field,
+        "prefix": prefix,
+        "suggestions": [{"value": value, "count": count} for value, count in completions]
+    }
+
+@app.get("/internships/trending", response_model=List[InternshipListing])
+async def get_trending_internships(
+    fields: Optional[str] = Query(None, description="Projection, as for GET /internships"),
+    limit: int = Query(10, ge=1, le=100)
+):
+    """Most-saved current postings, with recent saves weighted more heavily"""
+    try:
+        projection = internship_service.resolve_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    body = await internship_service.get_trending_json(projection, limit)
+    return Response(content=body, media_type="application/json")
+
+@app.get("/internships/cache/stats")
+async def get_internship_cache_stats():
+    """Snapshot version and query cache hit/miss counters (admin endpoint)"""
+    return {
+        "cache_version": internship_service.cache_version,
+        "internship_count": len(internship_service.internships_cache),
+        "query_cache": internship_service.query_cache.get_stats(),
+        "save_counts": internship_service.save_counts.get_stats()
+    }
+
+@app.get("/internships/{internship_id}", response_model=Internship)
+async def get_internship(internship_id: str):
+    """Get a single internship posting, including its full description"""
+    internship = await internship_service.get_internship(internship_id)
+    if not internship:
+        raise HTTPException(status_code=404, detail="Internship not found")
+    return internship
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
     return {"status": "healthy"}
 
+@app.get("/db/stats")
+async def get_db_stats():
+    """Write batching, maintenance, saved-ID cache, archival and backup metrics (admin endpoint)"""
+    return {
+        "write_batching": async_db.writer.get_stats(),
+        "maintenance": await db_maintenance.get_stats(),
+        "saved_ids_cache": saved_jobs_service.saved_ids.get_stats(),
+        "archival": saved_jobs_service.last_archive,
+        "backups": backup_service.get_stats()
+    }
+
+@app.post("/db/maintenance")
+async def run_db_maintenance():
+    """Run a database maintenance pass now (admin endpoint)"""
+    try:
+        return await db_maintenance.run()
+    except Exception as e:
+        logging.error(f"Error running database maintenance: {e}")
+        raise HTTPException(status_code=500, detail=f"Error running database maintenance: {str(e)}")
+
+@app.post("/db/archive")
+async def archive_saved_jobs():
+    """Archive expired saved jobs now (admin endpoint)"""
+    try:
+        return await saved_jobs_service.archive_saved_jobs()
+    except Exception as e:
+        logging.error(f"Error archiving saved jobs: {e}")
+        raise HTTPException(status_code=500, detail=f"Error archiving saved jobs: {str(e)}")
+
+@app.post("/db/backup")
+async def create_db_backup():
+    """Take an online database backup now (admin endpoint)"""
+    try:
+        path = await backup_service.run_backup()
+        return {"message": "Backup completed", "path": path}
+    except Exception as e:
+        logging.error(f"Error backing up database: {e}")
+        raise HTTPException(status_code=500, detail=f"Error backing up database: {str(e)}")
+
 # Authentication endpoints
 @app.post("/auth/register", response_model=UserResponse)
 async def register_user(user_data: UserRegister):
@@ -100,7 +290,7 @@ async def register_user(user_data: UserRegister):
             )
         
         # Create user
-        user = user_service.create_user(user_data.username, user_data.password)
+        user = await user_service.create_user(user_data.username, user_data.password)
         
         if not user:
             raise HTTPException(
@@ -122,11 +312,21 @@ async def register_user(user_data: UserRegister):
         raise HTTPException(status_code=500, detail=f"Error registering user: {str(e)}")
 
 @app.post("/auth/login", response_model=Token)
-async def login_user(user_data: UserLogin):
+async def login_user(user_data: UserLogin, request: Request):
     """Login and receive an authentication token"""
+    # Throttle before any password hashing happens
+    client_ip = request.client.host if request.client else None
+    retry_after = login_throttle.check(user_data.username, client_ip)
+    if retry_after:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many login attempts, please try again later",
+            headers={"Retry-After": str(retry_after)}
+        )
+    
     try:
         # Authenticate user
-        user = user_service.authenticate_user(user_data.username, user_data.password)
+        user = await user_service.authenticate_user(user_data.username, user_data.password)
         
         if not user:
             raise HTTPException(
@@ -165,13 +365,27 @@ async def get_current_user(authorization: Optional[str] = Header(None)):
         raise HTTPException(status_code=401, detail="Invalid authorization header format")
     
     # Get user from token
-    user = user_service.get_user_from_token(token)
+    user = await user_service.get_user_from_token(token)
     
     if not user:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
     
     return user
 
+@app.get("/auth/stats")
+async def get_auth_stats():
+    """Password hashing and authentication cache metrics (admin endpoint)"""
+    return {
+        "password_hashing": {
+            **user_service.hash_pool.get_stats(),
+            "bcrypt_rounds": user_service.bcrypt_rounds,
+            "rehashed_on_login": user_service.rehashed_count
+        },
+        "token_claims_cache": user_service.claims_cache.get_stats(),
+        "user_cache": user_service.user_cache.get_stats(),
+        "login_throttle": login_throttle.get_stats()
+    }
+
 @app.get("/auth/me", response_model=UserResponse)
 async def get_current_user_info(current_user = Depends(get_current_user)):
     """Get current user information from token"""
@@ -188,9 +402,11 @@ async def subscribe_notifications(preferences: NotificationPreferences):
     try:
         success = await notification_service.subscribe_user(preferences)
         if success:
-            return {"message": "Successfully subscribed to notifications", "subscriber_count": notification_service.get_subscriber_count()}
+            return {"message": "Successfully subscribed to notifications", "subscriber_count": await notification_service.get_subscriber_count()}
         else:
             raise HTTPException(status_code=500, detail="Failed to subscribe")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error subscribing: {str(e)}")
 
@@ -207,12 +423,15 @@ async def unsubscribe_notifications(email: str):
         raise HTTPException(status_code=500, detail=f"Error unsubscribing: {str(e)}")
 
 @app.get("/notifications/subscribers")
-async def get_subscribers():
-    """Get subscriber count and info (admin endpoint)"""
+async def get_subscribers(
+    after: int = Query(0, ge=0, description="next_after value from the previous page"),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """Get subscriber count and a page of subscriber info (admin endpoint)"""
     try:
-        subscribers = notification_service.get_subscribers()
+        subscribers = await notification_service.get_subscribers(after, limit)
         return {
-            "total_subscribers": len(subscribers),
+            "total_subscribers": await notification_service.get_subscriber_count(),
             "subscribers": [
                 {
                     "email": sub.email,
@@ -220,12 +439,18 @@ async def get_subscribers():
                     "daily_digest": sub.daily_digest,
                     "instant_alerts": sub.instant_alerts
                 }
-                for sub in subscribers
-            ]
+                for _, sub in subscribers
+            ],
+            "next_after": subscribers[-1][0] if len(subscribers) == limit else None
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting subscribers: {str(e)}")
 
+@app.get("/notifications/stats")
+async def get_notification_stats():
+    """Per-channel concurrency limits and throughput of the last digest and alert fan-outs"""
+    return notification_service.get_stats()
+
 @app.post("/notifications/send-test")
 async def send_test_notification(email: str):
     """Send a test notification (admin endpoint)"""
@@ -259,7 +484,7 @@ async def save_job(
 ):
     """Save an internship for the current user"""
     try:
-        saved = saved_jobs_service.save_job(current_user.id, saved_job.internship_id)
+        saved = await saved_jobs_service.save_job(current_user.internal_id, saved_job.internship_id)
         
         if not saved:
             raise HTTPException(
@@ -268,8 +493,7 @@ async def save_job(
             )
         
         # Get the full internship data
-        internships = await internship_service.get_internships()
-        internship = next((i for i in internships if i.id == saved_job.internship_id), None)
+        internship = await internship_service.get_internship(saved_job.internship_id)
         
         if not internship:
             raise HTTPException(
@@ -298,7 +522,7 @@ async def unsave_job(
 ):
     """Remove a saved internship for the current user"""
     try:
-        success = saved_jobs_service.unsave_job(current_user.id, internship_id)
+        success = await saved_jobs_service.unsave_job(current_user.internal_id, internship_id)
         
         if not success:
             raise HTTPException(
@@ -316,11 +540,24 @@ async def unsave_job(
         raise HTTPException(status_code=500, detail=f"Error unsaving job: {str(e)}")
 
 @app.get("/saved-jobs", response_model=List[Internship])
-async def get_saved_jobs(current_user = Depends(get_current_user)):
-    """Get all saved internships for the current user"""
+async def get_saved_jobs(
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    limit: Optional[int] = Query(None, ge=1, le=200, description="Page size; omit to get every saved job"),
+    current_user = Depends(get_current_user)
+):
+    """Get saved internships for the current user, most recently saved first, including postings no longer in the feed.
+    
+    The total saved count is returned in X-Total-Count and, when more pages
+    follow, the next page's cursor in X-Next-Cursor.
+    """
     try:
-        saved_internships = await saved_jobs_service.get_saved_jobs(current_user.id)
-        return saved_internships
+        body, next_cursor, total = await saved_jobs_service.get_saved_jobs_page(current_user.internal_id, cursor, limit)
+        headers = {"X-Total-Count": str(total)}
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
+        return Response(content=body, media_type="application/json", headers=headers)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logging.error(f"Error getting saved jobs: {e}")
         raise HTTPException(status_code=500, detail=f"Error getting saved jobs: {str(e)}")
@@ -328,25 +565,54 @@ async def get_saved_jobs(current_user = Depends(get_current_user)):
 @app.get("/saved-jobs/check/{internship_id}")
 async def check_saved_job(
     internship_id: str,
+    request: Request,
+    response: Response,
     current_user = Depends(get_current_user)
 ):
-    """Check if an internship is saved by the current user"""
+    """Check if an internship is saved by the current user (ETag follows the saved set)"""
     try:
-        is_saved = saved_jobs_service.is_job_saved(current_user.id, internship_id)
-        return {"is_saved": is_saved}
+        saved = await saved_jobs_service.get_saved_id_set(current_user.internal_id)
+        etag = saved_jobs_service.saved_ids.etag(saved)
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        response.headers["ETag"] = etag
+        return {"is_saved": internship_id in saved}
     except Exception as e:
         logging.error(f"Error checking saved job: {e}")
         raise HTTPException(status_code=500, detail=f"Error checking saved job: {str(e)}")
 
 @app.get("/saved-jobs/ids")
-async def get_saved_job_ids(current_user = Depends(get_current_user)):
-    """Get list of saved internship IDs for the current user"""
+async def get_saved_job_ids(
+    request: Request,
+    response: Response,
+    current_user = Depends(get_current_user)
+):
+    """Get list of saved internship IDs for the current user (supports If-None-Match)"""
     try:
-        saved_ids = saved_jobs_service.get_saved_job_ids(current_user.id)
-        return {"saved_job_ids": saved_ids}
+        saved = await saved_jobs_service.get_saved_id_set(current_user.internal_id)
+        etag = saved_jobs_service.saved_ids.etag(saved)
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        response.headers["ETag"] = etag
+        return {"saved_job_ids": saved.ids()}
     except Exception as e:
         logging.error(f"Error getting saved job IDs: {e}")
         raise HTTPException(status_code=500, detail=f"Error getting saved job IDs: {str(e)}")
 
+# Deadline reminder endpoints
+@app.get("/reminders", response_model=List[DeadlineReminder])
+async def get_reminders(current_user = Depends(get_current_user)):
+    """Reminders for saved internships whose application deadline is near"""
+    try:
+        return await saved_jobs_service.reminders.get_reminders(current_user.internal_id)
+    except Exception as e:
+        logging.error(f"Error getting reminders: {e}")
+        raise HTTPException(status_code=500, detail=f"Error getting reminders: {str(e)}")
+
+@app.get("/reminders/stats")
+async def get_reminder_stats():
+    """Reminder scheduler metrics (admin endpoint)"""
+    return saved_jobs_service.reminders.get_stats()
+
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)
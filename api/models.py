@@ -43,10 +43,27 @@ class Internship(BaseModel):
             datetime: lambda v: v.isoformat()
         }
 
+class InternshipListing(Internship):
+    """An internship as returned by list endpoints, with how many users saved it"""
+    save_count: int = 0
+
+class InternshipFilters(BaseModel):
+    """Filter criteria for internship listings (mirrors the frontend filter panel)"""
+    search: Optional[str] = Field(None, description="Case-insensitive match on title, company, location or description")
+    location: Optional[str] = Field(None, description="Exact location")
+    company: Optional[str] = Field(None, description="Exact company name")
+    remote_only: bool = Field(False, description="Only remote postings")
+    salary_range: Optional[str] = Field(None, description="One of: paid, unpaid, competitive, hourly")
+    
+    def is_empty(self) -> bool:
+        """Whether no filter is applied"""
+        return not (self.search or self.location or self.company or self.remote_only or self.salary_range)
+
 # User Authentication Models
 class User(BaseModel):
     """User model with account information"""
-    id: str
+    id: str = Field(..., description="Opaque public user ID")
+    internal_id: Optional[int] = Field(None, description="Integer row key (never exposed)")
     username: str = Field(..., min_length=3, max_length=50, description="Unique username")
     password_hash: str = Field(..., description="Hashed password")
     created_at: datetime = Field(default_factory=datetime.now, description="Account creation date")
@@ -78,7 +95,7 @@ class UserResponse(BaseModel):
 class SavedJob(BaseModel):
     """Model for a saved internship"""
     id: str
-    user_id: str
+    user_id: int
     internship_id: str
     saved_at: datetime
     
@@ -91,6 +108,13 @@ class SavedJobCreate(BaseModel):
     """Request model for saving an internship"""
     internship_id: str
 
+class DeadlineReminder(BaseModel):
+    """A delivered reminder that a saved internship's application deadline is near"""
+    internship_id: str
+    application_deadline: datetime
+    reminded_at: datetime
+    internship: Optional[Internship] = None
+
 class SavedJobResponse(BaseModel):
     """Response model for saved job"""
     id: str
@@ -0,0 +1,112 @@
+"""
+Concurrent notification fan-out with per-channel limits
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import defaultdict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Tuple
+
+# Sends in flight per delivery channel; each channel protects a different
+# upstream (our SMTP relay, the Twilio API, carrier email gateways)
+CHANNEL_CONCURRENCY: Dict[str, int] = {
+    "smtp": int(os.getenv("NOTIFY_SMTP_CONCURRENCY", "64")),
+    "twilio": int(os.getenv("NOTIFY_TWILIO_CONCURRENCY", "20")),
+    "gateway": int(os.getenv("NOTIFY_GATEWAY_CONCURRENCY", "5")),
+}
+# Recipients being worked on at once; also bounds how far fan-out reads
+# ahead of the subscriber stream
+NOTIFY_MAX_IN_FLIGHT = int(os.getenv("NOTIFY_MAX_IN_FLIGHT", "200"))
+
+# A send: (channel, zero-argument coroutine function returning success)
+Send = Tuple[str, Callable[[], Awaitable[bool]]]
+
+class FanOutEngine:
+    """Sends to a stream of recipients with bounded concurrency per channel.
+
+    Each recipient's messages run concurrently with each other and with
+    other recipients, gated by the channel semaphores. A failed or raising
+    send only marks that message failed; the recipient counts as notified if
+    any of their messages went out.
+    """
+
+    def __init__(self, limits: Dict[str, int] = None, max_in_flight: int = NOTIFY_MAX_IN_FLIGHT):
+        self.limits = dict(limits or CHANNEL_CONCURRENCY)
+        self.max_in_flight = max_in_flight
+        self._semaphores = {channel: asyncio.Semaphore(limit) for channel, limit in self.limits.items()}
+
+    async def run(
+        self,
+        name: str,
+        recipients: AsyncIterator[Any],
+        plan: Callable[[Any], List[Send]]
+    ) -> dict:
+        """Deliver `plan(recipient)` for every recipient and return a throughput report"""
+        started = time.perf_counter()
+        in_flight = asyncio.Semaphore(self.max_in_flight)
+        tasks = set()
+        totals = {"recipients": 0, "notified": 0, "failed_recipients": 0}
+        channels: Dict[str, dict] = defaultdict(lambda: {"sent": 0, "failed": 0, "latencies": []})
+
+        async def send(channel: str, func: Callable[[], Awaitable[bool]]) -> bool:
+            stats = channels[channel]
+            async with self._semaphores[channel]:
+                send_started = time.perf_counter()
+                try:
+                    ok = bool(await func())
+                except Exception as e:
+                    logging.error(f"{name}: {channel} send failed: {e}")
+                    ok = False
+                stats["latencies"].append(time.perf_counter() - send_started)
+            stats["sent" if ok else "failed"] += 1
+            return ok
+
+        async def deliver(recipient: Any):
+            try:
+                results = await asyncio.gather(*(send(channel, func) for channel, func in plan(recipient)))
+                totals["notified" if any(results) else "failed_recipients"] += 1
+            except Exception as e:
+                logging.error(f"{name}: could not notify a recipient: {e}")
+                totals["failed_recipients"] += 1
+            finally:
+                in_flight.release()
+
+        async for recipient in recipients:
+            await in_flight.acquire()
+            totals["recipients"] += 1
+            task = asyncio.create_task(deliver(recipient))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+
+        elapsed = time.perf_counter() - started
+        report = {
+            "name": name,
+            **totals,
+            "duration_seconds": round(elapsed, 3),
+            "recipients_per_second": round(totals["recipients"] / elapsed, 1) if elapsed else 0.0,
+            "channels": {channel: self._channel_report(stats, elapsed) for channel, stats in channels.items()},
+        }
+        logging.info(
+            f"{name}: notified {totals['notified']}/{totals['recipients']} recipients "
+            f"in {report['duration_seconds']}s ({report['recipients_per_second']}/s)"
+        )
+        return report
+
+    def _channel_report(self, stats: dict, elapsed: float) -> dict:
+        latencies = sorted(stats["latencies"])
+        count = stats["sent"] + stats["failed"]
+
+        def percentile(p: float) -> float:
+            if not latencies:
+                return 0.0
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 2)
+
+        return {
+            "sent": stats["sent"],
+            "failed": stats["failed"],
+            "messages_per_second": round(count / elapsed, 1) if elapsed else 0.0,
+            "latency_ms": {"p50": percentile(0.5), "p95": percentile(0.95), "max": percentile(1.0)},
+        }
@@ -1,46 +1,44 @@
 import os
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from datetime import datetime
 import logging
 from models import Internship, NotificationPreferences, Carrier
+from email_transport import EmailTransport, create_email_transport
+from notification_fanout import FanOutEngine, Send
+from database import can_store_secrets
+from repositories import SubscribersRepository
+from sms_transport import SMSTransport, TwilioSMSTransport, TWILIO_AVAILABLE
 
 # Twilio SMS integration (no email required)
-try:
-    from twilio.rest import Client
-    TWILIO_AVAILABLE = True
-except ImportError:
-    TWILIO_AVAILABLE = False
+if not TWILIO_AVAILABLE:
     print("Twilio not available. Install with: pip install twilio")
 
 # Fallback to email gateways if Twilio not available
-import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
 class NotificationService:
     """Service for sending email and SMS notifications"""
     
-    def __init__(self):
+    def __init__(self, email_transport: Optional[EmailTransport] = None, sms_transport: Optional[SMSTransport] = None):
         # Twilio SMS configuration (no personal email required)
         self.twilio_account_sid = os.getenv("TWILIO_ACCOUNT_SID")
         self.twilio_auth_token = os.getenv("TWILIO_AUTH_TOKEN")
         self.twilio_phone_number = os.getenv("TWILIO_PHONE_NUMBER")
         
-        # Initialize Twilio if available
+        # Use Twilio if available
         if TWILIO_AVAILABLE and self.twilio_account_sid and self.twilio_auth_token:
-            self.twilio_client = Client(self.twilio_account_sid, self.twilio_auth_token)
             self.use_twilio = True
             logging.info("Using Twilio for SMS notifications")
         else:
-            self.twilio_client = None
             self.use_twilio = False
             logging.info("Using email gateway fallback for SMS notifications")
+        # Twilio clients for the system and subscriber-supplied credentials
+        self.sms = sms_transport or TwilioSMSTransport()
         
-        # Fallback email gateway configuration
-        self.smtp_server = "smtp.gmail.com"
-        self.smtp_port = 587
+        # Email (and the SMS email gateways) go through a pooled transport
         self.email_user = os.getenv("NOTIFICATION_EMAIL", "your-app@gmail.com")
-        self.email_password = os.getenv("NOTIFICATION_PASSWORD", "your-app-password")
+        self.email = email_transport or create_email_transport()
         
         # SMS via email gateways (completely free)
         self.carrier_gateways = {
@@ -51,28 +49,25 @@ class NotificationService:
             Carrier.US_CELLULAR: "email.uscc.net"
         }
         
-        # In-memory storage for demo (replace with database in production)
-        self.subscribers: List[NotificationPreferences] = []
+        # Subscribers are stored in SQLite (unique on email)
+        self.subscribers = SubscribersRepository()
+        
+        # Concurrent delivery with per-channel limits
+        self.fanout = FanOutEngine()
+        # Throughput report of the last run per kind (daily_digest / instant_alerts)
+        self.last_fanout = {}
         
     async def subscribe_user(self, preferences: NotificationPreferences) -> bool:
-        """Subscribe a user to notifications"""
+        """Subscribe a user to notifications, or update their preferences.
+        
+        Raises ValueError if a Twilio auth token is supplied but no
+        SUBSCRIBER_SECRETS_KEY is configured to store it with.
+        """
+        if preferences.twilio_auth_token and not can_store_secrets():
+            raise ValueError("This server cannot store Twilio auth tokens; subscribe without your own Twilio credentials")
         try:
-            # Check if user already exists
-            existing_user = next(
-                (user for user in self.subscribers if user.email == preferences.email), 
-                None
-            )
-            
-            if existing_user:
-                # Update existing user
-                index = self.subscribers.index(existing_user)
-                self.subscribers[index] = preferences
-                logging.info(f"Updated notification preferences for {preferences.email}")
-            else:
-                # Add new user
-                self.subscribers.append(preferences)
-                logging.info(f"Subscribed {preferences.email} to notifications")
-            
+            await self.subscribers.upsert(preferences)
+            logging.info(f"Saved notification preferences for {preferences.email}")
             return True
         except Exception as e:
             logging.error(f"Error subscribing user: {e}")
@@ -81,7 +76,7 @@ class NotificationService:
     async def unsubscribe_user(self, email: str) -> bool:
         """Unsubscribe a user from notifications"""
         try:
-            self.subscribers = [user for user in self.subscribers if user.email != email]
+            await self.subscribers.delete(email)
             logging.info(f"Unsubscribed {email} from notifications")
             return True
         except Exception as e:
@@ -92,97 +87,41 @@ class NotificationService:
         """Send daily digest to all subscribers"""
         if not internships:
             return 0
-            
-        sent_count = 0
-        
-        for subscriber in self.subscribers:
-            if not subscriber.daily_digest:
-                continue
-                
-            try:
-                # Send email
-                await self._send_email(
-                    subscriber.email,
-                    "Daily CS Internship Digest",
-                    self._create_digest_html(internships)
-                )
-                
-                # Send SMS if enabled
-                if subscriber.sms_enabled and subscriber.phone:
-                    sms_message = self._create_digest_sms(internships)
-                    await self._send_sms(subscriber.phone, sms_message, subscriber)
-                
-                sent_count += 1
-                logging.info(f"Sent daily digest to {subscriber.email}")
-                
-            except Exception as e:
-                logging.error(f"Error sending digest to {subscriber.email}: {e}")
-        
-        return sent_count
+        return await self._fan_out(
+            "daily_digest",
+            "Daily CS Internship Digest",
+            self._create_digest_html(internships),
+            self._create_digest_sms(internships)
+        )
     
     async def send_instant_alert(self, new_internships: List[Internship]) -> int:
         """Send instant alerts for new internships"""
         if not new_internships:
             return 0
-            
-        sent_count = 0
-        
-        for subscriber in self.subscribers:
-            if not subscriber.instant_alerts:
-                continue
-                
-            try:
-                # Send email
-                await self._send_email(
-                    subscriber.email,
-                    "New CS Internships Available!",
-                    self._create_alert_html(new_internships)
-                )
-                
-                # Send SMS if enabled
-                if subscriber.sms_enabled and subscriber.phone:
-                    sms_message = self._create_alert_sms(new_internships)
-                    await self._send_sms(subscriber.phone, sms_message, subscriber)
-                
-                sent_count += 1
-                logging.info(f"Sent instant alert to {subscriber.email}")
-                
-            except Exception as e:
-                logging.error(f"Error sending alert to {subscriber.email}: {e}")
+        return await self._fan_out(
+            "instant_alerts",
+            "New CS Internships Available!",
+            self._create_alert_html(new_internships),
+            self._create_alert_sms(new_internships)
+        )
+    
+    async def _fan_out(self, flag: str, subject: str, html_content: str, sms_message: str) -> int:
+        """Send one rendered notification to every subscriber with `flag` set"""
+        def plan(subscriber: NotificationPreferences) -> List[Send]:
+            sends = [("smtp", lambda: self._send_email(subscriber.email, subject, html_content))]
+            if subscriber.sms_enabled and subscriber.phone:
+                sends.append((
+                    self._sms_channel(subscriber),
+                    lambda: self._send_sms(subscriber.phone, sms_message, subscriber)
+                ))
+            return sends
         
-        return sent_count
+        report = await self.fanout.run(flag, self.subscribers.iter_subscribers(flag), plan)
+        self.last_fanout[flag] = report
+        return report["notified"]
     
     async def _send_email(self, to_email: str, subject: str, html_content: str) -> bool:
-        """Send email using SendGrid or SMTP fallback"""
-        if self.use_sendgrid:
-            return await self._send_email_sendgrid(to_email, subject, html_content)
-        else:
-            return await self._send_email_smtp(to_email, subject, html_content)
-    
-    async def _send_email_sendgrid(self, to_email: str, subject: str, html_content: str) -> bool:
-        """Send email using SendGrid API"""
-        try:
-            message = Mail(
-                from_email=self.from_email,
-                to_emails=to_email,
-                subject=subject,
-                html_content=html_content
-            )
-            
-            response = self.sg.send(message)
-            if response.status_code in [200, 201, 202]:
-                logging.info(f"Email sent successfully to {to_email} via SendGrid")
-                return True
-            else:
-                logging.error(f"SendGrid error: {response.status_code}")
-                return False
-                
-        except Exception as e:
-            logging.error(f"Error sending email via SendGrid to {to_email}: {e}")
-            return False
-    
-    async def _send_email_smtp(self, to_email: str, subject: str, html_content: str) -> bool:
-        """Send email using SMTP (fallback)"""
+        """Send an HTML email through the configured transport"""
         try:
             msg = MIMEMultipart('alternative')
             msg['Subject'] = subject
@@ -193,21 +132,24 @@ class NotificationService:
             html_part = MIMEText(html_content, 'html')
             msg.attach(html_part)
             
-            # Send email
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.email_user, self.email_password)
-                server.send_message(msg)
-            
-            logging.info(f"Email sent successfully to {to_email} via SMTP")
+            await self.email.send(msg)
+            logging.info(f"Email sent successfully to {to_email}")
             return True
         except Exception as e:
-            logging.error(f"Error sending email via SMTP to {to_email}: {e}")
+            logging.error(f"Error sending email to {to_email}: {e}")
             return False
     
+    def _has_own_twilio(self, subscriber: Optional[NotificationPreferences]) -> bool:
+        """Whether a subscriber has usable Twilio credentials of their own (a token that could be decrypted)"""
+        return bool(subscriber and subscriber.twilio_account_sid and subscriber.twilio_auth_token)
+    
+    def _sms_channel(self, subscriber: NotificationPreferences) -> str:
+        """Fan-out channel an SMS to this subscriber goes through"""
+        return "twilio" if self.use_twilio or self._has_own_twilio(subscriber) else "gateway"
+    
     async def _send_sms(self, phone_number: str, message: str, subscriber: NotificationPreferences = None) -> bool:
         """Send SMS using Twilio or email gateway fallback"""
-        if self.use_twilio or (subscriber and subscriber.twilio_account_sid):
+        if self.use_twilio or self._has_own_twilio(subscriber):
             return await self._send_sms_twilio(phone_number, message, subscriber)
         else:
             return await self._send_sms_via_email(phone_number, message)
@@ -216,12 +158,14 @@ class NotificationService:
         """Send SMS using Twilio API (user credentials or system defaults)"""
         try:
             # Use user's credentials if provided, otherwise use system defaults
-            if subscriber and subscriber.twilio_account_sid and subscriber.twilio_auth_token:
-                client = Client(subscriber.twilio_account_sid, subscriber.twilio_auth_token)
+            if self._has_own_twilio(subscriber):
+                account_sid = subscriber.twilio_account_sid
+                auth_token = subscriber.twilio_auth_token
                 from_number = subscriber.twilio_phone_number or self.twilio_phone_number
                 logging.info(f"Using user's Twilio credentials for {subscriber.email}")
             else:
-                client = self.twilio_client
+                account_sid = self.twilio_account_sid
+                auth_token = self.twilio_auth_token
                 from_number = self.twilio_phone_number
                 logging.info("Using system Twilio credentials")
             
@@ -235,13 +179,9 @@ class NotificationService:
                 clean_phone = f"+{clean_phone}"
             
             # Send SMS via Twilio
-            message_obj = client.messages.create(
-                body=message,
-                from_=from_number,
-                to=clean_phone
-            )
+            message_sid = await self.sms.send(clean_phone, message, account_sid, auth_token, from_number)
             
-            logging.info(f"SMS sent successfully to {clean_phone} via Twilio (SID: {message_obj.sid})")
+            logging.info(f"SMS sent successfully to {clean_phone} via Twilio (SID: {message_sid})")
             return True
             
         except Exception as e:
@@ -260,11 +200,12 @@ class NotificationService:
                     sms_email = f"{clean_phone}@{gateway}"
                     
                     # Send email to SMS gateway
-                    await self._send_email_smtp(
+                    if not await self._send_email(
                         sms_email,
                         "",  # No subject for SMS
                         message
-                    )
+                    ):
+                        continue
                     
                     logging.info(f"SMS sent to {clean_phone} via {carrier} gateway")
                     return True
@@ -403,10 +344,25 @@ class NotificationService:
         
         return message
     
-    def get_subscriber_count(self) -> int:
+    def get_stats(self) -> dict:
+        """Channel limits and the last fan-out report per notification kind"""
+        return {
+            "channel_concurrency": self.fanout.limits,
+            "max_in_flight": self.fanout.max_in_flight,
+            "email_transport": self.email.get_stats(),
+            "sms_transport": self.sms.get_stats(),
+            "last_fanout": self.last_fanout,
+        }
+    
+    async def close(self):
+        """Close transport connections on shutdown"""
+        await self.email.close()
+        await self.sms.close()
+    
+    async def get_subscriber_count(self) -> int:
         """Get total number of subscribers"""
-        return len(self.subscribers)
+        return await self.subscribers.count()
     
-    def get_subscribers(self) -> List[NotificationPreferences]:
-        """Get all subscribers (for admin purposes)"""
-        return self.subscribers.copy()
+    async def get_subscribers(self, after_id: int = 0, limit: int = 100) -> List[Tuple[int, NotificationPreferences]]:
+        """Get a page of (id, subscriber) after `after_id` (for admin purposes)"""
+        return await self.subscribers.list_page(after_id, limit)
@@ -0,0 +1,71 @@
+"""
+Frequency-weighted prefix index used for typeahead suggestions
+"""
+import bisect
+import heapq
+from collections import Counter
+from typing import Iterable, List, Tuple
+
+class PrefixIndex:
+    """Sorted-array prefix index over distinct values, weighted by occurrence count.
+    
+    Values are matched case-insensitively. A lookup is two bisects to find the
+    prefix range, then a top-k walk over it: a sparse table gives the most
+    frequent entry of any sub-range in O(1), and a heap of sub-ranges split
+    around each pick yields the rest, so a lookup costs O(limit log limit)
+    however many values share the prefix.
+    """
+    
+    def __init__(self, values: Iterable[str]):
+        counts = Counter(value for value in values if value)
+        entries = sorted(
+            ((value.lower(), value, count) for value, count in counts.items()),
+            key=lambda entry: (entry[0], -entry[2])
+        )
+        self._keys: List[str] = [entry[0] for entry in entries]
+        self._values: List[str] = [entry[1] for entry in entries]
+        self._counts: List[int] = [entry[2] for entry in entries]
+        # _best[j][i]: position of the top entry in [i, i + 2**j)
+        self._best: List[List[int]] = [list(range(len(entries)))]
+        width = 1
+        while width * 2 <= len(entries):
+            previous = self._best[-1]
+            self._best.append([
+                self._better(previous[i], previous[i + width])
+                for i in range(len(entries) - width * 2 + 1)
+            ])
+            width *= 2
+    
+    def __len__(self) -> int:
+        return len(self._keys)
+    
+    def complete(self, prefix: str, limit: int = 10) -> List[Tuple[str, int]]:
+        """Get up to `limit` (value, count) completions for a prefix, most frequent first"""
+        prefix = prefix.lower()
+        start = bisect.bisect_left(self._keys, prefix)
+        end = bisect.bisect_left(self._keys, prefix + "\U0010ffff", start)
+        if start >= end or limit <= 0:
+            return []
+        
+        positions = []
+        heap = [self._range_top(start, end)]
+        while heap and len(positions) < limit:
+            _, i, low, high = heapq.heappop(heap)
+            positions.append(i)
+            if low < i:
+                heapq.heappush(heap, self._range_top(low, i))
+            if i + 1 < high:
+                heapq.heappush(heap, self._range_top(i + 1, high))
+        return [(self._values[i], self._counts[i]) for i in positions]
+    
+    def _better(self, i: int, j: int) -> int:
+        """The higher-ranked of two positions: higher count, then earlier key"""
+        if self._counts[j] > self._counts[i] or (self._counts[j] == self._counts[i] and j < i):
+            return j
+        return i
+    
+    def _range_top(self, low: int, high: int) -> tuple:
+        """Heap entry for the top position in [low, high); positions order equal counts by key"""
+        level = (high - low).bit_length() - 1
+        i = self._better(self._best[level][low], self._best[level][high - (1 << level)])
+        return (-self._counts[i], i, low, high)
@@ -0,0 +1,87 @@
+"""
+In-process LRU cache for filtered internship queries
+"""
+import sys
+from array import array
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+class QueryResultCache:
+    """LRU cache of query -> matching snapshot positions, bounded by memory.
+    
+    Entries are only valid for the snapshot version they were computed against;
+    the whole cache is dropped the first time a different version is seen.
+    """
+    
+    def __init__(self, max_bytes: int = 4 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, array]" = OrderedDict()
+        self._version: Optional[int] = None
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+    
+    def get(self, key: Hashable, version: int) -> Optional[array]:
+        """Get cached positions for a query, or None on a miss"""
+        self._check_version(version)
+        positions = self._entries.get(key)
+        if positions is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return positions
+    
+    def put(self, key: Hashable, version: int, positions: array):
+        """Store positions for a query, evicting least recently used entries over the cap"""
+        self._check_version(version)
+        size = self._entry_size(key, positions)
+        if size > self.max_bytes:
+            return
+        
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.current_bytes -= self._entry_size(key, previous)
+        self._entries[key] = positions
+        self.current_bytes += size
+        
+        while self.current_bytes > self.max_bytes:
+            old_key, old_positions = self._entries.popitem(last=False)
+            self.current_bytes -= self._entry_size(old_key, old_positions)
+            self.evictions += 1
+    
+    def clear(self):
+        """Drop all entries (counters are kept)"""
+        self._entries.clear()
+        self.current_bytes = 0
+    
+    def get_stats(self) -> dict:
+        """Hit/miss counters and memory usage"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "version": self._version,
+        }
+    
+    def _check_version(self, version: int):
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self.clear()
+            self._version = version
+    
+    def _entry_size(self, key: Hashable, positions: array) -> int:
+        # Filter keys are tuples; count the strings they hold, not just the tuple
+        size = sys.getsizeof(positions) + sys.getsizeof(key)
+        if isinstance(key, tuple):
+            size += sum(sys.getsizeof(part) for part in key if part is not None)
+        return size
@@ -0,0 +1,170 @@
+"""
+Scheduler for application-deadline reminders on saved internships
+"""
+import asyncio
+import heapq
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+from database import from_epoch_ms, now_ms, posting_deadline_ms, reminder_time, REMINDER_DAYS_BEFORE
+from models import Internship
+from repositories import RemindersRepository
+
+# Only reminders due within this window are held in memory; later ones stay
+# in SQLite until the window moves past them
+REMINDER_WINDOW_MINUTES = float(os.getenv("REMINDER_WINDOW_MINUTES", "60"))
+# Reminders are read from SQLite and marked delivered in batches of this size
+REMINDER_DELIVERY_BATCH = 500
+
+class DeadlineReminderScheduler:
+    """Two-level reminder timer: SQLite for the far future, a heap for the next window.
+
+    Pending reminders live in deadline_reminders; a partial index on
+    remind_at covers only undelivered rows. The scheduler reads the next
+    REMINDER_WINDOW_MINUTES of them into a min-heap in REMINDER_DELIVERY_BATCH
+    pages, each a keyset range read, fetching another page only when the heap
+    runs low. It sleeps until the earliest is due and advances the window
+    when it runs out, so memory and per-wakeup work stay bounded even when a
+    large overdue backlog is waiting at startup. Saves inside the current
+    window are pushed straight onto the heap; unsaves are cancelled lazily
+    (dropped when popped).
+
+    Delivery is in-app: a due reminder is marked delivered and appears in the
+    user's GET /reminders.
+    """
+
+    def __init__(self, repository: Optional[RemindersRepository] = None):
+        self.repository = repository or RemindersRepository()
+        self._heap: List[Tuple[int, int, str]] = []
+        # (user_id, internship_id) -> remind_at for every live heap entry
+        self._pending: Dict[Tuple[int, str], int] = {}
+        # Every undelivered reminder in [_window_start, _loaded_until) is in
+        # the heap, or will be once the page reads reach it
+        self._window_start = 0
+        self._loaded_until = 0
+        # Last row read in the current window while pages remain, else None
+        self._cursor: Optional[Tuple[int, int, str]] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self.refills = 0
+        self.page_reads = 0
+        self.delivered = 0
+        self.cancelled = 0
+
+    def remind_at_for(self, internship: Internship) -> Optional[int]:
+        """When to remind about a posting saved now, or None if its deadline is unknown or past"""
+        return reminder_time(posting_deadline_ms(internship), now_ms())
+
+    def schedule(self, user_id: int, internship_id: str, remind_at: int):
+        """Track a committed reminder; only reminders inside the loaded window need the heap"""
+        if remind_at >= self._loaded_until:
+            return
+        self._push(remind_at, user_id, internship_id)
+        if self._wakeup is not None and self._heap[0][0] == remind_at:
+            self._wakeup.set()
+
+    def reschedule(self, user_id: int, internship_id: str, remind_at: Optional[int]):
+        """Track a committed change to a reminder's time; None means it was removed"""
+        self._pending.pop((user_id, internship_id), None)
+        if remind_at is not None:
+            self.schedule(user_id, internship_id, remind_at)
+
+    def cancel(self, user_id: int, internship_id: str):
+        """Forget a reminder whose saved job was removed"""
+        if self._pending.pop((user_id, internship_id), None) is not None:
+            self.cancelled += 1
+
+    def _push(self, remind_at: int, user_id: int, internship_id: str):
+        key = (user_id, internship_id)
+        if self._pending.get(key) == remind_at:
+            return
+        self._pending[key] = remind_at
+        heapq.heappush(self._heap, (remind_at, user_id, internship_id))
+
+    async def run(self):
+        """Deliver reminders as they come due; runs for the life of the app"""
+        self._wakeup = asyncio.Event()
+        while True:
+            try:
+                now = now_ms()
+                if self._cursor is not None and len(self._heap) < REMINDER_DELIVERY_BATCH:
+                    await self._read_page()
+                elif now >= self._loaded_until and self._cursor is None:
+                    await self._advance_window(now)
+                due = self._pop_due(now)
+                if due:
+                    await self._deliver(due)
+                    continue
+                if self._cursor is not None and len(self._heap) < REMINDER_DELIVERY_BATCH:
+                    continue
+                next_at = min(self._heap[0][0], self._loaded_until) if self._heap else self._loaded_until
+            except Exception as e:
+                logging.error(f"Error in reminder scheduler: {e}")
+                next_at = now_ms() + 60 * 1000
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(0.0, (next_at - now_ms()) / 1000))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _advance_window(self, now: int):
+        """Start the next window of undelivered reminders (overdue ones too on the first load)"""
+        # Move the boundary first so saves committed during the reads are pushed by schedule()
+        self._window_start = self._loaded_until
+        self._loaded_until = now + int(REMINDER_WINDOW_MINUTES * 60 * 1000)
+        self.refills += 1
+        await self._read_page()
+
+    async def _read_page(self):
+        """Push the next REMINDER_DELIVERY_BATCH reminders of the current window"""
+        page = await self.repository.list_pending(
+            self._window_start, self._loaded_until, self._cursor, REMINDER_DELIVERY_BATCH
+        )
+        for remind_at, user_id, internship_id in page:
+            self._push(remind_at, user_id, internship_id)
+        self._cursor = page[-1] if len(page) == REMINDER_DELIVERY_BATCH else None
+        self.page_reads += 1
+
+    def _pop_due(self, now: int) -> List[Tuple[int, str]]:
+        due = []
+        while self._heap and self._heap[0][0] <= now and len(due) < REMINDER_DELIVERY_BATCH:
+            remind_at, user_id, internship_id = heapq.heappop(self._heap)
+            key = (user_id, internship_id)
+            if self._pending.get(key) != remind_at:
+                continue  # cancelled or rescheduled
+            del self._pending[key]
+            due.append(key)
+        return due
+
+    async def _deliver(self, due: List[Tuple[int, str]]):
+        # Rows unsaved since they were loaded are skipped by the UPDATE
+        delivered = await self.repository.mark_delivered(due, now_ms())
+        self.delivered += len(delivered)
+        for user_id, internship_id in delivered:
+            logging.info(f"Deadline reminder delivered to user {user_id} for internship {internship_id}")
+
+    async def get_reminders(self, user_id: int) -> List[dict]:
+        """A user's delivered reminders, soonest deadline first"""
+        reminders = []
+        for internship_id, deadline, delivered_at, posting in await self.repository.list_delivered(user_id):
+            reminders.append({
+                "internship_id": internship_id,
+                "application_deadline": from_epoch_ms(deadline),
+                "reminded_at": from_epoch_ms(delivered_at),
+                "internship": Internship.model_validate_json(posting) if posting else None,
+            })
+        return reminders
+
+    def get_stats(self) -> dict:
+        return {
+            "in_memory": len(self._pending),
+            "heap_size": len(self._heap),
+            "loaded_until": from_epoch_ms(self._loaded_until).isoformat() if self._loaded_until else None,
+            "window_minutes": REMINDER_WINDOW_MINUTES,
+            "days_before": REMINDER_DAYS_BEFORE,
+            "refills": self.refills,
+            "page_reads": self.page_reads,
+            "window_fully_read": self._cursor is None,
+            "delivered": self.delivered,
+            "cancelled": self.cancelled,
+        }
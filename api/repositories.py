@@ -0,0 +1,532 @@
+"""
+Awaitable data-access methods for users, saved jobs, saved postings, save
+counts, deadline reminders and notification subscribers.
+
+Each public method runs its SQL on the async database executor, so request
+handlers never block the event loop on SQLite.
+"""
+import sqlite3
+from typing import AsyncIterator, List, Optional, Tuple
+from database import async_db, user_from_row, now_ms, to_epoch_ms, from_epoch_ms, encode_posting, decode_posting, unavailable_posting, posting_deadline_ms, reminder_time, encrypt_secret, decrypt_secret
+from models import User, SavedJob, Internship, NotificationPreferences
+from save_counts import apply_save_delta
+
+# Postings looked up per statement when syncing a feed (below SQLite's variable limit)
+SYNC_CHUNK_SIZE = 500
+
+class UserRepository:
+    """Queries against the users table"""
+    
+    async def get_by_id(self, user_id: int) -> Optional[User]:
+        return await async_db.read(self._get_by_id, user_id)
+    
+    async def get_by_username(self, username: str) -> Optional[User]:
+        return await async_db.read(self._get_by_username, username)
+    
+    async def get_by_public_id(self, public_id: str) -> Optional[User]:
+        return await async_db.read(self._get_by_public_id, public_id)
+    
+    async def insert(self, user: User) -> int:
+        """Insert a user and return its integer key; raises sqlite3.IntegrityError if the username is taken"""
+        return await async_db.write(self._insert, user)
+    
+    async def update_password_hash(self, user_id: int, old_hash: str, new_hash: str) -> bool:
+        """Compare-and-set a password hash; returns whether the row was updated"""
+        return await async_db.write(self._update_password_hash, user_id, old_hash, new_hash)
+    
+    @staticmethod
+    def _get_by_id(conn: sqlite3.Connection, user_id: int) -> Optional[User]:
+        row = conn.execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
+        return user_from_row(row) if row else None
+    
+    @staticmethod
+    def _get_by_public_id(conn: sqlite3.Connection, public_id: str) -> Optional[User]:
+        row = conn.execute("SELECT * FROM users WHERE public_id = ?", (public_id,)).fetchone()
+        return user_from_row(row) if row else None
+    
+    @staticmethod
+    def _get_by_username(conn: sqlite3.Connection, username: str) -> Optional[User]:
+        row = conn.execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
+        return user_from_row(row) if row else None
+    
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, user: User) -> int:
+        cursor = conn.execute("""
+            INSERT INTO users (public_id, username, password_hash, created_at)
+            VALUES (?, ?, ?, ?)
+        """, (user.id, user.username, user.password_hash, to_epoch_ms(user.created_at)))
+        return cursor.lastrowid
+    
+    @staticmethod
+    def _update_password_hash(conn: sqlite3.Connection, user_id: int, old_hash: str, new_hash: str) -> bool:
+        cursor = conn.execute("""
+            UPDATE users SET password_hash = ? WHERE id = ? AND password_hash = ?
+        """, (new_hash, user_id, old_hash))
+        return cursor.rowcount > 0
+
+class SavedJobsRepository:
+    """Queries against the saved_jobs table"""
+    
+    async def insert(self, saved_job: SavedJob, internship: Internship, remind_at: Optional[int] = None):
+        """Insert a saved job, store its posting and schedule its deadline reminder.
+        
+        Raises sqlite3.IntegrityError if already saved.
+        """
+        await async_db.write(self._insert, saved_job, internship, remind_at)
+    
+    async def delete(self, user_id: int, internship_id: str, unsaved_at: int) -> bool:
+        """Delete a saved job (`unsaved_at` in epoch ms); returns whether a row was removed"""
+        return await async_db.write(self._delete, user_id, internship_id, unsaved_at)
+    
+    async def exists(self, user_id: int, internship_id: str) -> bool:
+        return await async_db.read(self._exists, user_id, internship_id)
+    
+    async def list_internship_ids(self, user_id: int) -> List[str]:
+        """Saved internship IDs for a user, most recently saved first"""
+        return await async_db.read(self._list_internship_ids, user_id)
+    
+    async def list_postings_page(
+        self,
+        user_id: int,
+        after: Optional[Tuple[int, str]] = None,
+        limit: Optional[int] = None
+    ) -> List[Tuple[int, str, bytes]]:
+        """(saved_at, internship_id, posting JSON) rows, most recently saved first.
+        
+        `after` is the (saved_at, internship_id) of the last row of the
+        previous page; each page is one seek on idx_saved_jobs_user_saved_at.
+        Every saved row is returned; one without a stored posting gets an
+        "unavailable" placeholder.
+        """
+        return await async_db.read(self._list_postings_page, user_id, after, limit)
+    
+    async def list_save_counts(self) -> List[tuple]:
+        """Every (internship_id, save_count, trend_score, trend_updated_at) row"""
+        return await async_db.read(self._list_save_counts)
+    
+    async def archive_batch(
+        self,
+        after: Tuple[int, str],
+        scan_limit: int,
+        saved_before: int,
+        seen_before: Optional[int],
+        now: int
+    ) -> Tuple[Optional[Tuple[int, str]], List[Tuple[int, str]]]:
+        """Archive expired saved jobs among the next `scan_limit` rows after key `after`.
+        
+        A row expires when it was saved before `saved_before`, or its posting's
+        deadline has passed, or the posting was last seen in the feed before
+        `seen_before` (None skips that rule). Expired rows move to saved_jobs_archive with their
+        posting payload, and their reminders, counts and orphaned postings go
+        with them, all in one transaction. Returns the last key scanned (None
+        at the end of the table) and the (user_id, internship_id) archived.
+        """
+        return await async_db.write(self._archive_batch, after, scan_limit, saved_before, seen_before, now)
+    
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, saved_job: SavedJob, internship: Internship, remind_at: Optional[int]):
+        conn.execute("""
+            INSERT INTO saved_jobs (user_id, internship_id, saved_at)
+            VALUES (?, ?, ?)
+        """, (saved_job.user_id, saved_job.internship_id, to_epoch_ms(saved_job.saved_at)))
+        PostingsRepository._upsert(conn, internship)
+        if remind_at is not None:
+            conn.execute("""
+                INSERT OR REPLACE INTO deadline_reminders (user_id, internship_id, remind_at, deadline)
+                VALUES (?, ?, ?, ?)
+            """, (saved_job.user_id, saved_job.internship_id, remind_at, to_epoch_ms(internship.application_deadline)))
+        SavedJobsRepository._apply_save_delta(conn, saved_job.internship_id, 1, to_epoch_ms(saved_job.saved_at))
+    
+    @staticmethod
+    def _delete(conn: sqlite3.Connection, user_id: int, internship_id: str, unsaved_at: int) -> bool:
+        cursor = conn.execute("""
+            DELETE FROM saved_jobs
+            WHERE user_id = ? AND internship_id = ?
+        """, (user_id, internship_id))
+        if cursor.rowcount == 0:
+            return False
+        conn.execute("""
+            DELETE FROM deadline_reminders
+            WHERE user_id = ? AND internship_id = ?
+        """, (user_id, internship_id))
+        SavedJobsRepository._apply_save_delta(conn, internship_id, -1, unsaved_at)
+        return True
+    
+    @staticmethod
+    def _apply_save_delta(conn: sqlite3.Connection, internship_id: str, delta: int, now: int):
+        """Update the materialized count and trend score for one save or unsave"""
+        row = conn.execute("""
+            SELECT save_count, trend_score, trend_updated_at FROM save_counts WHERE internship_id = ?
+        """, (internship_id,)).fetchone()
+        save_count, trend_score, trend_updated_at = row if row else (0, 0.0, now)
+        save_count += delta
+        if save_count <= 0:
+            conn.execute("DELETE FROM save_counts WHERE internship_id = ?", (internship_id,))
+            return
+        conn.execute("""
+            INSERT OR REPLACE INTO save_counts (internship_id, save_count, trend_score, trend_updated_at)
+            VALUES (?, ?, ?, ?)
+        """, (internship_id, save_count, apply_save_delta(trend_score, trend_updated_at, delta, now), now))
+    
+    @staticmethod
+    def _exists(conn: sqlite3.Connection, user_id: int, internship_id: str) -> bool:
+        row = conn.execute("""
+            SELECT 1 FROM saved_jobs
+            WHERE user_id = ? AND internship_id = ?
+        """, (user_id, internship_id)).fetchone()
+        return row is not None
+    
+    @staticmethod
+    def _list_internship_ids(conn: sqlite3.Connection, user_id: int) -> List[str]:
+        rows = conn.execute("""
+            SELECT internship_id
+            FROM saved_jobs
+            WHERE user_id = ?
+            ORDER BY saved_at DESC, internship_id
+        """, (user_id,)).fetchall()
+        return [row['internship_id'] for row in rows]
+    
+    @staticmethod
+    def _list_postings_page(
+        conn: sqlite3.Connection,
+        user_id: int,
+        after: Optional[Tuple[int, str]],
+        limit: Optional[int]
+    ) -> List[Tuple[int, str, bytes]]:
+        if after is None:
+            where, params = "s.user_id = ?", (user_id,)
+        else:
+            saved_at, internship_id = after
+            # Expanded from (saved_at, internship_id) > after in this mixed
+            # DESC/ASC order; the leading <= lets SQLite seek the index
+            where = "s.user_id = ? AND s.saved_at <= ? AND (s.saved_at < ? OR s.internship_id > ?)"
+            params = (user_id, saved_at, saved_at, internship_id)
+        rows = conn.execute(f"""
+            SELECT s.saved_at, s.internship_id, p.payload
+            FROM saved_jobs s
+            LEFT JOIN postings p ON p.internship_id = s.internship_id
+            WHERE {where}
+            ORDER BY s.saved_at DESC, s.internship_id
+            LIMIT ?
+        """, params + (-1 if limit is None else limit,)).fetchall()
+        return [
+            (
+                row['saved_at'],
+                row['internship_id'],
+                decode_posting(row['payload']) if row['payload'] is not None
+                else unavailable_posting(row['internship_id'], from_epoch_ms(row['saved_at'])).model_dump_json().encode("utf-8")
+            )
+            for row in rows
+        ]
+    
+    @staticmethod
+    def _archive_batch(
+        conn: sqlite3.Connection,
+        after: Tuple[int, str],
+        scan_limit: int,
+        saved_before: int,
+        seen_before: Optional[int],
+        now: int
+    ) -> Tuple[Optional[Tuple[int, str]], List[Tuple[int, str]]]:
+        # Walk the clustered primary key in order; each batch is one short range.
+        # A save without a stored posting expires by saved_at alone, and a
+        # NULL seen_before never matches.
+        rows = conn.execute("""
+            SELECT s.user_id, s.internship_id, s.saved_at, p.payload,
+                   s.saved_at < ? OR COALESCE(p.deadline < ? OR p.updated_at < ?, 0) AS expired
+            FROM saved_jobs s
+            LEFT JOIN postings p ON p.internship_id = s.internship_id
+            WHERE (s.user_id, s.internship_id) > (?, ?)
+            ORDER BY s.user_id, s.internship_id
+            LIMIT ?
+        """, (saved_before, now, seen_before, after[0], after[1], scan_limit)).fetchall()
+        if not rows:
+            return None, []
+        
+        expired = [row for row in rows if row['expired']]
+        conn.executemany("""
+            INSERT OR REPLACE INTO saved_jobs_archive (user_id, internship_id, saved_at, archived_at, payload)
+            VALUES (?, ?, ?, ?, ?)
+        """, [(row['user_id'], row['internship_id'], row['saved_at'], now, row['payload']) for row in expired])
+        keys = [(row['user_id'], row['internship_id']) for row in expired]
+        conn.executemany("DELETE FROM saved_jobs WHERE user_id = ? AND internship_id = ?", keys)
+        conn.executemany("DELETE FROM deadline_reminders WHERE user_id = ? AND internship_id = ?", keys)
+        for _, internship_id in keys:
+            SavedJobsRepository._apply_save_delta(conn, internship_id, -1, now)
+        conn.executemany("""
+            DELETE FROM postings
+            WHERE internship_id = ?
+              AND NOT EXISTS (SELECT 1 FROM saved_jobs s WHERE s.internship_id = ?)
+        """, [(internship_id, internship_id) for internship_id in {key[1] for key in keys}])
+        
+        last = rows[-1]
+        return (last['user_id'], last['internship_id']), keys
+    
+    @staticmethod
+    def _list_save_counts(conn: sqlite3.Connection) -> List[tuple]:
+        rows = conn.execute("""
+            SELECT internship_id, save_count, trend_score, trend_updated_at FROM save_counts
+        """).fetchall()
+        return [tuple(row) for row in rows]
+
+class PostingsRepository:
+    """Queries against the postings table (payloads of saved postings)"""
+    
+    async def sync(self, internships: List[Internship], now: int) -> Tuple[int, List[Tuple[int, str, Optional[int]]]]:
+        """Refresh stored payloads from a new feed and drop unreferenced postings.
+        
+        Only postings that someone has saved are written. When a saved
+        posting's deadline changed, its savers' reminders are moved to the new
+        reminder time (as of `now`), or removed if it no longer has an upcoming
+        deadline. Returns the number of payloads updated and the
+        (user_id, internship_id, remind_at or None) reminders changed.
+        """
+        return await async_db.write(self._sync, internships, now)
+    
+    @staticmethod
+    def _upsert(conn: sqlite3.Connection, internship: Internship):
+        conn.execute("""
+            INSERT INTO postings (internship_id, payload, deadline, updated_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(internship_id) DO UPDATE SET
+                payload = excluded.payload,
+                deadline = excluded.deadline,
+                updated_at = excluded.updated_at
+        """, (internship.id, encode_posting(internship), posting_deadline_ms(internship), now_ms()))
+    
+    @staticmethod
+    def _sync(conn: sqlite3.Connection, internships: List[Internship], now: int) -> Tuple[int, List[Tuple[int, str, Optional[int]]]]:
+        updated = 0
+        rescheduled = []
+        for start in range(0, len(internships), SYNC_CHUNK_SIZE):
+            chunk = internships[start:start + SYNC_CHUNK_SIZE]
+            # Compress only postings that are actually saved; one lookup per chunk
+            rows = conn.execute(f"""
+                SELECT s.internship_id, p.deadline
+                FROM (
+                    SELECT DISTINCT internship_id FROM saved_jobs
+                    WHERE internship_id IN ({",".join("?" * len(chunk))})
+                ) s
+                LEFT JOIN postings p ON p.internship_id = s.internship_id
+            """, [internship.id for internship in chunk]).fetchall()
+            stored_deadlines = {row['internship_id']: row['deadline'] for row in rows}
+            for internship in chunk:
+                if internship.id not in stored_deadlines:
+                    continue
+                PostingsRepository._upsert(conn, internship)
+                updated += 1
+                deadline = posting_deadline_ms(internship)
+                if deadline != stored_deadlines[internship.id]:
+                    rescheduled.extend(RemindersRepository._reschedule(conn, internship.id, deadline, now))
+        conn.execute("""
+            DELETE FROM postings
+            WHERE NOT EXISTS (
+                SELECT 1 FROM saved_jobs s WHERE s.internship_id = postings.internship_id
+            )
+        """)
+        return updated, rescheduled
+
+class RemindersRepository:
+    """Queries against the deadline_reminders table"""
+    
+    async def list_pending(
+        self,
+        start: int,
+        end: int,
+        after: Optional[Tuple[int, int, str]] = None,
+        limit: Optional[int] = None
+    ) -> List[Tuple[int, int, str]]:
+        """Undelivered (remind_at, user_id, internship_id) with start <= remind_at < end, in that order.
+        
+        `after` is the last row of the previous page; each page is one range
+        read on idx_deadline_reminders_pending.
+        """
+        return await async_db.read(self._list_pending, start, end, after, limit)
+    
+    async def mark_delivered(self, reminders: List[Tuple[int, str]], delivered_at: int) -> List[Tuple[int, str]]:
+        """Mark (user_id, internship_id) reminders delivered; returns those still pending until now"""
+        return await async_db.write(self._mark_delivered, reminders, delivered_at)
+    
+    async def list_delivered(self, user_id: int) -> List[Tuple[str, int, int, Optional[bytes]]]:
+        """(internship_id, deadline, delivered_at, posting JSON) for a user's delivered reminders, soonest deadline first"""
+        return await async_db.read(self._list_delivered, user_id)
+    
+    @staticmethod
+    def _list_pending(
+        conn: sqlite3.Connection,
+        start: int,
+        end: int,
+        after: Optional[Tuple[int, int, str]],
+        limit: Optional[int]
+    ) -> List[Tuple[int, int, str]]:
+        if after is None:
+            where, params = "remind_at >= ?", (start,)
+        else:
+            # The leading >= lets SQLite seek the index past the previous page
+            where = "remind_at >= ? AND (remind_at, user_id, internship_id) > (?, ?, ?)"
+            params = (max(start, after[0]), *after)
+        # The partial index carries the primary key, so this order needs no sort
+        rows = conn.execute(f"""
+            SELECT remind_at, user_id, internship_id
+            FROM deadline_reminders
+            WHERE delivered_at IS NULL AND {where} AND remind_at < ?
+            ORDER BY remind_at, user_id, internship_id
+            LIMIT ?
+        """, params + (end, -1 if limit is None else limit)).fetchall()
+        return [tuple(row) for row in rows]
+    
+    @staticmethod
+    def _reschedule(conn: sqlite3.Connection, internship_id: str, deadline: Optional[int], now: int) -> List[Tuple[int, str, Optional[int]]]:
+        """Point every saver's reminder for a posting at its new deadline"""
+        remind_at = reminder_time(deadline, now)
+        if remind_at is None:
+            # Delivered reminders stay in the users' history
+            rows = conn.execute("""
+                SELECT user_id FROM deadline_reminders
+                WHERE internship_id = ? AND delivered_at IS NULL
+            """, (internship_id,)).fetchall()
+            conn.execute("""
+                DELETE FROM deadline_reminders
+                WHERE internship_id = ? AND delivered_at IS NULL
+            """, (internship_id,))
+        else:
+            # A moved deadline is reminded about again, even if the old one was
+            rows = conn.execute("""
+                SELECT user_id FROM saved_jobs WHERE internship_id = ?
+            """, (internship_id,)).fetchall()
+            conn.execute("""
+                INSERT INTO deadline_reminders (user_id, internship_id, remind_at, deadline)
+                SELECT user_id, internship_id, ?, ? FROM saved_jobs WHERE internship_id = ?
+                ON CONFLICT(user_id, internship_id) DO UPDATE SET
+                    remind_at = excluded.remind_at,
+                    deadline = excluded.deadline,
+                    delivered_at = NULL
+            """, (remind_at, deadline, internship_id))
+        return [(row['user_id'], internship_id, remind_at) for row in rows]
+    
+    @staticmethod
+    def _mark_delivered(conn: sqlite3.Connection, reminders: List[Tuple[int, str]], delivered_at: int) -> List[Tuple[int, str]]:
+        delivered = []
+        for user_id, internship_id in reminders:
+            cursor = conn.execute("""
+                UPDATE deadline_reminders SET delivered_at = ?
+                WHERE user_id = ? AND internship_id = ? AND delivered_at IS NULL
+            """, (delivered_at, user_id, internship_id))
+            if cursor.rowcount:
+                delivered.append((user_id, internship_id))
+        return delivered
+    
+    @staticmethod
+    def _list_delivered(conn: sqlite3.Connection, user_id: int) -> List[Tuple[str, int, int, Optional[bytes]]]:
+        rows = conn.execute("""
+            SELECT r.internship_id, r.deadline, r.delivered_at, p.payload
+            FROM deadline_reminders r
+            LEFT JOIN postings p ON p.internship_id = r.internship_id
+            WHERE r.user_id = ? AND r.delivered_at IS NOT NULL
+            ORDER BY r.deadline, r.internship_id
+        """, (user_id,)).fetchall()
+        return [
+            (row['internship_id'], row['deadline'], row['delivered_at'], decode_posting(row['payload']) if row['payload'] else None)
+            for row in rows
+        ]
+
+class SubscribersRepository:
+    """Queries against the subscribers table"""
+    
+    # Opt-in columns that have a partial index for fan-out
+    FLAGS = ("daily_digest", "instant_alerts")
+    
+    async def upsert(self, preferences: NotificationPreferences):
+        """Insert a subscriber or replace the preferences stored for their email"""
+        await async_db.write(self._upsert, preferences)
+    
+    async def delete(self, email: str) -> bool:
+        """Remove a subscriber; returns whether one existed"""
+        return await async_db.write(self._delete, email)
+    
+    async def count(self) -> int:
+        return await async_db.read(self._count)
+    
+    async def list_page(self, after_id: int = 0, limit: int = 100) -> List[Tuple[int, NotificationPreferences]]:
+        """(id, preferences) of up to `limit` subscribers after `after_id`, in id order"""
+        return await async_db.read(self._list_page, None, after_id, limit)
+    
+    async def iter_subscribers(self, flag: str, batch_size: int = 500) -> AsyncIterator[NotificationPreferences]:
+        """Stream the subscribers who opted in to `flag`, a batch at a time.
+        
+        Each batch is a separate keyset read on the flag's partial index, so
+        no read transaction stays open while the caller sends, and at most one
+        batch is in memory.
+        """
+        if flag not in self.FLAGS:
+            raise ValueError(f"Unknown subscriber flag: {flag}")
+        after_id = 0
+        while True:
+            batch = await async_db.read(self._list_page, flag, after_id, batch_size)
+            for _, preferences in batch:
+                yield preferences
+            if len(batch) < batch_size:
+                return
+            after_id = batch[-1][0]
+    
+    @staticmethod
+    def _upsert(conn: sqlite3.Connection, preferences: NotificationPreferences):
+        # The Twilio auth token is stored encrypted (or not at all without a key)
+        conn.execute("""
+            INSERT INTO subscribers (
+                email, phone, sms_enabled, daily_digest, instant_alerts,
+                twilio_account_sid, twilio_auth_token, twilio_phone_number, updated_at
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(email) DO UPDATE SET
+                phone = excluded.phone,
+                sms_enabled = excluded.sms_enabled,
+                daily_digest = excluded.daily_digest,
+                instant_alerts = excluded.instant_alerts,
+                twilio_account_sid = excluded.twilio_account_sid,
+                twilio_auth_token = excluded.twilio_auth_token,
+                twilio_phone_number = excluded.twilio_phone_number,
+                updated_at = excluded.updated_at
+        """, (
+            preferences.email, preferences.phone, preferences.sms_enabled, preferences.daily_digest,
+            preferences.instant_alerts, preferences.twilio_account_sid, encrypt_secret(preferences.twilio_auth_token),
+            preferences.twilio_phone_number, now_ms()
+        ))
+    
+    @staticmethod
+    def _delete(conn: sqlite3.Connection, email: str) -> bool:
+        cursor = conn.execute("DELETE FROM subscribers WHERE email = ?", (email,))
+        return cursor.rowcount > 0
+    
+    @staticmethod
+    def _count(conn: sqlite3.Connection) -> int:
+        return conn.execute("SELECT COUNT(*) FROM subscribers").fetchone()[0]
+    
+    @staticmethod
+    def _list_page(
+        conn: sqlite3.Connection,
+        flag: Optional[str],
+        after_id: int,
+        limit: int
+    ) -> List[Tuple[int, NotificationPreferences]]:
+        # `flag` is checked against FLAGS by the caller; "= 1" matches the partial index
+        where = f"id > ? AND {flag} = 1" if flag else "id > ?"
+        rows = conn.execute(f"""
+            SELECT * FROM subscribers
+            WHERE {where}
+            ORDER BY id
+            LIMIT ?
+        """, (after_id, limit)).fetchall()
+        return [
+            (row['id'], NotificationPreferences(
+                email=row['email'],
+                phone=row['phone'],
+                sms_enabled=bool(row['sms_enabled']),
+                daily_digest=bool(row['daily_digest']),
+                instant_alerts=bool(row['instant_alerts']),
+                twilio_account_sid=row['twilio_account_sid'],
+                twilio_auth_token=decrypt_secret(row['twilio_auth_token']),
+                twilio_phone_number=row['twilio_phone_number'],
+            ))
+            for row in rows
+        ]
@@ -0,0 +1,161 @@
+"""
+In-memory save counters and time-decayed trending scores per posting
+"""
+import bisect
+import heapq
+import math
+import os
+from typing import Container, Dict, Iterable, List, Optional, Tuple
+from database import now_ms
+
+# A save's weight in the trending score halves every TRENDING_HALF_LIFE_HOURS
+TRENDING_HALF_LIFE_HOURS = float(os.getenv("TRENDING_HALF_LIFE_HOURS", "24"))
+TRENDING_HALF_LIFE_MS = TRENDING_HALF_LIFE_HOURS * 60 * 60 * 1000
+# Size of the maintained ranking (the trending endpoint's largest limit)
+TRENDING_TOP_K = int(os.getenv("TRENDING_TOP_K", "100"))
+
+def decayed_score(score: float, updated_at: int, now: int) -> float:
+    """A trend score decayed from `updated_at` to `now` (epoch ms)"""
+    return score * math.pow(2.0, -(now - updated_at) / TRENDING_HALF_LIFE_MS)
+
+def trend_rank(score: float, updated_at: int) -> float:
+    """Sort key for a trend score: orders scores as if all were decayed to the same instant.
+
+    Decay scales every score by the same factor, so a posting's rank only
+    changes when it is saved or unsaved.
+    """
+    return math.log2(score) + updated_at / TRENDING_HALF_LIFE_MS
+
+def apply_save_delta(score: float, updated_at: int, delta: int, now: int) -> float:
+    """New trend score after a save (+1) or unsave (-1) at `now`; never negative.
+
+    Decay-then-add is exact in any event order, so the database and the
+    in-memory tracker converge even if they apply events in different orders.
+    """
+    return max(0.0, decayed_score(score, updated_at, now) + delta)
+
+class SaveCountTracker:
+    """Materialized per-posting save counts and trend scores.
+
+    Persisted in the save_counts table by the same write as the save itself;
+    this copy is loaded once at startup and updated after every commit, so
+    list responses and the trending endpoint never query SQLite.
+    """
+
+    def __init__(self):
+        self._counts: Dict[str, int] = {}
+        # internship ID -> (score, epoch ms the score is valid at)
+        self._trend: Dict[str, Tuple[float, int]] = {}
+        # Bumped on every change; cached response bodies embed counts
+        self.version = 0
+        # The TRENDING_TOP_K highest (rank, internship ID) in ascending order;
+        # every posting outside it ranks no higher than its first entry.
+        # Rebuilt on the next read when stale.
+        self._top: List[Tuple[float, str]] = []
+        self._top_ranks: Dict[str, float] = {}
+        self._top_stale = False
+        self.top_rebuilds = 0
+
+    def load(self, rows: Iterable[Tuple[str, int, float, int]]):
+        """Replace state from (internship_id, save_count, trend_score, trend_updated_at) rows"""
+        self._counts = {}
+        self._trend = {}
+        for internship_id, save_count, trend_score, trend_updated_at in rows:
+            if save_count > 0:
+                self._counts[internship_id] = save_count
+            if trend_score > 0:
+                self._trend[internship_id] = (trend_score, trend_updated_at)
+        self._top_stale = True
+        self.version += 1
+
+    def record(self, internship_id: str, delta: int, now: Optional[int] = None):
+        """Apply a committed save (+1) or unsave (-1)"""
+        now = now_ms() if now is None else now
+        count = self._counts.get(internship_id, 0) + delta
+        self.version += 1
+        if count <= 0:
+            # Nobody has it saved any more; it drops out of trending too
+            self._counts.pop(internship_id, None)
+            self._trend.pop(internship_id, None)
+            self._update_top(internship_id, None)
+            return
+        self._counts[internship_id] = count
+
+        score, updated_at = self._trend.get(internship_id, (0.0, now))
+        score = apply_save_delta(score, updated_at, delta, now)
+        if score > 0:
+            self._trend[internship_id] = (score, now)
+            self._update_top(internship_id, trend_rank(score, now))
+        else:
+            self._trend.pop(internship_id, None)
+            self._update_top(internship_id, None)
+
+    def _update_top(self, internship_id: str, rank: Optional[float]):
+        """Move a posting within the maintained ranking after its rank changed (None: removed)"""
+        if self._top_stale:
+            return
+        top = self._top
+        floor = top[0][0] if top else None
+        old_rank = self._top_ranks.pop(internship_id, None)
+        if old_rank is not None:
+            del top[bisect.bisect_left(top, (old_rank, internship_id))]
+            outside = len(self._trend) - len(top) - (rank is not None)
+            if outside > 0 and (rank is None or rank < floor):
+                # A posting outside the ranking may now outrank it
+                self._top_stale = True
+                return
+        if rank is None or (len(top) >= TRENDING_TOP_K and rank <= top[0][0]):
+            return
+        bisect.insort(top, (rank, internship_id))
+        self._top_ranks[internship_id] = rank
+        if len(top) > TRENDING_TOP_K:
+            _, evicted = top.pop(0)
+            del self._top_ranks[evicted]
+
+    def _rebuild_top(self):
+        self._top = sorted(heapq.nlargest(
+            TRENDING_TOP_K,
+            ((trend_rank(score, updated_at), internship_id) for internship_id, (score, updated_at) in self._trend.items())
+        ))
+        self._top_ranks = {internship_id: rank for rank, internship_id in self._top}
+        self._top_stale = False
+        self.top_rebuilds += 1
+
+    def count(self, internship_id: str) -> int:
+        return self._counts.get(internship_id, 0)
+
+    def trending(self, candidates: Container[str], limit: int, now: Optional[int] = None) -> List[Tuple[str, float]]:
+        """Top `limit` IDs in `candidates` by decayed score, highest first.
+
+        Served from the maintained ranking. Only when too few of its postings
+        are candidates (e.g. right after a refresh dropped many of them) are
+        all scores scanned.
+        """
+        now = now_ms() if now is None else now
+        if self._top_stale:
+            self._rebuild_top()
+        trend = self._trend
+        top = []
+        for _, internship_id in reversed(self._top):
+            if len(top) >= limit:
+                break
+            if internship_id in candidates:
+                top.append(internship_id)
+        if len(top) < limit and len(trend) > len(self._top):
+            keyed = (
+                (trend_rank(score, updated_at), internship_id)
+                for internship_id, (score, updated_at) in trend.items()
+                if internship_id in candidates
+            )
+            top = [internship_id for _, internship_id in heapq.nlargest(limit, keyed)]
+        return [(internship_id, decayed_score(*trend[internship_id], now)) for internship_id in top]
+
+    def get_stats(self) -> dict:
+        return {
+            "postings_with_saves": len(self._counts),
+            "trending_candidates": len(self._trend),
+            "ranking_size": len(self._top),
+            "ranking_rebuilds": self.top_rebuilds,
+            "version": self.version,
+            "half_life_hours": TRENDING_HALF_LIFE_HOURS,
+        }
@@ -0,0 +1,238 @@
+"""
+In-process cache of each user's saved internship IDs
+"""
+import secrets
+import sys
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+# Rough per-ID cost of the intern table beyond the string itself (dict entry + list slot)
+_INTERN_OVERHEAD_BYTES = 72
+
+class _InternTable:
+    """Internship ID <-> ordinal; a new generation replaces it when it is compacted"""
+
+    __slots__ = ("ordinals", "names", "nbytes")
+
+    def __init__(self):
+        self.ordinals: Dict[str, int] = {}
+        self.names: List[str] = []
+        self.nbytes = 0
+
+    def intern(self, internship_id: str) -> int:
+        ordinal = self.ordinals.get(internship_id)
+        if ordinal is None:
+            ordinal = len(self.names)
+            self.ordinals[internship_id] = ordinal
+            self.names.append(internship_id)
+            self.nbytes += sys.getsizeof(internship_id) + _INTERN_OVERHEAD_BYTES
+        return ordinal
+
+class SavedIdSet:
+    """Immutable snapshot of one user's saved IDs.
+
+    IDs are stored as 4-byte ordinals from the cache's intern table: once in
+    save order (newest first) for listing, and once sorted for membership
+    tests by binary search. `version` changes on every change to the set.
+    Each snapshot keeps the table generation its ordinals refer to, so it
+    stays valid after the cache compacts its table.
+    """
+
+    __slots__ = ("version", "_order", "_sorted", "_table")
+
+    def __init__(self, version: int, order: array, table: _InternTable):
+        self.version = version
+        self._order = order
+        self._sorted = array("I", sorted(order))
+        self._table = table
+
+    def __contains__(self, internship_id: str) -> bool:
+        ordinal = self._table.ordinals.get(internship_id)
+        if ordinal is None:
+            return False
+        index = bisect_left(self._sorted, ordinal)
+        return index < len(self._sorted) and self._sorted[index] == ordinal
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def ids(self) -> List[str]:
+        """Saved internship IDs, most recently saved first"""
+        names = self._table.names
+        return [names[ordinal] for ordinal in self._order]
+
+    @property
+    def nbytes(self) -> int:
+        return sys.getsizeof(self) + sys.getsizeof(self._order) + sys.getsizeof(self._sorted)
+
+class SavedIdsCache:
+    """LRU cache of user ID -> SavedIdSet, bounded by memory and written through.
+
+    Versions come from one counter that never repeats within the process, and
+    ETags also carry a per-process nonce, so an ETag never matches a different
+    set, even after eviction or a restart. The cache only sees writes made
+    through this process; run one API worker or disable it with a zero cap.
+
+    The intern table counts towards `max_bytes`. Ordinals are reference
+    counted across cached entries, and once unreferenced IDs outnumber live
+    ones the table is rebuilt from the live entries.
+    """
+
+    def __init__(self, max_bytes: int = 8 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[int, SavedIdSet]" = OrderedDict()
+        self._table = _InternTable()
+        # Cached entries referencing each ordinal of the current table
+        self._refs: List[int] = []
+        self._live_ordinals = 0
+        self._entry_bytes = 0
+        self.compactions = 0
+        self._next_version = 1
+        # Bumped by every write-through; loads that raced a write are not stored
+        self._write_seq = 0
+        self._nonce = secrets.token_hex(4)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def current_bytes(self) -> int:
+        return self._entry_bytes + self._table.nbytes
+
+    def _intern(self, internship_id: str) -> int:
+        ordinal = self._table.intern(internship_id)
+        if ordinal == len(self._refs):
+            self._refs.append(0)
+        return ordinal
+
+    def _new_version(self) -> int:
+        version = self._next_version
+        self._next_version += 1
+        return version
+
+    def etag(self, saved: SavedIdSet) -> str:
+        return f'W/"{self._nonce}-{saved.version}"'
+
+    def get(self, user_id: int) -> Optional[SavedIdSet]:
+        """Get a user's cached set, or None on a miss"""
+        saved = self._entries.get(user_id)
+        if saved is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return saved
+
+    def write_seq(self) -> int:
+        """Token to take before loading from the database; pass it to `load`"""
+        return self._write_seq
+
+    def load(self, user_id: int, internship_ids: Iterable[str], write_seq: int) -> SavedIdSet:
+        """Build a set from database rows (newest first) and cache it unless a write raced the load"""
+        saved = SavedIdSet(self._new_version(), array("I", map(self._intern, internship_ids)), self._table)
+        if write_seq == self._write_seq:
+            self._put(user_id, saved)
+        return saved
+
+    def add(self, user_id: int, internship_id: str):
+        """Write-through for a committed save"""
+        self._write_seq += 1
+        saved = self._entries.get(user_id)
+        if saved is None:
+            return
+        ordinal = self._intern(internship_id)
+        if internship_id in saved:
+            return
+        self._put(user_id, SavedIdSet(self._new_version(), array("I", [ordinal]) + saved._order, self._table))
+
+    def discard(self, user_id: int, internship_id: str):
+        """Write-through for a committed unsave"""
+        self._write_seq += 1
+        saved = self._entries.get(user_id)
+        if saved is None or internship_id not in saved:
+            return
+        ordinal = saved._table.ordinals[internship_id]
+        order = array("I", (other for other in saved._order if other != ordinal))
+        self._put(user_id, SavedIdSet(self._new_version(), order, saved._table))
+
+    def invalidate(self, user_id: int):
+        """Drop a user's entry; the next read reloads it"""
+        self._write_seq += 1
+        saved = self._entries.pop(user_id, None)
+        if saved is not None:
+            self._release(saved)
+
+    def _retain(self, saved: SavedIdSet):
+        self._entry_bytes += saved.nbytes
+        refs = self._refs
+        for ordinal in saved._order:
+            if refs[ordinal] == 0:
+                self._live_ordinals += 1
+            refs[ordinal] += 1
+
+    def _release(self, saved: SavedIdSet):
+        self._entry_bytes -= saved.nbytes
+        if saved._table is not self._table:
+            return  # already dropped from the counts by a compaction
+        refs = self._refs
+        for ordinal in saved._order:
+            refs[ordinal] -= 1
+            if refs[ordinal] == 0:
+                self._live_ordinals -= 1
+
+    def _put(self, user_id: int, saved: SavedIdSet):
+        if saved._table is not self._table:
+            saved = self._rebase(saved)
+        previous = self._entries.pop(user_id, None)
+        # Retain before releasing the previous entry so shared ordinals never hit zero
+        if saved.nbytes <= self.max_bytes:
+            self._entries[user_id] = saved
+            self._retain(saved)
+        if previous is not None:
+            self._release(previous)
+
+        while self.current_bytes > self.max_bytes and self._entries:
+            if len(self._table.names) - self._live_ordinals > self._live_ordinals:
+                self._compact()
+                continue
+            _, old = self._entries.popitem(last=False)
+            self._release(old)
+            self.evictions += 1
+        if len(self._table.names) - self._live_ordinals > max(self._live_ordinals, 1024):
+            self._compact()
+
+    def _rebase(self, saved: SavedIdSet) -> SavedIdSet:
+        """The same set, same version, with ordinals from the current table"""
+        names = saved._table.names
+        return SavedIdSet(saved.version, array("I", (self._intern(names[o]) for o in saved._order)), self._table)
+
+    def _compact(self):
+        """Rebuild the intern table from the cached entries, dropping unreferenced IDs"""
+        entries = list(self._entries.items())
+        self._table = _InternTable()
+        self._refs = []
+        self._live_ordinals = 0
+        self._entry_bytes = 0
+        for user_id, saved in entries:
+            saved = self._rebase(saved)
+            self._entries[user_id] = saved
+            self._retain(saved)
+        self.compactions += 1
+
+    def get_stats(self) -> dict:
+        """Hit/miss counters and memory usage"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "interned_ids": len(self._table.names),
+            "intern_bytes": self._table.nbytes,
+            "compactions": self.compactions,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
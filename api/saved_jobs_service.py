@@ -1,119 +1,199 @@
 """
 Service for managing saved internships for users
 """
+import asyncio
+import base64
+import os
 import sqlite3
-from typing import List, Optional
+import time
+from typing import List, Optional, Tuple
 from datetime import datetime
-import secrets
-from database import get_db_connection
+from database import now_ms, saved_job_public_id, to_epoch_ms
 from models import SavedJob, Internship
+from repositories import SavedJobsRepository, PostingsRepository
+from saved_ids_cache import SavedIdsCache, SavedIdSet
+from reminder_scheduler import DeadlineReminderScheduler
 from services import InternshipService
 
+SAVED_IDS_CACHE_MAX_BYTES = int(os.getenv("SAVED_IDS_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+
+# Archival: saved jobs older than the retention window, or whose posting has
+# closed (deadline passed, or gone from the feed for the grace period), move
+# to saved_jobs_archive in short transactions
+SAVED_JOBS_RETENTION_DAYS = float(os.getenv("SAVED_JOBS_RETENTION_DAYS", "180"))
+ARCHIVE_CLOSED_GRACE_DAYS = float(os.getenv("ARCHIVE_CLOSED_GRACE_DAYS", "30"))
+ARCHIVE_INTERVAL_HOURS = float(os.getenv("ARCHIVE_INTERVAL_HOURS", "24"))
+ARCHIVE_SCAN_BATCH = int(os.getenv("ARCHIVE_SCAN_BATCH", "1000"))
+ARCHIVE_BATCH_PAUSE_MS = float(os.getenv("ARCHIVE_BATCH_PAUSE_MS", "10"))
+DAY_MS = 24 * 60 * 60 * 1000
+
+def encode_saved_jobs_cursor(saved_at: int, internship_id: str) -> str:
+    """Opaque page cursor for the saved row (saved_at, internship_id)"""
+    return base64.urlsafe_b64encode(f"{saved_at}:{internship_id}".encode("utf-8")).decode("ascii")
+
+def decode_saved_jobs_cursor(cursor: str) -> Tuple[int, str]:
+    """Inverse of encode_saved_jobs_cursor; raises ValueError if malformed"""
+    try:
+        saved_at, internship_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split(":", 1)
+        return int(saved_at), internship_id
+    except (ValueError, UnicodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
 class SavedJobsService:
     """Service for managing saved internships"""
     
     def __init__(self, internship_service: InternshipService):
         self.internship_service = internship_service
+        self.saved_jobs = SavedJobsRepository()
+        self.postings = PostingsRepository()
+        self.saved_ids = SavedIdsCache(SAVED_IDS_CACHE_MAX_BYTES)
+        self.reminders = DeadlineReminderScheduler()
+        self.last_archive: dict = {}
+        # Start (epoch ms) of the last feed sync that succeeded; postings it did
+        # not refresh are the ones that have left the feed
+        self.last_sync_at: Optional[int] = None
+        internship_service.refresh_listeners.append(self.sync_postings)
     
-    def save_job(self, user_id: str, internship_id: str) -> Optional[SavedJob]:
-        """Save an internship for a user"""
+    async def save_job(self, user_id: int, internship_id: str) -> Optional[SavedJob]:
+        """Save an internship for a user (`user_id` is the user's integer key).
+        
+        The posting is stored alongside, so it stays listable after it leaves
+        the feed. Returns None if already saved or the posting is unknown.
+        """
         try:
+            internship = await self.internship_service.get_internship(internship_id)
+            if internship is None:
+                return None
+            
             # Check if already saved
-            if self.is_job_saved(user_id, internship_id):
+            if await self.is_job_saved(user_id, internship_id):
                 return None
             
             # Create saved job
-            saved_job_id = secrets.token_urlsafe(16)
-            saved_at = datetime.now()
-            
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO saved_jobs (id, user_id, internship_id, saved_at)
-                VALUES (?, ?, ?, ?)
-            """, (saved_job_id, user_id, internship_id, saved_at.isoformat()))
-            conn.commit()
-            conn.close()
-            
-            return SavedJob(
-                id=saved_job_id,
+            saved_job = SavedJob(
+                id=saved_job_public_id(user_id, internship_id),
                 user_id=user_id,
                 internship_id=internship_id,
-                saved_at=saved_at
+                saved_at=datetime.now()
             )
+            remind_at = self.reminders.remind_at_for(internship)
+            await self.saved_jobs.insert(saved_job, internship, remind_at)
+            self.saved_ids.add(user_id, internship_id)
+            if remind_at is not None:
+                self.reminders.schedule(user_id, internship_id, remind_at)
+            self.internship_service.save_counts.record(internship_id, 1, to_epoch_ms(saved_job.saved_at))
+            return saved_job
         except sqlite3.IntegrityError:
             # Already saved (race condition)
             return None
     
-    def unsave_job(self, user_id: str, internship_id: str) -> bool:
+    async def unsave_job(self, user_id: int, internship_id: str) -> bool:
         """Remove a saved internship for a user"""
+        unsaved_at = now_ms()
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
-                DELETE FROM saved_jobs
-                WHERE user_id = ? AND internship_id = ?
-            """, (user_id, internship_id))
-            deleted_count = cursor.rowcount
-            conn.commit()
-            conn.close()
-            
-            return deleted_count > 0
+            deleted = await self.saved_jobs.delete(user_id, internship_id, unsaved_at)
         except Exception:
             return False
+        if deleted:
+            self.saved_ids.discard(user_id, internship_id)
+            self.reminders.cancel(user_id, internship_id)
+            self.internship_service.save_counts.record(internship_id, -1, unsaved_at)
+        return deleted
     
-    def is_job_saved(self, user_id: str, internship_id: str) -> bool:
+    async def is_job_saved(self, user_id: int, internship_id: str) -> bool:
         """Check if an internship is saved by a user"""
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT COUNT(*) as count FROM saved_jobs
-            WHERE user_id = ? AND internship_id = ?
-        """, (user_id, internship_id))
-        result = cursor.fetchone()
-        conn.close()
-        
-        return result['count'] > 0 if result else False
+        return internship_id in await self.get_saved_id_set(user_id)
     
-    async def get_saved_jobs(self, user_id: str) -> List[Internship]:
-        """Get all saved internships for a user with full internship data"""
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT internship_id, saved_at
-            FROM saved_jobs
-            WHERE user_id = ?
-            ORDER BY saved_at DESC
-        """, (user_id,))
-        rows = cursor.fetchall()
-        conn.close()
+    async def get_saved_jobs_page(
+        self,
+        user_id: int,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None
+    ) -> Tuple[bytes, Optional[str], int]:
+        """One page of a user's saved internships, most recent first.
         
-        # Get all internships
-        all_internships = await self.internship_service.get_internships()
+        Returns the serialized JSON array, the cursor for the next page (None
+        on the last page) and the user's total saved count. Pages are keyset
+        seeks over (saved_at, internship_id) left-joined to the stored
+        postings, so a page costs O(limit) regardless of catalog size or page
+        depth. Pages list every saved row, so the total can come from the
+        in-memory saved-ID set and still match what paging returns. Raises
+        ValueError for a malformed cursor.
+        """
+        after = decode_saved_jobs_cursor(cursor) if cursor else None
+        rows = await self.saved_jobs.list_postings_page(user_id, after, None if limit is None else limit + 1)
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_saved_jobs_cursor(rows[-1][0], rows[-1][1])
+        
+        total = len(await self.get_saved_id_set(user_id))
+        return b"[" + b",".join(row[2] for row in rows) + b"]", next_cursor, total
+    
+    async def load_save_counts(self):
+        """Load materialized save counts into memory (once, at startup)"""
+        self.internship_service.save_counts.load(await self.saved_jobs.list_save_counts())
+    
+    async def archive_saved_jobs(self) -> dict:
+        """Move expired saved jobs to the archive, one small transaction per batch.
         
-        # Create a map of internship IDs to internships
-        internship_map = {internship.id: internship for internship in all_internships}
+        Each batch scans the next ARCHIVE_SCAN_BATCH rows of the clustered
+        primary key, so no transaction holds the write lock for long and
+        request writes interleave between batches.
         
-        # Get saved internships in order they were saved
-        saved_internships = []
-        for row in rows:
-            internship_id = row['internship_id']
-            if internship_id in internship_map:
-                saved_internships.append(internship_map[internship_id])
+        A posting only counts as gone from the feed if the last successful
+        sync did not refresh it and it has not been refreshed for the grace
+        period. If no sync has succeeded within the grace period (e.g. the feed
+        has been failing), that rule is skipped, so an outage cannot archive
+        everyone's saves.
+        """
+        started = time.perf_counter()
+        now = now_ms()
+        saved_before = now - int(SAVED_JOBS_RETENTION_DAYS * DAY_MS)
+        grace_start = now - int(ARCHIVE_CLOSED_GRACE_DAYS * DAY_MS)
+        if self.last_sync_at is not None and self.last_sync_at >= grace_start:
+            seen_before = min(grace_start, self.last_sync_at)
+        else:
+            seen_before = None
+        after: Optional[Tuple[int, str]] = (-1, "")
+        batches = archived = 0
+        while after is not None:
+            after, keys = await self.saved_jobs.archive_batch(after, ARCHIVE_SCAN_BATCH, saved_before, seen_before, now)
+            batches += 1
+            archived += len(keys)
+            for user_id, internship_id in keys:
+                self.saved_ids.discard(user_id, internship_id)
+                self.reminders.cancel(user_id, internship_id)
+                self.internship_service.save_counts.record(internship_id, -1, now)
+            await asyncio.sleep(ARCHIVE_BATCH_PAUSE_MS / 1000)
         
-        return saved_internships
+        self.last_archive = {
+            "archived": archived,
+            "batches": batches,
+            "left_feed_rule_applied": seen_before is not None,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+        }
+        return self.last_archive
+    
+    async def sync_postings(self, internships: List[Internship]):
+        """Refresh stored postings from a new feed snapshot, moving reminders whose deadline changed"""
+        sync_started = now_ms()
+        updated, rescheduled = await self.postings.sync(internships, sync_started)
+        self.last_sync_at = sync_started
+        for user_id, internship_id, remind_at in rescheduled:
+            self.reminders.reschedule(user_id, internship_id, remind_at)
+        print(f"Refreshed {updated} saved postings ({len(rescheduled)} reminders rescheduled)")
     
-    def get_saved_job_ids(self, user_id: str) -> List[str]:
+    async def get_saved_job_ids(self, user_id: int) -> List[str]:
         """Get list of internship IDs saved by a user"""
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT internship_id
-            FROM saved_jobs
-            WHERE user_id = ?
-        """, (user_id,))
-        rows = cursor.fetchall()
-        conn.close()
-        
-        return [row['internship_id'] for row in rows]
+        return (await self.get_saved_id_set(user_id)).ids()
+    
+    async def get_saved_id_set(self, user_id: int) -> SavedIdSet:
+        """A user's saved IDs from the in-memory cache, loading them on a miss"""
+        saved = self.saved_ids.get(user_id)
+        if saved is None:
+            write_seq = self.saved_ids.write_seq()
+            internship_ids = await self.saved_jobs.list_internship_ids(user_id)
+            saved = self.saved_ids.load(user_id, internship_ids, write_seq)
+        return saved
 
@@ -1,10 +1,39 @@
 import httpx
 import asyncio
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple, Iterator, Callable, Awaitable
+from array import array
 from datetime import datetime
+import csv
+import io
 import json
 import os
-from models import Internship
+from models import Internship, InternshipFilters
+from prefix_index import PrefixIndex
+from query_cache import QueryResultCache
+from save_counts import SaveCountTracker
+
+# Field projections for list views. "summary" drops the long free-text fields;
+# clients fetch them lazily from GET /internships/{id}.
+INTERNSHIP_FIELDS: Tuple[str, ...] = tuple(Internship.model_fields)
+SUMMARY_FIELDS: Tuple[str, ...] = tuple(
+    field for field in INTERNSHIP_FIELDS if field not in ("description", "requirements", "duration")
+)
+NAMED_FIELD_SETS: Dict[str, Tuple[str, ...]] = {
+    "full": INTERNSHIP_FIELDS,
+    "summary": SUMMARY_FIELDS,
+}
+# Only the named projections get cached serializations; any other field list
+# is serialized per request, so varying `fields=` cannot grow the caches
+CACHED_FIELD_SETS = frozenset(NAMED_FIELD_SETS.values())
+
+SUGGEST_FIELDS = ("company", "location")
+
+# Longer search strings are answered by a scan and never cached
+QUERY_CACHE_MAX_SEARCH_LENGTH = int(os.getenv("QUERY_CACHE_MAX_SEARCH_LENGTH", "200"))
+
+EXPORT_FORMATS = ("ndjson", "csv")
+# Rows per chunk handed to the streaming response
+EXPORT_CHUNK_ROWS = 200
 
 class InternshipService:
     """Service to fetch and manage internship data"""
@@ -12,6 +41,22 @@ class InternshipService:
     def __init__(self):
         self.internships_cache: List[Internship] = []
         self.last_fetch: datetime = None
+        # Bumped every time the cache is replaced; derived caches are keyed on it
+        self.cache_version: int = 0
+        self._internships_by_id: Dict[str, Internship] = {}
+        self._positions_by_id: Dict[str, int] = {}
+        self._search_text: List[str] = []
+        # Whole unfiltered bodies per named projection, with the save-count version they embed
+        self._projection_cache: Dict[Tuple[str, ...], Tuple[int, bytes]] = {}
+        self._trending_cache: Dict[Tuple[Tuple[str, ...], int], Tuple[Tuple[int, int], bytes]] = {}
+        # Pre-serialized JSON per posting, per named projection, parallel to internships_cache
+        self._fragment_cache: Dict[Tuple[str, ...], List[Optional[bytes]]] = {}
+        self._suggest_indexes: Dict[str, PrefixIndex] = {}
+        self.query_cache = QueryResultCache(int(os.getenv("QUERY_CACHE_MAX_BYTES", str(4 * 1024 * 1024))))
+        # Maintained by SavedJobsService; read for save_count and trending
+        self.save_counts = SaveCountTracker()
+        # Awaited with the new snapshot after every successful refresh
+        self.refresh_listeners: List[Callable[[List[Internship]], Awaitable[Any]]] = []
         # Fantastic Jobs API configuration
         self.api_key = os.getenv("RAPIDAPI_KEY", "b55b10072cmshaa3327eadfbb864p1b5030jsnd01b971a8dff")
         self.api_host = "internships-api.p.rapidapi.com"
@@ -24,6 +69,256 @@ class InternshipService:
             await self.fetch_and_store_internships()
         return self.internships_cache
     
+    async def get_internship(self, internship_id: str) -> Optional[Internship]:
+        """Get a single internship by ID from the current snapshot"""
+        await self.get_internships()
+        return self._internships_by_id.get(internship_id)
+    
+    def resolve_fields(self, fields: Optional[str]) -> Tuple[str, ...]:
+        """Resolve a `fields=` query value to an ordered tuple of model fields.
+        
+        Accepts a named projection ("full", "summary") or a comma-separated
+        list of field names. The `id` field is always included.
+        """
+        if not fields:
+            return INTERNSHIP_FIELDS
+        if fields in NAMED_FIELD_SETS:
+            return NAMED_FIELD_SETS[fields]
+        
+        requested = {name.strip() for name in fields.split(",") if name.strip()}
+        unknown = requested - set(INTERNSHIP_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+        requested.add("id")
+        return tuple(field for field in INTERNSHIP_FIELDS if field in requested)
+    
+    def filter_internships(self, filters: InternshipFilters) -> array:
+        """Get snapshot positions of the internships matching the filters.
+        
+        Results are memoized per normalized query and cache version, except
+        for searches longer than QUERY_CACHE_MAX_SEARCH_LENGTH.
+        """
+        key = self._normalize_filters(filters)
+        if key[0] and len(key[0]) > QUERY_CACHE_MAX_SEARCH_LENGTH:
+            return array("I", self._scan_internships(*key))
+        positions = self.query_cache.get(key, self.cache_version)
+        if positions is None:
+            positions = array("I", self._scan_internships(*key))
+            self.query_cache.put(key, self.cache_version, positions)
+        return positions
+    
+    def _normalize_filters(self, filters: InternshipFilters) -> Tuple:
+        """Canonical, hashable form of a filter set"""
+        return (
+            filters.search.lower() if filters.search else None,
+            filters.location or None,
+            filters.company or None,
+            bool(filters.remote_only),
+            filters.salary_range.lower() if filters.salary_range else None,
+        )
+    
+    def _scan_internships(
+        self,
+        search: Optional[str],
+        location: Optional[str],
+        company: Optional[str],
+        remote_only: bool,
+        salary_range: Optional[str]
+    ) -> List[int]:
+        """Linear scan of the snapshot for a normalized query"""
+        matches = []
+        for position, internship in enumerate(self.internships_cache):
+            if search and search not in self._search_text[position]:
+                continue
+            if location and internship.location != location:
+                continue
+            if company and internship.company != company:
+                continue
+            if remote_only and not internship.remote:
+                continue
+            if salary_range and not self._matches_salary_range(internship.salary, salary_range):
+                continue
+            matches.append(position)
+        return matches
+    
+    def _matches_salary_range(self, salary: Optional[str], salary_range: str) -> bool:
+        """Salary bucket check, same rules as the frontend filter panel"""
+        salary = (salary or "").lower()
+        if salary_range == "paid":
+            return any(token in salary for token in ("paid", "$", "hourly", "competitive"))
+        if salary_range == "unpaid":
+            return "unpaid" in salary or "volunteer" in salary
+        if salary_range == "competitive":
+            return "competitive" in salary
+        if salary_range == "hourly":
+            return "hourly" in salary or "$" in salary
+        return True
+    
+    async def get_internships_json(
+        self,
+        fields: Tuple[str, ...] = INTERNSHIP_FIELDS,
+        filters: Optional[InternshipFilters] = None,
+        offset: int = 0,
+        limit: Optional[int] = None
+    ) -> Tuple[bytes, int]:
+        """Get a serialized JSON array for a projection and the total match count.
+        
+        Bodies are assembled from per-posting fragments cached per cache version,
+        so only postings that were never serialized under this projection cost
+        a model dump. The unfiltered, unpaginated body of a named projection is
+        cached whole until the next save or unsave changes a count.
+        """
+        await self.get_internships()
+        whole = (filters is None or filters.is_empty()) and offset == 0 and limit is None
+        if whole and fields in CACHED_FIELD_SETS:
+            counts_version = self.save_counts.version
+            cached = self._projection_cache.get(fields)
+            if cached is not None and cached[0] == counts_version:
+                return cached[1], len(self.internships_cache)
+            body = self._join_fragments(fields, range(len(self.internships_cache)))
+            self._projection_cache[fields] = (counts_version, body)
+            return body, len(self.internships_cache)
+        
+        if filters is None or filters.is_empty():
+            positions = range(len(self.internships_cache))
+        else:
+            positions = self.filter_internships(filters)
+        end = None if limit is None else offset + limit
+        return self._join_fragments(fields, positions[offset:end]), len(positions)
+    
+    def _join_fragments(self, fields: Tuple[str, ...], positions) -> bytes:
+        """Concatenate cached per-posting JSON fragments into a JSON array.
+        
+        Each fragment gets the posting's current save_count spliced in before
+        its closing brace, so counts never invalidate the fragments. Fragments
+        are only kept for the named projections.
+        """
+        fragments = self._fragment_cache.get(fields)
+        if fragments is None and fields in CACHED_FIELD_SETS:
+            fragments = [None] * len(self.internships_cache)
+            self._fragment_cache[fields] = fragments
+        
+        include = set(fields)
+        internships = self.internships_cache
+        count = self.save_counts.count
+        parts = []
+        for position in positions:
+            fragment = fragments[position] if fragments is not None else None
+            if fragment is None:
+                fragment = internships[position].model_dump_json(include=include).encode("utf-8")
+                if fragments is not None:
+                    fragments[position] = fragment
+            save_count = count(internships[position].id)
+            parts.append(b'%s,"save_count":%d}' % (fragment[:-1], save_count))
+        return b"[" + b",".join(parts) + b"]"
+    
+    async def get_trending_json(self, fields: Tuple[str, ...] = INTERNSHIP_FIELDS, limit: int = 10) -> bytes:
+        """Serialized JSON array of the most-saved current postings, decayed by age of the saves.
+        
+        Decay scales every score by the same factor, so the ranking only
+        changes on a save, an unsave or a refresh; bodies of named projections
+        are cached until then.
+        """
+        await self.get_internships()
+        versions = (self.cache_version, self.save_counts.version)
+        cached = self._trending_cache.get((fields, limit))
+        if cached is not None and cached[0] == versions:
+            return cached[1]
+        
+        top = self.save_counts.trending(self._internships_by_id, limit)
+        positions = [self._positions_by_id[internship_id] for internship_id, _ in top]
+        body = self._join_fragments(fields, positions)
+        if fields in CACHED_FIELD_SETS:
+            self._trending_cache[(fields, limit)] = (versions, body)
+        return body
+    
+    async def suggest(self, field: str, prefix: str, limit: int = 10) -> List[Tuple[str, int]]:
+        """Get typeahead completions for a company or location prefix"""
+        if field not in SUGGEST_FIELDS:
+            raise ValueError(f"Suggestions are only available for: {', '.join(SUGGEST_FIELDS)}")
+        
+        await self.get_internships()
+        index = self._suggest_indexes.get(field)
+        if index is None:
+            index = PrefixIndex(getattr(internship, field) for internship in self.internships_cache)
+            self._suggest_indexes[field] = index
+        return index.complete(prefix, limit)
+    
+    async def export_internships(
+        self,
+        export_format: str,
+        fields: Tuple[str, ...] = INTERNSHIP_FIELDS,
+        filters: Optional[InternshipFilters] = None
+    ) -> Iterator[bytes]:
+        """Get a chunked NDJSON or CSV stream over the current snapshot.
+        
+        The generator holds on to the snapshot it started with, so a refresh
+        mid-export neither mixes versions nor breaks the stream.
+        """
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {export_format}")
+        
+        await self.get_internships()
+        internships = self.internships_cache
+        if filters is None or filters.is_empty():
+            positions = range(len(internships))
+        else:
+            positions = self.filter_internships(filters)
+        
+        if export_format == "ndjson":
+            return self._iter_ndjson(internships, positions, fields)
+        return self._iter_csv(internships, positions, fields)
+    
+    def _iter_ndjson(self, internships: List[Internship], positions, fields: Tuple[str, ...]) -> Iterator[bytes]:
+        """Yield NDJSON chunks, reusing cached fragments when still current"""
+        fragments = self._fragment_cache.get(fields) if internships is self.internships_cache else None
+        include = set(fields)
+        lines = []
+        for position in positions:
+            fragment = fragments[position] if fragments else None
+            if fragment is None:
+                fragment = internships[position].model_dump_json(include=include).encode("utf-8")
+            lines.append(fragment)
+            if len(lines) >= EXPORT_CHUNK_ROWS:
+                yield b"\n".join(lines) + b"\n"
+                lines = []
+        if lines:
+            yield b"\n".join(lines) + b"\n"
+    
+    def _iter_csv(self, internships: List[Internship], positions, fields: Tuple[str, ...]) -> Iterator[bytes]:
+        """Yield CSV chunks with a header row"""
+        include = set(fields)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(fields)
+        rows = 0
+        for position in positions:
+            data = internships[position].model_dump(mode="json", include=include)
+            writer.writerow(["" if data[field] is None else data[field] for field in fields])
+            rows += 1
+            if rows >= EXPORT_CHUNK_ROWS:
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate()
+                rows = 0
+        if buffer.tell():
+            yield buffer.getvalue().encode("utf-8")
+    
+    def _set_cache(self, internships: List[Internship]):
+        """Replace the internship snapshot and drop everything derived from the old one"""
+        self.internships_cache = internships
+        self.cache_version += 1
+        self._internships_by_id = {internship.id: internship for internship in internships}
+        self._positions_by_id = {internship.id: position for position, internship in enumerate(internships)}
+        self._search_text = [
+            f"{internship.title}\n{internship.company}\n{internship.location}\n{internship.description}".lower()
+            for internship in internships
+        ]
+        self._projection_cache = {}
+        self._trending_cache = {}
+        self._fragment_cache = {}
+        self._suggest_indexes = {}
+    
     def _should_refresh(self) -> bool:
         """Check if data should be refreshed (24 hours)"""
         if not self.last_fetch:
@@ -63,9 +358,14 @@ class InternshipService:
                     seen_ids.add(internship.id)
             
             if unique_internships:
-                self.internships_cache = unique_internships
+                self._set_cache(unique_internships)
                 print(f"\nSuccessfully fetched {len(unique_internships)} unique internships from Fantastic Jobs API")
                 print(f"Companies: {', '.join(set(internship.company for internship in unique_internships[:10]))}")
+                for listener in self.refresh_listeners:
+                    try:
+                        await listener(unique_internships)
+                    except Exception as e:
+                        print(f"Error in refresh listener {listener.__qualname__}: {e}")
             else:
                 # No internships found from API - log warning but don't use mock data
                 print(f"\nWARNING: No internships found from Fantastic Jobs API")
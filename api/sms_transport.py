@@ -0,0 +1,149 @@
+"""
+SMS transports for notifications
+"""
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Tuple
+
+try:
+    from twilio.http.async_http_client import AsyncTwilioHttpClient
+    from twilio.rest import Client
+    TWILIO_AVAILABLE = True
+except ImportError:
+    TWILIO_AVAILABLE = False
+
+# Twilio clients kept for distinct credential sets (system + subscriber-supplied)
+TWILIO_CLIENT_CACHE_SIZE = int(os.getenv("TWILIO_CLIENT_CACHE_SIZE", "256"))
+# Accounts whose send latency is tracked, least recently used dropped first
+SMS_LATENCY_ACCOUNTS = 1024
+# Recent sends per account used for latency percentiles
+SMS_LATENCY_WINDOW = 256
+
+class _AccountLatency:
+    __slots__ = ("sent", "failed", "total", "recent")
+
+    def __init__(self):
+        self.sent = 0
+        self.failed = 0
+        self.total = 0.0
+        self.recent: Deque[float] = deque(maxlen=SMS_LATENCY_WINDOW)
+
+    def record(self, seconds: float, ok: bool):
+        if ok:
+            self.sent += 1
+        else:
+            self.failed += 1
+        self.total += seconds
+        self.recent.append(seconds)
+
+    def report(self) -> dict:
+        recent = sorted(self.recent)
+        count = self.sent + self.failed
+
+        def percentile(p: float) -> float:
+            return round(recent[min(len(recent) - 1, int(len(recent) * p))] * 1000, 2) if recent else 0.0
+
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "avg_ms": round(self.total / count * 1000, 2) if count else 0.0,
+            "p50_ms": percentile(0.5),
+            "p95_ms": percentile(0.95),
+        }
+
+class SMSTransport:
+    """Interface for sending a text message from an SMS provider account"""
+
+    async def send(self, to: str, body: str, account_sid: str, auth_token: str, from_number: str) -> str:
+        """Send `body` to `to` (E.164); returns the provider's message ID, raises on failure"""
+        raise NotImplementedError
+
+    async def close(self):
+        """Release connections; the transport may not be used afterwards"""
+
+    def get_stats(self) -> dict:
+        return {}
+
+class TwilioSMSTransport(SMSTransport):
+    """Twilio clients cached per credential set, all sending over one async HTTP pool.
+
+    Building a twilio.rest.Client is not free and each one used to open its
+    own connections, so clients are kept in an LRU keyed by (account SID,
+    auth token) and share a single AsyncTwilioHttpClient. Sends use the SDK's
+    async API, so nothing blocks the event loop. Send latency is tracked per
+    account, so one slow or failing subscriber account is visible on its own.
+    """
+
+    def __init__(self, max_clients: int = TWILIO_CLIENT_CACHE_SIZE, http_client=None):
+        self.max_clients = max_clients
+        # Created on first send: the aiohttp session must belong to the running loop
+        self._http = http_client
+        self._clients: "OrderedDict[Tuple[str, str], Client]" = OrderedDict()
+        self._latency: "OrderedDict[str, _AccountLatency]" = OrderedDict()
+        self.client_hits = 0
+        self.client_misses = 0
+        self.client_evictions = 0
+
+    def _client(self, account_sid: str, auth_token: str) -> "Client":
+        key = (account_sid, auth_token)
+        client = self._clients.get(key)
+        if client is not None:
+            self._clients.move_to_end(key)
+            self.client_hits += 1
+            return client
+
+        self.client_misses += 1
+        if self._http is None:
+            self._http = AsyncTwilioHttpClient()
+        client = Client(account_sid, auth_token, http_client=self._http)
+        self._clients[key] = client
+        while len(self._clients) > self.max_clients:
+            self._clients.popitem(last=False)
+            self.client_evictions += 1
+        return client
+
+    def _account_latency(self, account_sid: str) -> _AccountLatency:
+        stats = self._latency.get(account_sid)
+        if stats is None:
+            stats = self._latency[account_sid] = _AccountLatency()
+            while len(self._latency) > SMS_LATENCY_ACCOUNTS:
+                self._latency.popitem(last=False)
+        else:
+            self._latency.move_to_end(account_sid)
+        return stats
+
+    async def send(self, to: str, body: str, account_sid: str, auth_token: str, from_number: str) -> str:
+        if not TWILIO_AVAILABLE:
+            raise RuntimeError("Twilio not available. Install with: pip install twilio")
+        client = self._client(account_sid, auth_token)
+        stats = self._account_latency(account_sid)
+        started = time.perf_counter()
+        try:
+            message = await client.messages.create_async(body=body, from_=from_number, to=to)
+        except Exception:
+            stats.record(time.perf_counter() - started, False)
+            raise
+        stats.record(time.perf_counter() - started, True)
+        return message.sid
+
+    async def close(self):
+        self._clients.clear()
+        if self._http is not None:
+            await self._http.close()
+            self._http = None
+
+    def get_stats(self) -> dict:
+        """Client cache counters and send latency per account (SIDs shortened)"""
+        return {
+            "transport": "twilio",
+            "clients": len(self._clients),
+            "max_clients": self.max_clients,
+            "client_hits": self.client_hits,
+            "client_misses": self.client_misses,
+            "client_evictions": self.client_evictions,
+            "accounts": {
+                f"{account_sid[:6]}...{account_sid[-4:]}": stats.report()
+                for account_sid, stats in self._latency.items()
+            },
+        }
@@ -0,0 +1,11 @@
+import os
+import sys
+import tempfile
+
+# Modules read DB_PATH at import time; point it at a throwaway database first
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="api-tests-"), "test.db")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import init_database
+
+init_database()
@@ -0,0 +1,40 @@
+import asyncio
+import threading
+
+from database import async_db
+
+def test_cancelled_write_does_not_stop_writer():
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow(conn):
+        started.set()
+        release.wait(5)
+        return "slow"
+
+    def fast(conn):
+        return "fast"
+
+    async def scenario():
+        running = asyncio.create_task(async_db.write(slow))
+        await asyncio.to_thread(started.wait, 5)
+        # One write cancelled while it runs, one while it is still queued
+        queued = asyncio.create_task(async_db.write(fast))
+        await asyncio.sleep(0.01)
+        running.cancel()
+        queued.cancel()
+        release.set()
+        await asyncio.gather(running, queued, return_exceptions=True)
+        return await asyncio.wait_for(async_db.write(fast), 5)
+
+    assert asyncio.run(scenario()) == "fast"
+    assert async_db.writer._thread.is_alive()
+
+def test_new_databases_use_incremental_vacuum():
+    from database import get_db_connection
+
+    conn = get_db_connection()
+    try:
+        assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    finally:
+        conn.close()
@@ -0,0 +1,110 @@
+import asyncio
+from email.message import EmailMessage
+
+import pytest
+
+from benchmarks.fake_servers import FakeSMTPServer, unverified_context
+from email_transport import EmailDeliveryError, SMTPReplyError, SMTPTransport
+
+def message(to, sender="app@example.com"):
+    msg = EmailMessage()
+    msg["Subject"] = "Daily CS Internship Digest"
+    msg["From"] = sender
+    msg["To"] = to
+    msg.set_content("New internships")
+    return msg
+
+def run_against(server, scenario, **transport_options):
+    """Run scenario(transport) against a started `server`, then shut both down"""
+    async def main():
+        await server.start()
+        options = {"username": "app", "password": "secret", "tls_context": unverified_context()}
+        options.update(transport_options)
+        transport = SMTPTransport("127.0.0.1", server.port, **options)
+        try:
+            return await scenario(transport)
+        finally:
+            await transport.close()
+            await server.stop()
+    return asyncio.run(main())
+
+@pytest.mark.parametrize("pipelining", [True, False])
+def test_rejected_recipient_fails_only_its_message(pipelining):
+    server = FakeSMTPServer(pipelining=pipelining)
+
+    async def scenario(transport):
+        return await asyncio.gather(
+            transport.send(message("user@bounce.example.org")),
+            transport.send(message("user@example.com")),
+            return_exceptions=True
+        )
+
+    bounced, delivered = run_against(server, scenario, pool_size=1)
+    assert isinstance(bounced, SMTPReplyError) and bounced.code == 550
+    assert delivered is None
+    assert server.messages == 1
+
+def test_rejected_sender_ends_the_transaction():
+    server = FakeSMTPServer(pipelining=False, reject_sender="blocked.example.org")
+
+    async def scenario(transport):
+        with pytest.raises(SMTPReplyError) as refused:
+            await transport.send(message("user@example.com", sender="app@blocked.example.org"))
+        await transport.send(message("user@example.com"))
+        return refused.value
+
+    refused = run_against(server, scenario, pool_size=1)
+    assert refused.code == 550
+    # Only the accepted message got as far as RCPT and DATA
+    assert server.commands["RCPT"] == 1
+    assert server.commands["DATA"] == 1
+    assert server.commands["RSET"] == 1
+    assert server.messages == 1
+
+def test_dropped_connection_is_reopened_and_retried():
+    server = FakeSMTPServer(drop_after=2)
+
+    async def scenario(transport):
+        await asyncio.gather(*(transport.send(message(f"user{i}@example.com")) for i in range(5)))
+        return transport.get_stats()
+
+    stats = run_against(server, scenario, pool_size=1, pipeline_depth=1)
+    assert server.messages == 5
+    assert server.dropped >= 2
+    assert stats["reconnects"] == server.dropped
+    assert stats["sent"] == 5 and stats["failed"] == 0
+
+def test_credentials_are_never_sent_without_starttls():
+    server = FakeSMTPServer(starttls=False)
+
+    async def scenario(transport):
+        with pytest.raises(EmailDeliveryError, match="does not offer STARTTLS"):
+            await transport.send(message("user@example.com"))
+
+    run_against(server, scenario, pool_size=1)
+    assert server.commands["AUTH"] == 0
+    assert server.commands["STARTTLS"] == 0
+
+def test_credentials_are_refused_when_starttls_is_disabled():
+    server = FakeSMTPServer()
+
+    async def scenario(transport):
+        with pytest.raises(EmailDeliveryError, match="unencrypted"):
+            await transport.send(message("user@example.com"))
+
+    run_against(server, scenario, pool_size=1, starttls=False)
+    assert server.commands["AUTH"] == 0
+
+def test_close_fails_queued_sends():
+    # Slow replies keep the first message in flight while the rest wait in the queue
+    server = FakeSMTPServer(latency_ms=400)
+
+    async def scenario(transport):
+        sends = [asyncio.create_task(transport.send(message(f"user{i}@example.com"))) for i in range(3)]
+        await asyncio.sleep(0.1)
+        await transport.close()
+        return await asyncio.wait_for(asyncio.gather(*sends, return_exceptions=True), 1)
+
+    results = run_against(server, scenario, pool_size=1, pipeline_depth=1)
+    assert all(isinstance(result, EmailDeliveryError) for result in results)
+    assert all("closed" in str(result) for result in results)
@@ -0,0 +1,42 @@
+import pytest
+
+from login_throttle import SlidingWindowLimiter
+
+def test_limit_is_enforced_inside_one_window():
+    limiter = SlidingWindowLimiter(limit=3, window_seconds=10)
+
+    assert [limiter.hit("alice", now) for now in (0.0, 1.0, 2.0)] == [0.0, 0.0, 0.0]
+    # Rejected until the window ends; the previous one was empty
+    assert limiter.hit("alice", 3.0) == pytest.approx(7.0)
+    assert limiter.hit("alice", 9.999) == pytest.approx(0.001)
+    assert limiter.rejected == 2
+
+def test_previous_window_slides_out_gradually():
+    limiter = SlidingWindowLimiter(limit=3, window_seconds=10)
+    for now in (0.0, 1.0, 2.0):
+        limiter.hit("alice", now)
+
+    # At the boundary the full previous window still counts
+    retry_after = limiter.hit("alice", 10.0)
+    assert retry_after == pytest.approx(10 / 3)
+    assert limiter.hit("alice", 10.0 + retry_after - 0.01) > 0
+    assert limiter.hit("alice", 10.0 + retry_after + 0.01) == 0.0
+
+def test_window_before_last_is_forgotten():
+    limiter = SlidingWindowLimiter(limit=3, window_seconds=10)
+    for now in (0.0, 1.0, 2.0):
+        limiter.hit("alice", now)
+
+    assert [limiter.hit("alice", now) for now in (20.0, 20.5, 21.0)] == [0.0, 0.0, 0.0]
+
+def test_keys_are_limited_independently_and_evicted_lru():
+    limiter = SlidingWindowLimiter(limit=1, window_seconds=10, max_keys=2)
+
+    assert limiter.hit("alice", 0.0) == 0.0
+    assert limiter.hit("bob", 0.0) == 0.0
+    assert limiter.hit("alice", 1.0) > 0
+    limiter.hit("carol", 1.0)
+
+    # bob was least recently seen, so its state was dropped
+    assert limiter.evictions == 1
+    assert limiter.hit("bob", 2.0) == 0.0
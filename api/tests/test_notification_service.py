@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+import database
+from email_transport import LoggingTransport
+from models import NotificationPreferences
+from notification_service import NotificationService
+
+def preferences(email, token=None):
+    return NotificationPreferences(
+        email=email,
+        phone="5550000000",
+        twilio_account_sid="ACsubscriber" if token else None,
+        twilio_auth_token=token
+    )
+
+def stored(service, email):
+    async def scenario():
+        return [p for _, p in await service.subscribers.list_page(0, 1000) if p.email == email]
+    return asyncio.run(scenario())
+
+def test_token_is_rejected_without_a_key(monkeypatch):
+    monkeypatch.setattr(database, "SUBSCRIBER_SECRETS_KEY", None)
+    service = NotificationService(email_transport=LoggingTransport())
+
+    with pytest.raises(ValueError):
+        asyncio.run(service.subscribe_user(preferences("nokey@example.com", "secret")))
+    assert stored(service, "nokey@example.com") == []
+
+    assert asyncio.run(service.subscribe_user(preferences("plain@example.com")))
+    assert len(stored(service, "plain@example.com")) == 1
+
+def test_token_is_stored_encrypted_with_a_key(monkeypatch):
+    monkeypatch.setattr(database, "SUBSCRIBER_SECRETS_KEY", "test-key")
+    service = NotificationService(email_transport=LoggingTransport())
+
+    assert asyncio.run(service.subscribe_user(preferences("key@example.com", "secret")))
+
+    [subscriber] = stored(service, "key@example.com")
+    assert subscriber.twilio_auth_token == "secret"
+    with database.db_connection() as conn:
+        raw = conn.execute("SELECT twilio_auth_token FROM subscribers WHERE email = 'key@example.com'").fetchone()[0]
+    assert raw.startswith("fernet:") and "secret" not in raw
+
+def test_subscriber_without_a_usable_token_uses_the_gateway():
+    service = NotificationService(email_transport=LoggingTransport())
+    service.use_twilio = False
+    # As read back when the stored token cannot be decrypted
+    subscriber = NotificationPreferences(email="old@example.com", phone="5550000000", twilio_account_sid="ACsubscriber")
+
+    assert service._sms_channel(subscriber) == "gateway"
@@ -0,0 +1,27 @@
+import random
+from collections import Counter
+
+from prefix_index import PrefixIndex
+
+def brute_force(counts, prefix, limit):
+    matches = [(value, count) for value, count in counts.items() if value.startswith(prefix)]
+    return sorted(matches, key=lambda match: (-match[1], match[0]))[:limit]
+
+def test_lookups_match_brute_force():
+    rng = random.Random(29)
+    values = ["".join(rng.choice("abc") for _ in range(rng.randint(1, 5))) for _ in range(2000)]
+    index = PrefixIndex(values)
+    counts = Counter(values)
+
+    prefixes = [""] + sorted({value[:length] for value in counts for length in range(1, 4)}) + ["abcabc", "d"]
+    for prefix in prefixes:
+        for limit in (0, 1, 3, 10, len(counts) + 1):
+            assert index.complete(prefix, limit) == brute_force(counts, prefix, limit), (prefix, limit)
+
+def test_lookups_ignore_case():
+    index = PrefixIndex(["Google", "Google", "GoDaddy", "Amazon", ""])
+
+    assert len(index) == 3
+    assert index.complete("go") == [("Google", 2), ("GoDaddy", 1)]
+    assert index.complete("GOD") == [("GoDaddy", 1)]
+    assert index.complete("z") == []
@@ -0,0 +1,59 @@
+from array import array
+
+from query_cache import QueryResultCache
+
+def positions(count):
+    return array("I", range(count))
+
+def test_least_recently_used_entries_are_evicted_by_size():
+    probe = QueryResultCache()
+    entry_size = probe._entry_size(("remote", None), positions(100))
+    cache = QueryResultCache(max_bytes=entry_size * 2)
+
+    cache.put(("remote", None), 1, positions(100))
+    cache.put(("denver", None), 1, positions(100))
+    assert cache.get(("remote", None), 1) is not None
+    cache.put(("austin", None), 1, positions(100))
+
+    # "denver" was the least recently used once "remote" was read again
+    assert cache.get(("denver", None), 1) is None
+    assert cache.get(("remote", None), 1) is not None
+    assert cache.get(("austin", None), 1) is not None
+    assert cache.evictions == 1
+    assert cache.current_bytes <= cache.max_bytes
+
+    # One large result displaces several small ones until it fits
+    cache.put(("any", None), 1, positions(150))
+    assert cache.get_stats()["entries"] == 1
+    assert cache.evictions == 3
+
+def test_entries_larger_than_the_cap_are_not_stored():
+    cache = QueryResultCache(max_bytes=1024)
+    cache.put(("small", None), 1, positions(10))
+    cache.put(("huge", None), 1, positions(10000))
+
+    assert cache.get(("huge", None), 1) is None
+    assert cache.get(("small", None), 1) is not None
+    assert cache.evictions == 0
+
+def test_replacing_an_entry_keeps_the_byte_count_exact():
+    cache = QueryResultCache()
+    cache.put(("remote", None), 1, positions(500))
+    cache.put(("remote", None), 1, positions(10))
+
+    assert cache.current_bytes == cache._entry_size(("remote", None), positions(10))
+
+def test_search_text_counts_toward_the_size():
+    cache = QueryResultCache()
+    short = cache._entry_size((None, "go"), positions(1))
+    long = cache._entry_size((None, "go" * 1000), positions(1))
+
+    assert long - short >= 1998
+
+def test_new_snapshot_version_drops_entries():
+    cache = QueryResultCache()
+    cache.put(("remote", None), 1, positions(10))
+
+    assert cache.get(("remote", None), 2) is None
+    assert cache.current_bytes == 0
+    assert cache.invalidations == 1
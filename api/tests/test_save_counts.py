@@ -0,0 +1,23 @@
+import heapq
+import random
+
+import save_counts
+from save_counts import SaveCountTracker, trend_rank
+
+def test_maintained_ranking_matches_a_full_scan(monkeypatch):
+    monkeypatch.setattr(save_counts, "TRENDING_TOP_K", 5)
+    rng = random.Random(7)
+    tracker = SaveCountTracker()
+    ids = [f"i{n}" for n in range(20)]
+    candidates = set(ids[:15])
+    now = 0
+    for _ in range(2000):
+        now += rng.randrange(0, 3600 * 1000)
+        internship_id = rng.choice(ids)
+        delta = 1 if rng.random() < 0.6 or not tracker.count(internship_id) else -1
+        tracker.record(internship_id, delta, now)
+
+        expected = heapq.nlargest(
+            5, ((trend_rank(*tracker._trend[i]), i) for i in tracker._trend if i in candidates)
+        )
+        assert [i for i, _ in tracker.trending(candidates, 5, now)] == [i for _, i in expected]
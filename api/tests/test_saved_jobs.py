@@ -0,0 +1,163 @@
+import asyncio
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import database
+from database import init_database, get_db_connection, now_ms
+from models import Internship
+from repositories import SavedJobsRepository, PostingsRepository
+
+def posting(internship_id, **fields):
+    return Internship(
+        id=internship_id, title=f"Intern {internship_id}", company="Acme", location="Remote",
+        description="", posted_date=datetime(2024, 1, 1), source_url="", source="test", **fields
+    )
+
+def legacy_database(monkeypatch, saves):
+    """A database at schema version 1 holding `saves` for one user, migrated to the current schema"""
+    monkeypatch.setattr(database, "DB_PATH", os.path.join(tempfile.mkdtemp(prefix="api-tests-"), "legacy.db"))
+    conn = get_db_connection()
+    database._migration_1_initial_schema(conn)
+    conn.execute("INSERT INTO users VALUES ('u1', 'alice', 'hash', '2024-01-01T00:00:00')")
+    conn.executemany(
+        "INSERT INTO saved_jobs VALUES (?, 'u1', ?, ?)",
+        [(f"s{n}", internship_id, f"2024-01-0{n + 1}T00:00:00") for n, internship_id in enumerate(saves)]
+    )
+    conn.execute("PRAGMA user_version = 1")
+    conn.commit()
+    init_database()
+    return conn
+
+def test_migrated_saves_stay_listed(monkeypatch):
+    conn = legacy_database(monkeypatch, ["id1", "gone"])
+    user_id = conn.execute("SELECT id FROM users WHERE username = 'alice'").fetchone()[0]
+
+    rows = SavedJobsRepository._list_postings_page(conn, user_id, None, None)
+
+    assert [row[1] for row in rows] == ["gone", "id1"]
+    assert json.loads(rows[0][2])["title"] == "No longer available"
+
+def test_saved_jobs_pages_add_up_to_total():
+    from database import async_db
+    from saved_jobs_service import SavedJobsService
+    from services import InternshipService
+
+    def seed(conn):
+        user_id = conn.execute("""
+            INSERT INTO users (public_id, username, password_hash, created_at)
+            VALUES ('pager', 'pager', 'hash', 0)
+        """).lastrowid
+        # Three saves, none with a stored posting
+        conn.executemany(
+            "INSERT INTO saved_jobs (user_id, internship_id, saved_at) VALUES (?, ?, ?)",
+            [(user_id, f"job{n}", now_ms() + n) for n in range(3)]
+        )
+        return user_id
+
+    async def scenario():
+        service = SavedJobsService(InternshipService())
+        user_id = await async_db.write(seed)
+        listed, cursor = [], None
+        while True:
+            body, cursor, total = await service.get_saved_jobs_page(user_id, cursor, 2)
+            listed.extend(item["id"] for item in json.loads(body))
+            if cursor is None:
+                return listed, total
+
+    listed, total = asyncio.run(scenario())
+    assert listed == ["job2", "job1", "job0"]
+    assert total == 3
+
+def test_migrated_saves_get_the_archive_grace_period(monkeypatch):
+    conn = legacy_database(monkeypatch, ["gone"])
+    now = now_ms()
+    saved_before = 0  # retention alone expires nothing
+
+    def archive(seen_before):
+        return SavedJobsRepository._archive_batch(conn, (-1, ""), 100, saved_before, seen_before, now)
+
+    assert archive(now - 30 * 24 * 60 * 60 * 1000)[1] == []
+    _, archived = archive(now + 1)
+    assert [key[1] for key in archived] == ["gone"]
+    assert conn.execute("SELECT payload FROM saved_jobs_archive").fetchone()[0] is not None
+
+def test_sync_replaces_placeholders_of_postings_in_the_feed(monkeypatch):
+    conn = legacy_database(monkeypatch, ["id1", "gone"])
+    user_id = conn.execute("SELECT id FROM users WHERE username = 'alice'").fetchone()[0]
+
+    assert PostingsRepository._sync(conn, [posting("id1"), posting("unsaved")], 0) == (1, [])
+
+    titles = {row[1]: json.loads(row[2])["title"] for row in SavedJobsRepository._list_postings_page(conn, user_id, None, None)}
+    assert titles == {"id1": "Intern id1", "gone": "No longer available"}
+
+def test_sync_schedules_reminders_for_new_deadlines(monkeypatch):
+    conn = legacy_database(monkeypatch, ["id1", "gone"])
+    user_id = conn.execute("SELECT id FROM users WHERE username = 'alice'").fetchone()[0]
+    deadline = datetime.now() + timedelta(days=1)
+    now = now_ms()
+
+    _, rescheduled = PostingsRepository._sync(conn, [posting("id1", application_deadline=deadline)], now)
+    assert rescheduled == [(user_id, "id1", now)]
+    assert [tuple(row) for row in conn.execute("SELECT internship_id, remind_at FROM deadline_reminders")] == [("id1", now)]
+
+    # The deadline is dropped again
+    _, rescheduled = PostingsRepository._sync(conn, [posting("id1")], now)
+    assert rescheduled == [(user_id, "id1", None)]
+    assert conn.execute("SELECT COUNT(*) FROM deadline_reminders").fetchone()[0] == 0
+
+def test_migration_schedules_reminders_for_stored_deadlines(monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", os.path.join(tempfile.mkdtemp(prefix="api-tests-"), "v5.db"))
+    conn = get_db_connection()
+    for migration in database.MIGRATIONS[:5]:
+        migration(conn)
+    conn.execute("INSERT INTO users (public_id, username, password_hash, created_at) VALUES ('u1', 'alice', 'hash', 0)")
+    conn.execute("INSERT INTO saved_jobs VALUES (1, 'id1', 0)")
+    deadline = datetime.now() + timedelta(days=1)
+    conn.execute(
+        "INSERT INTO postings (internship_id, payload, updated_at) VALUES ('id1', ?, 0)",
+        (database.encode_posting(posting("id1", application_deadline=deadline)),)
+    )
+    conn.execute("PRAGMA user_version = 5")
+    conn.commit()
+    init_database()
+
+    row = conn.execute("SELECT remind_at, deadline FROM deadline_reminders WHERE internship_id = 'id1'").fetchone()
+    assert row['deadline'] == database.to_epoch_ms(deadline)
+    assert row['remind_at'] <= now_ms()
+
+def test_archival_keeps_unrefreshed_postings_until_a_sync_succeeds():
+    from database import async_db
+    from saved_jobs_service import SavedJobsService, DAY_MS
+    from services import InternshipService
+
+    now = now_ms()
+    stale = posting("stale")
+
+    def seed(conn):
+        user_id = conn.execute("""
+            INSERT INTO users (public_id, username, password_hash, created_at)
+            VALUES ('archiver', 'archiver', 'hash', 0)
+        """).lastrowid
+        conn.execute("INSERT INTO saved_jobs (user_id, internship_id, saved_at) VALUES (?, 'stale', ?)", (user_id, now))
+        PostingsRepository._upsert(conn, stale)
+        # Last refreshed by the feed long ago
+        conn.execute("UPDATE postings SET updated_at = ? WHERE internship_id = 'stale'", (now - 60 * DAY_MS,))
+        return user_id
+
+    async def scenario():
+        service = SavedJobsService(InternshipService())
+        user_id = await async_db.write(seed)
+        # No feed sync has succeeded: the feed may be down, so nothing counts as gone
+        await service.archive_saved_jobs()
+        kept = await service.saved_jobs.exists(user_id, "stale")
+        # A sync without the posting confirms it left the feed
+        await service.sync_postings([posting("other")])
+        report = await service.archive_saved_jobs()
+        return kept, report, await service.saved_jobs.exists(user_id, "stale")
+
+    kept, report, still_saved = asyncio.run(scenario())
+    assert kept
+    assert report["left_feed_rule_applied"]
+    assert not still_saved
@@ -0,0 +1,85 @@
+import asyncio
+import csv
+import io
+import json
+from datetime import datetime
+
+import pytest
+
+import services
+from models import Internship, InternshipFilters
+from services import InternshipService, SUMMARY_FIELDS
+
+def service_with_postings(count=3):
+    service = InternshipService()
+    service._set_cache([
+        Internship(
+            id=f"i{n}", title="Intern", company="Acme", location="Remote", description="",
+            posted_date=datetime(2024, 1, 1), source_url="", source="test"
+        )
+        for n in range(count)
+    ])
+    service.last_fetch = datetime.now()
+    return service
+
+def test_only_named_projections_keep_fragments():
+    service = service_with_postings()
+
+    async def scenario():
+        await service.get_internships_json(service.resolve_fields("title,company"), offset=1)
+        await service.get_internships_json(service.resolve_fields("summary"), offset=1)
+
+    asyncio.run(scenario())
+    assert list(service._fragment_cache) == [SUMMARY_FIELDS]
+
+def test_only_named_projections_keep_whole_bodies():
+    service = service_with_postings()
+
+    async def scenario():
+        custom, _ = await service.get_internships_json(service.resolve_fields("title"))
+        await service.get_internships_json(service.resolve_fields("summary"))
+        return custom
+
+    assert asyncio.run(scenario()).count(b'"title"') == 3
+    assert list(service._projection_cache) == [SUMMARY_FIELDS]
+
+def export(service, export_format, fields, filters=None):
+    async def scenario():
+        return await service.export_internships(export_format, fields, filters)
+    return asyncio.run(scenario())
+
+def test_ndjson_export_streams_in_chunks(monkeypatch):
+    monkeypatch.setattr(services, "EXPORT_CHUNK_ROWS", 2)
+    service = service_with_postings(5)
+
+    chunks = list(export(service, "ndjson", ("id", "company")))
+
+    assert [chunk.count(b"\n") for chunk in chunks] == [2, 2, 1]
+    rows = [json.loads(line) for line in b"".join(chunks).splitlines()]
+    assert rows == [{"id": f"i{n}", "company": "Acme"} for n in range(5)]
+
+def test_csv_export_has_a_header_and_blank_nulls(monkeypatch):
+    monkeypatch.setattr(services, "EXPORT_CHUNK_ROWS", 2)
+    service = service_with_postings(3)
+
+    chunks = list(export(service, "csv", ("id", "salary")))
+
+    assert len(chunks) == 2
+    rows = list(csv.reader(io.StringIO(b"".join(chunks).decode("utf-8"))))
+    assert rows == [["id", "salary"], ["i0", ""], ["i1", ""], ["i2", ""]]
+
+def test_export_applies_filters_and_keeps_its_snapshot():
+    service = service_with_postings(3)
+    service.internships_cache[1].company = "Globex"
+    service._set_cache(list(service.internships_cache))
+
+    stream = export(service, "ndjson", ("id",), InternshipFilters(company="Globex"))
+    service._set_cache([])
+
+    assert b"".join(stream) == b'{"id":"i1"}\n'
+
+def test_export_rejects_unknown_formats():
+    service = service_with_postings()
+
+    with pytest.raises(ValueError):
+        export(service, "xml", ("id",))
@@ -0,0 +1,51 @@
+import ttl_cache
+from ttl_cache import TTLCache
+
+def test_entries_expire_after_their_ttl(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(ttl_cache.time, "monotonic", lambda: clock[0])
+    cache = TTLCache(ttl_seconds=60)
+
+    cache.set("user", "alice")
+    # A token expiring sooner than the default TTL shortens the entry's life
+    cache.set("claims", {"sub": "alice"}, ttl_seconds=5)
+    clock[0] = 104.9
+    assert cache.get("claims") == {"sub": "alice"}
+    clock[0] = 105.0
+    assert cache.get("claims") is None
+    assert cache.get("user") == "alice"
+    clock[0] = 160.0
+    assert cache.get("user") is None
+    assert len(cache) == 0
+
+def test_ttl_cannot_be_extended_or_negative(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(ttl_cache.time, "monotonic", lambda: clock[0])
+    cache = TTLCache(ttl_seconds=10)
+
+    cache.set("long", 1, ttl_seconds=3600)
+    cache.set("expired", 2, ttl_seconds=-1)
+    clock[0] = 10.0
+    assert cache.get("long") is None
+    assert "expired" not in cache._entries
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.evictions == 1
+
+def test_invalidate_drops_one_entry():
+    cache = TTLCache()
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.invalidate("a")
+    cache.invalidate("missing")
+
+    assert cache.get("a") is None and cache.get("b") == 2
+    assert cache.invalidations == 1
@@ -0,0 +1,49 @@
+import asyncio
+
+import bcrypt
+
+import user_service
+from user_service import UserService, calibrate_bcrypt_rounds, bcrypt_rounds_of
+
+def stub_timer(sample_ms):
+    """A timer under which each calibration hash takes the given milliseconds"""
+    def ticks():
+        now = 0.0
+        for ms in sample_ms:
+            yield now
+            now += ms / 1000
+            yield now
+    return ticks().__next__
+
+def calibrate(monkeypatch, sample_ms, target_ms=250):
+    monkeypatch.setattr(user_service, "BCRYPT_ROUNDS", None)
+    monkeypatch.setattr(user_service, "BCRYPT_CALIBRATION_SAMPLES", len(sample_ms))
+    monkeypatch.setattr(bcrypt, "hashpw", lambda password, salt: b"")
+    return calibrate_bcrypt_rounds(target_ms, timer=stub_timer(sample_ms))
+
+def test_calibration_uses_the_median_sample(monkeypatch):
+    # 10 ms at cost 10 doubles to 160 ms at cost 14; the 900 ms outlier is ignored
+    assert calibrate(monkeypatch, [10, 11, 900, 9, 10]) == 14
+
+def test_calibration_never_goes_below_cost_12(monkeypatch):
+    assert calibrate(monkeypatch, [200, 210, 190]) == 12
+
+def test_calibration_is_capped(monkeypatch):
+    assert calibrate(monkeypatch, [0.01] * 3) == user_service.BCRYPT_MAX_ROUNDS
+
+def test_login_never_lowers_the_cost(monkeypatch):
+    monkeypatch.setattr(user_service, "BCRYPT_ROUNDS", "5")
+    service = UserService()
+    service.bcrypt_rounds = 6
+
+    async def scenario():
+        await service.create_user("rehash_user", "password")
+        service.bcrypt_rounds = 5
+        lowered = await service.authenticate_user("rehash_user", "password")
+        service.bcrypt_rounds = 7
+        raised = await service.authenticate_user("rehash_user", "password")
+        return lowered, raised
+
+    lowered, raised = asyncio.run(scenario())
+    assert bcrypt_rounds_of(lowered.password_hash) == 6
+    assert bcrypt_rounds_of(raised.password_hash) == 7
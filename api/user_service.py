@@ -1,11 +1,17 @@
 import bcrypt
-from typing import Optional, List
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Callable, Any
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 import os
 import secrets
+import statistics
 from models import User
-from database import get_db_connection, init_database, user_from_row
+from database import init_database
+from repositories import UserRepository
+from ttl_cache import TTLCache
 import sqlite3
 
 # JWT Configuration
@@ -13,16 +19,120 @@ SECRET_KEY = os.getenv("SECRET_KEY", secrets.token_urlsafe(32))
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30 * 24 * 60  # 30 days
 
+# bcrypt is CPU-bound (~100-300 ms per call) and releases the GIL, so it runs
+# on its own small thread pool instead of the event loop
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# bcrypt work factor: calibrated at startup so one hash takes about
+# BCRYPT_TARGET_MS on this hardware, unless BCRYPT_ROUNDS pins it explicitly.
+# Calibration never goes below the long-standing default of 12.
+BCRYPT_TARGET_MS = float(os.getenv("BCRYPT_TARGET_MS", "250"))
+BCRYPT_MIN_ROUNDS = max(12, int(os.getenv("BCRYPT_MIN_ROUNDS", "12")))
+BCRYPT_MAX_ROUNDS = int(os.getenv("BCRYPT_MAX_ROUNDS", "16"))
+BCRYPT_ROUNDS = os.getenv("BCRYPT_ROUNDS")
+# Timed hashes per calibration; the median is used so one slow sample (a
+# busy neighbour, a cold cache) does not move the cost
+BCRYPT_CALIBRATION_SAMPLES = int(os.getenv("BCRYPT_CALIBRATION_SAMPLES", "5"))
+# Samples are taken at this cheaper cost and extrapolated
+BCRYPT_CALIBRATION_ROUNDS = 10
+
+def calibrate_bcrypt_rounds(target_ms: float = BCRYPT_TARGET_MS, timer: Callable[[], float] = time.perf_counter) -> int:
+    """Pick the largest bcrypt cost whose hash time stays within target_ms.
+    
+    Each cost step doubles the work, so the median of a few timings at
+    BCRYPT_CALIBRATION_ROUNDS is enough to extrapolate. The result is clamped
+    to [BCRYPT_MIN_ROUNDS, BCRYPT_MAX_ROUNDS].
+    """
+    if BCRYPT_ROUNDS:
+        return int(BCRYPT_ROUNDS)
+    
+    timings = []
+    for _ in range(BCRYPT_CALIBRATION_SAMPLES):
+        started = timer()
+        bcrypt.hashpw(b"calibration", bcrypt.gensalt(rounds=BCRYPT_CALIBRATION_ROUNDS))
+        timings.append(max((timer() - started) * 1000, 0.001))
+    elapsed_ms = statistics.median(timings)
+    
+    rounds = BCRYPT_CALIBRATION_ROUNDS
+    while rounds < BCRYPT_MAX_ROUNDS and elapsed_ms * 2 <= target_ms:
+        elapsed_ms *= 2
+        rounds += 1
+    return min(BCRYPT_MAX_ROUNDS, max(BCRYPT_MIN_ROUNDS, rounds))
+
+def bcrypt_rounds_of(password_hash: str) -> Optional[int]:
+    """Read the cost factor stored in a bcrypt hash ("$2b$12$...")"""
+    try:
+        return int(password_hash.split("$")[2])
+    except (IndexError, ValueError):
+        return None
+
+# Authenticated-user cache: decoded JWT claims keyed by token, users keyed by ID
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+
+class PasswordHashPool:
+    """Bounded worker pool for bcrypt hashing and verification.
+    
+    Admission is gated by a semaphore on the event loop, so the counters are
+    only ever touched from the loop thread.
+    """
+    
+    def __init__(self, max_workers: int = PASSWORD_HASH_WORKERS):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+        self._semaphore = asyncio.Semaphore(max_workers)
+        self.active = 0
+        self.queued = 0
+        self.peak_queued = 0
+        self.completed = 0
+        self.total_wait_seconds = 0.0
+        self.total_run_seconds = 0.0
+    
+    async def run(self, func: Callable[..., Any], *args) -> Any:
+        """Run a bcrypt call on the pool, waiting for a free worker if needed"""
+        self.queued += 1
+        self.peak_queued = max(self.peak_queued, self.queued)
+        wait_started = time.perf_counter()
+        async with self._semaphore:
+            self.queued -= 1
+            self.active += 1
+            run_started = time.perf_counter()
+            self.total_wait_seconds += run_started - wait_started
+            try:
+                return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+            finally:
+                self.active -= 1
+                self.completed += 1
+                self.total_run_seconds += time.perf_counter() - run_started
+    
+    def get_stats(self) -> dict:
+        """Concurrency and queue-depth metrics"""
+        return {
+            "max_workers": self.max_workers,
+            "active": self.active,
+            "queued": self.queued,
+            "peak_queued": self.peak_queued,
+            "completed": self.completed,
+            "avg_wait_ms": round(self.total_wait_seconds / self.completed * 1000, 2) if self.completed else 0.0,
+            "avg_run_ms": round(self.total_run_seconds / self.completed * 1000, 2) if self.completed else 0.0,
+        }
+
 class UserService:
     """Service for user registration, authentication, and management"""
     
     def __init__(self):
         # Initialize database on startup
         init_database()
+        self.users = UserRepository()
+        self.hash_pool = PasswordHashPool()
+        self.bcrypt_rounds = calibrate_bcrypt_rounds()
+        self.rehashed_count = 0
+        self.claims_cache = TTLCache(AUTH_CACHE_MAX_ENTRIES, AUTH_CACHE_TTL_SECONDS)
+        self.user_cache = TTLCache(AUTH_CACHE_MAX_ENTRIES, AUTH_CACHE_TTL_SECONDS)
     
     def hash_password(self, password: str) -> str:
-        """Hash a password using bcrypt"""
-        salt = bcrypt.gensalt()
+        """Hash a password using bcrypt at the calibrated cost"""
+        salt = bcrypt.gensalt(rounds=self.bcrypt_rounds)
         hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
         return hashed.decode('utf-8')
     
@@ -30,76 +140,80 @@ class UserService:
         """Verify a password against a hash"""
         return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
     
-    def create_user(self, username: str, password: str) -> Optional[User]:
+    async def hash_password_async(self, password: str) -> str:
+        """Hash a password on the bcrypt worker pool"""
+        return await self.hash_pool.run(self.hash_password, password)
+    
+    async def verify_password_async(self, password: str, password_hash: str) -> bool:
+        """Verify a password on the bcrypt worker pool"""
+        return await self.hash_pool.run(self.verify_password, password, password_hash)
+    
+    async def create_user(self, username: str, password: str) -> Optional[User]:
         """Create a new user account"""
         # Validate username (alphanumeric and underscores only)
         if not username.replace('_', '').isalnum():
             return None
         
         # Check if username already exists
-        if self.get_user_by_username(username):
+        if await self.get_user_by_username(username):
             return None
         
         # Create user
         user_id = secrets.token_urlsafe(16)
-        password_hash = self.hash_password(password)
+        password_hash = await self.hash_password_async(password)
         created_at = datetime.now()
         
+        user = User(
+            id=user_id,
+            username=username,
+            password_hash=password_hash,
+            created_at=created_at
+        )
+        
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO users (id, username, password_hash, created_at)
-                VALUES (?, ?, ?, ?)
-            """, (user_id, username, password_hash, created_at.isoformat()))
-            conn.commit()
-            conn.close()
-            
-            return User(
-                id=user_id,
-                username=username,
-                password_hash=password_hash,
-                created_at=created_at
-            )
+            user.internal_id = await self.users.insert(user)
+            return user
         except sqlite3.IntegrityError:
             # Username already exists (race condition)
             return None
     
-    def get_user_by_username(self, username: str) -> Optional[User]:
+    async def get_user_by_username(self, username: str) -> Optional[User]:
         """Get a user by username"""
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM users WHERE username = ?", (username,))
-        row = cursor.fetchone()
-        conn.close()
-        
-        if row:
-            return user_from_row(row)
-        return None
+        return await self.users.get_by_username(username)
     
-    def get_user_by_id(self, user_id: str) -> Optional[User]:
-        """Get a user by ID"""
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
-        row = cursor.fetchone()
-        conn.close()
-        
-        if row:
-            return user_from_row(row)
-        return None
+    async def get_user_by_id(self, user_id: str) -> Optional[User]:
+        """Get a user by public ID"""
+        return await self.users.get_by_public_id(user_id)
     
-    def authenticate_user(self, username: str, password: str) -> Optional[User]:
+    async def authenticate_user(self, username: str, password: str) -> Optional[User]:
         """Authenticate a user with username and password"""
-        user = self.get_user_by_username(username)
+        user = await self.get_user_by_username(username)
         if not user:
             return None
         
-        if not self.verify_password(password, user.password_hash):
+        if not await self.verify_password_async(password, user.password_hash):
             return None
         
+        # Bring hashes made under a lower work factor up to the current one.
+        # Never lower a cost: calibration can land a step lower after a
+        # restart, and that must neither weaken hashes nor re-hash everyone.
+        if (bcrypt_rounds_of(user.password_hash) or 0) < self.bcrypt_rounds:
+            user = await self._rehash_password(user, password)
+        
         return user
     
+    async def _rehash_password(self, user: User, password: str) -> User:
+        """Re-hash a verified password at the current cost and store it"""
+        password_hash = await self.hash_password_async(password)
+        updated = await self.users.update_password_hash(user.internal_id, user.password_hash, password_hash)
+        if not updated:
+            # Password changed concurrently; keep whatever is stored now
+            return user
+        
+        self.invalidate_user(user.id)
+        self.rehashed_count += 1
+        return user.model_copy(update={"password_hash": password_hash})
+    
     def create_access_token(self, user: User) -> str:
         """Create a JWT access token for a user"""
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -112,14 +226,25 @@ class UserService:
         return encoded_jwt
     
     def verify_token(self, token: str) -> Optional[dict]:
-        """Verify and decode a JWT token"""
+        """Verify and decode a JWT token.
+        
+        Valid claims are cached until the token expires (at most the cache TTL);
+        invalid tokens are never cached.
+        """
+        payload = self.claims_cache.get(token)
+        if payload is not None:
+            return payload
+        
         try:
             payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            return payload
         except JWTError:
             return None
+        
+        expires_in = payload.get("exp", 0) - time.time()
+        self.claims_cache.set(token, payload, expires_in)
+        return payload
     
-    def get_user_from_token(self, token: str) -> Optional[User]:
+    async def get_user_from_token(self, token: str) -> Optional[User]:
         """Get a user from a JWT token"""
         payload = self.verify_token(token)
         if not payload:
@@ -129,5 +254,14 @@ class UserService:
         if not user_id:
             return None
         
-        return self.get_user_by_id(user_id)
+        user = self.user_cache.get(user_id)
+        if user is None:
+            user = await self.get_user_by_id(user_id)
+            if user:
+                self.user_cache.set(user_id, user)
+        return user
+    
+    def invalidate_user(self, user_id: str):
+        """Drop a cached user; call after any write to their row"""
+        self.user_cache.invalidate(user_id)
 